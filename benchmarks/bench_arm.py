@@ -0,0 +1,41 @@
+import io
+import sys
+from contextlib import redirect_stdout
+from benchmarks.bench_calls import PROGRAMS as CALLS
+from benchmarks.bench_loops import PROGRAMS as LOOPS
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.code_generator import ARMGenerator
+from simplelang.compiler.arm_simulator import ARMSimulator
+from simplelang.compiler.tac_optimizer import TACOptimizer
+from simplelang.compiler.peephole import PeepholeOptimizer
+
+# Executed instructions and estimated cycles of the ARM code for each program, as
+# generated, after the TAC optimizer, and after the peephole optimizer as well (with
+# the instructions it removed from the listing). Deterministic, so a change in the
+# numbers is a change in the generated code. `python -m benchmarks.bench_arm [program ...]`
+PROGRAMS = {**{name: CALLS[name] for name in ('fib', 'ackermann')}, **LOOPS}
+
+def simulate(text, optimizer=None, peephole=None):
+    assembly = ARMGenerator(Parser(Lexer(text)).parse(), optimizer, peephole).generate_arm()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        simulator = ARMSimulator(assembly).run()
+    return len(assembly), simulator.report(), output.getvalue()
+
+def main():
+    names = sys.argv[1:] or list(PROGRAMS)
+    for name in names:
+        lines, plain, output = simulate(PROGRAMS[name])
+        optimized_lines, optimized, optimized_output = simulate(PROGRAMS[name], TACOptimizer())
+        peephole = PeepholeOptimizer()
+        peephole_lines, rewritten, rewritten_output = simulate(PROGRAMS[name], TACOptimizer(), peephole)
+        assert output == optimized_output == rewritten_output, (name, output, optimized_output, rewritten_output)
+        removed = peephole.stats['instructions_before'] - peephole.stats['instructions_after']
+        print(f"{name:<10} {lines:5} -> {optimized_lines:5} -> {peephole_lines:5} lines ({removed} removed)  "
+              f"{plain['instructions']:10} -> {optimized['instructions']:10} -> {rewritten['instructions']:10} instructions  "
+              f"{plain['cycles']:10} -> {optimized['cycles']:10} -> {rewritten['cycles']:10} cycles  "
+              f"{plain['cycles'] / rewritten['cycles']:5.2f}x  -> {output.strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import sys
+from benchmarks.bench_engines import ENGINES
+from benchmarks.common import run_engine, best_of
+
+# Written so that every engine, including the original `Interpreter` (whose `if` blocks
+# hand back a `return` expression unevaluated), computes the same results.
+PROGRAMS = {
+    'fib': '''
+        def fib(a) {
+            if (a == 0) {
+                return 0;
+            }
+            if (a == 1) {
+                return 1;
+            }
+            return fib(a - 1) + fib(a - 2);
+        }
+        print(fib(18));
+    ''',
+    'ackermann': '''
+        def ack(m, n) {
+            let r = n + 1;
+            if (m > 0) {
+                if (n == 0) {
+                    let r = ack(m - 1, 1);
+                } else {
+                    let r = ack(m - 1, ack(m, n - 1));
+                }
+            }
+            return r;
+        }
+        print(ack(2, 60));
+    ''',
+    'mutual': '''
+        def is_even(n) {
+            let r = 1;
+            if (n > 0) {
+                let r = is_odd(n - 1);
+            }
+            return r;
+        }
+        def is_odd(n) {
+            let r = 0;
+            if (n > 0) {
+                let r = is_even(n - 1);
+            }
+            return r;
+        }
+        let total = 0;
+        for i = 0, 200 {
+            let total = total + is_even(i);
+        }
+        print(total);
+    ''',
+}
+
+def fib_calls(n):
+    return 1 if n < 2 else 1 + fib_calls(n - 1) + fib_calls(n - 2)
+
+def ack_calls(m, n):
+    calls = 0
+    stack = [m]
+    while stack:
+        m = stack.pop()
+        calls += 1
+        if m == 0:
+            n += 1
+        elif n == 0:
+            stack.append(m - 1)
+            n = 1
+        else:
+            stack.extend([m - 1, m])
+            n -= 1
+    return calls
+
+CALLS = {
+    'fib': fib_calls(18),
+    'ackermann': ack_calls(2, 60),
+    'mutual': sum(i + 1 for i in range(200)),
+}
+
+def main():
+    # The recursive engines nest several Python frames per SimpleLang call.
+    sys.setrecursionlimit(20000)
+    for program, text in PROGRAMS.items():
+        expected = None
+        for name, engine in ENGINES.items():
+            seconds, output = best_of(3, run_engine, engine, text)
+            expected = expected or output
+            assert output == expected, (program, name, output)
+            print(f"{program:<10} {name:<12} {CALLS[program] / seconds / 1e3:9.1f}k calls/s  -> {output.strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import sys
+from benchmarks.bench_engines import ENGINES
+from benchmarks.common import run_engine
+
+# Not a tail call: every level stays on the call stack until the recursion bottoms out.
+PROGRAM = '''
+def count(n) {
+    let r = 0;
+    if (n > 0) {
+        let r = 1 + count(n - 1);
+    }
+    return r;
+}
+print(count(%d));
+'''
+
+DEPTHS = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+def main():
+    depths = [int(argument) for argument in sys.argv[1:]] or DEPTHS
+    print(f"recursion limit {sys.getrecursionlimit()}")
+    for depth in depths:
+        for name, engine in ENGINES.items():
+            try:
+                seconds, output = run_engine(engine, PROGRAM % depth)
+            except RecursionError:
+                print(f"{depth:>8} {name:<12} RecursionError")
+                continue
+            assert output.strip() == str(depth), (name, output)
+            print(f"{depth:>8} {name:<12} {seconds:8.3f}s  {seconds / depth * 1e9:8.0f} ns/call")
+
+if __name__ == "__main__":
+    main()
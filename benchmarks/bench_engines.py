@@ -0,0 +1,52 @@
+from simplelang.interpreter import Interpreter
+from simplelang.closure_interpreter import ClosureInterpreter
+from simplelang.vm.machine import VirtualMachine
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.python_backend import PythonInterpreter
+from simplelang.compiler.c_backend import CInterpreter
+from benchmarks.common import run_engine, best_of
+
+ENGINES = {
+    'interpreter': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VirtualMachine,
+    'tac': TACInterpreter,
+    'python': PythonInterpreter,
+    # Compiled once into the compilation cache's directory; later runs load the cached object.
+    'c': CInterpreter,
+}
+
+PROGRAMS = {
+    'loops': '''
+        let total = 0;
+        for i = 0, 300 {
+            for j = 0, 300 {
+                let total = total + i * j - j;
+            }
+        }
+        print(total);
+    ''',
+    'calls': '''
+        def fib(a) {
+            if (a == 0) {
+                return 0;
+            }
+            if (a == 1) {
+                return 1;
+            }
+            return fib(a - 1) + fib(a - 2);
+        }
+        print(fib(20));
+    ''',
+}
+
+def main():
+    for program, text in PROGRAMS.items():
+        baseline = None
+        for name, engine in ENGINES.items():
+            seconds, output = best_of(3, run_engine, engine, text)
+            baseline = baseline or seconds
+            print(f"{program:<8} {name:<12} {seconds * 1000:9.1f} ms  {baseline / seconds:5.2f}x  -> {output.strip()}")
+
+if __name__ == "__main__":
+    main()
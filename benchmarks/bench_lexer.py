@@ -0,0 +1,220 @@
+import time
+from simplelang.lexer import Lexer, Token
+from simplelang.tokens import TokenType
+
+class CharLexer:
+    """ The original character-at-a-time scanner, kept as the baseline. """
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.current_char = self.text[self.pos] if self.text else None
+
+    def advance(self):
+        self.pos += 1
+        if self.pos >= len(self.text):
+            self.current_char = None
+        else:
+            self.current_char = self.text[self.pos]
+
+    def peek(self):
+        peek_pos = self.pos + 1
+        if peek_pos >= len(self.text):
+            return None
+        return self.text[peek_pos]
+
+    def skip_whitespace(self):
+        while self.current_char is not None and self.current_char.isspace():
+            self.advance()
+
+    def number(self):
+        result = ''
+        while self.current_char is not None and self.current_char.isdigit():
+            result += self.current_char
+            self.advance()
+        return int(result)
+
+    def string(self):
+        self.advance()
+        result = ''
+        while self.current_char is not None and self.current_char != '"':
+            result += self.current_char
+            self.advance()
+        self.advance()
+        return result
+
+    def identifier(self):
+        result = ''
+        while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
+            result += self.current_char
+            self.advance()
+        return result
+
+    def get_next_token(self):
+        while self.current_char is not None:
+            if self.current_char.isspace():
+                self.skip_whitespace()
+                continue
+
+            if self.current_char == '[':
+                self.advance()
+                return Token(TokenType.LBRACKET)
+
+            if self.current_char == ']':
+                self.advance()
+                return Token(TokenType.RBRACKET)
+            
+            if self.current_char == ';':
+                self.advance()
+                return Token(TokenType.SEMICOLON)
+
+            if self.current_char.isdigit():
+                return Token(TokenType.NUMBER, self.number())
+
+            if self.current_char == '"':
+                return Token(TokenType.STRING, self.string())
+
+            if self.current_char.isalpha() or self.current_char == '_':
+                ident = self.identifier()
+                keyword_token = self.check_keyword(ident)
+                if keyword_token:
+                    return keyword_token
+                return Token(TokenType.IDENTIFIER, ident)
+
+            if self.current_char == '+':
+                self.advance()
+                return Token(TokenType.PLUS)
+
+            if self.current_char == '-':
+                self.advance()
+                return Token(TokenType.MINUS)
+
+            if self.current_char == '*':
+                self.advance()
+                return Token(TokenType.MUL)
+
+            if self.current_char == '/':
+                self.advance()
+                return Token(TokenType.DIV)
+
+            if self.current_char == '(':
+                self.advance()
+                return Token(TokenType.LPAREN)
+
+            if self.current_char == ')':
+                self.advance()
+                return Token(TokenType.RPAREN)
+
+            if self.current_char == '{':
+                self.advance()
+                return Token(TokenType.LBRACE)
+
+            if self.current_char == '}':
+                self.advance()
+                return Token(TokenType.RBRACE)
+
+            if self.current_char == ',':
+                self.advance()
+                return Token(TokenType.COMMA)
+
+            if self.current_char == '=':
+                if self.peek() == '=':
+                    self.advance()
+                    self.advance()
+                    return Token(TokenType.EQUAL_EQUAL)
+                self.advance()
+                return Token(TokenType.EQUAL)
+
+            if self.current_char == '!':
+                if self.peek() == '=':
+                    self.advance()
+                    self.advance()
+                    return Token(TokenType.NOT_EQUAL)
+                self.advance()
+                return Token(TokenType.NOT)
+
+            if self.current_char == '<':
+                if self.peek() == '=':
+                    self.advance()
+                    self.advance()
+                    return Token(TokenType.LESS_EQUAL)
+                self.advance()
+                return Token(TokenType.LESS)
+
+            if self.current_char == '>':
+                if self.peek() == '=':
+                    self.advance()
+                    self.advance()
+                    return Token(TokenType.GREATER_EQUAL)
+                self.advance()
+                return Token(TokenType.GREATER)
+
+            if self.current_char == '&':
+                if self.peek() == '&':
+                    self.advance()
+                    self.advance()
+                    return Token(TokenType.AND)
+
+            if self.current_char == '|':
+                if self.peek() == '|':
+                    self.advance()
+                    self.advance()
+                    return Token(TokenType.OR)
+
+            self.advance()
+            return Token(TokenType.INVALID)
+        return Token(TokenType.EOF)
+
+    def check_keyword(self, ident):
+        keywords = {
+            'let': TokenType.LET,
+            'print': TokenType.PRINT,
+            'if': TokenType.IF,
+            'else': TokenType.ELSE,
+            'while': TokenType.WHILE,
+            'for': TokenType.FOR,
+            'def': TokenType.DEF,
+            'return': TokenType.RETURN
+        }
+        return Token(keywords.get(ident)) if ident in keywords else None
+
+PROGRAM = '''
+def fib(a) {
+    if (a == 0) {
+        return 0;
+    }
+    if (a == 1 || a == 2) {
+        return 1;
+    }
+    return fib(a - 1) + fib(a - 2);
+}
+let numbers = [10, 20, 30, 40, 50];
+let message = "a string literal";
+for index = 0, 5 {
+    let total_value = total_value + numbers[index] * 2 / 3;
+    print(fib(index) >= 3);
+}
+'''
+
+def throughput(lexer_class, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        lexer = lexer_class(text)
+        start = time.perf_counter()
+        count = 0
+        while lexer.get_next_token().type != TokenType.EOF:
+            count += 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(text.encode()) / best / 1e6, count
+
+def main():
+    text = PROGRAM * 5000
+    print(f"source: {len(text) / 1e6:.1f} MB")
+    baseline, tokens = throughput(CharLexer, text)
+    regex, regex_tokens = throughput(Lexer, text)
+    assert tokens == regex_tokens
+    print(f"char-by-char lexer: {baseline:6.2f} MB/s ({tokens} tokens)")
+    print(f"regex lexer:        {regex:6.2f} MB/s ({regex / baseline:.1f}x)")
+
+if __name__ == "__main__":
+    main()
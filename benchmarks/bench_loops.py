@@ -0,0 +1,66 @@
+import functools
+from benchmarks.bench_engines import ENGINES
+from benchmarks.common import run_engine, best_of
+from simplelang.compiler.optimizer import Optimizer, OptimizingParser
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.tac_optimizer import TACOptimizer
+
+# Nested loops over arrays, with the invariant arithmetic and `i * k` indexing that
+# loop-invariant code motion and strength reduction target.
+PROGRAMS = {
+    'grid': '''
+        let grid = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7, 9, 3];
+        let width = 4;
+        let scale = 3;
+        let total = 0;
+        for pass = 0, 2000 {
+            for row = 0, width {
+                for col = 0, width {
+                    let total = total + grid[row * width + col] * (scale * width - 1) + (scale + pass);
+                }
+            }
+        }
+        print(total);
+    ''',
+    'stencil': '''
+        let signal = [2, 7, 1, 8, 2, 8, 1, 8, 2, 8, 4, 5, 9, 0, 4, 5];
+        let weights = [1, 2, 1];
+        let n = 14;
+        let norm = 4;
+        let acc = 0;
+        let round = 0;
+        while (round < 1000) {
+            for i = 0, n {
+                for k = 0, 3 {
+                    let acc = acc + signal[i + k] * weights[k] * (norm * 2 + 1) - round * norm;
+                }
+            }
+            let round = round + 1;
+        }
+        print(acc);
+    ''',
+}
+
+def optimized(engine):
+    def start(parser):
+        return engine(OptimizingParser(parser, Optimizer()))
+    return start
+
+def variants():
+    for name, engine in ENGINES.items():
+        yield name, engine, optimized(engine)
+    yield 'tac+loops', TACInterpreter, optimized(functools.partial(TACInterpreter, optimizer=TACOptimizer()))
+
+def main():
+    for program, text in PROGRAMS.items():
+        expected = None
+        for name, plain, faster in variants():
+            before, output = best_of(3, run_engine, plain, text)
+            after, optimized_output = best_of(3, run_engine, faster, text)
+            expected = expected or output
+            assert output == optimized_output == expected, (program, name, output, optimized_output)
+            print(f"{program:<8} {name:<12} {before * 1000:9.1f} ms -> {after * 1000:9.1f} ms  "
+                  f"{before / after:5.2f}x  -> {output.strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import sys
+import tracemalloc
+from simplelang import sl_parser
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.ast_arena import ASTArena
+from simplelang.tokens import TokenType
+from benchmarks.bench_lexer import CharLexer
+
+NODE_CLASSES = [getattr(sl_parser, name) for name in dir(sl_parser) if name.endswith('Node')]
+
+class PlainToken:
+    """ The token as it was before: one `__dict__` per instance. """
+    def __init__(self, type_, value=None):
+        self.type = type_
+        self.value = value
+
+# Same constructors as the parser's nodes, minus `__slots__`.
+PLAIN_NODES = {cls: type(cls.__name__, (), {'__init__': cls.__init__}) for cls in NODE_CLASSES}
+
+def generate(tokens=1_000_000, names=500):
+    lines = []
+    count = 0
+    i = 0
+    while count < tokens:
+        a, b = f"value_{i % names}", f"total_{(i * 7) % names}"
+        lines.append(f"let {a} = {b} + {i} * ({a} - 3);\n"
+                     f"if ({a} > {b} && {b} != 0) {{ print(items[{i % 10}]); }} else {{ let {b} = f({a}, 2); }}\n")
+        count += 46
+        i += 1
+    return ''.join(lines)
+
+def traced(build):
+    """ Returns (result, bytes still allocated by `build` once it has returned). """
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def old_tokens(text):
+    lexer = CharLexer(text)
+    tokens = []
+    while True:
+        token = lexer.get_next_token()
+        if token.type == TokenType.EOF:
+            return tokens
+        tokens.append(PlainToken(token.type, token.value))
+
+def plain_copy(node):
+    """ Rebuild an AST with unslotted nodes and a fresh token per operator, as the parser used to produce. """
+    if isinstance(node, list):
+        return [plain_copy(item) for item in node]
+    if type(node) in PLAIN_NODES:
+        copy = PLAIN_NODES[type(node)].__new__(PLAIN_NODES[type(node)])
+        for field in type(node).__slots__:
+            setattr(copy, field, plain_copy(getattr(node, field)))
+        return copy
+    if hasattr(node, 'type'):
+        return PlainToken(node.type, node.value)
+    return node
+
+def count_nodes(node):
+    if isinstance(node, list):
+        return sum(count_nodes(item) for item in node)
+    if type(node) in PLAIN_NODES:
+        return 1 + sum(count_nodes(getattr(node, field)) for field in type(node).__slots__)
+    return 0
+
+def main():
+    text = generate(*map(int, sys.argv[1:2]))
+    before_tokens, before_token_bytes = traced(lambda: old_tokens(text))
+    after_tokens, after_token_bytes = traced(lambda: list(Lexer(text)))
+    assert [(t.type, t.value) for t in before_tokens] == [(t.type, t.value) for t in after_tokens]
+    del before_tokens
+    ast, after_node_bytes = traced(lambda: Parser(after_tokens).parse())
+    _, before_node_bytes = traced(lambda: plain_copy(ast))
+    _, arena_node_bytes = traced(lambda: ASTArena.from_nodes(ast))
+    tokens, nodes = len(after_tokens), count_nodes(ast)
+    print(f"{tokens} tokens, {nodes} nodes")
+    print(f"bytes per token: before {before_token_bytes / tokens:6.1f}  after {after_token_bytes / tokens:6.1f}")
+    print(f"bytes per node:  before {before_node_bytes / nodes:6.1f}  after {after_node_bytes / nodes:6.1f}"
+          f"  arena {arena_node_bytes / nodes:6.1f}")
+
+if __name__ == "__main__":
+    main()
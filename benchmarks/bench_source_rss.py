@@ -0,0 +1,46 @@
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from simplelang.lexer import Lexer
+from simplelang.source import open_source
+from benchmarks.bench_lexer import PROGRAM
+
+def lex(mode, path):
+    """ Lex `path` the old way ('read') or through `open_source` ('mmap'); print the token count and peak RSS. """
+    if mode == 'read':
+        text, encoding = open(path, encoding='utf-8').read(), 'utf-8'
+    else:
+        text, encoding = open_source(path)
+    count = sum(1 for _ in Lexer(text, encoding))
+    print(count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def measure(mode, path):
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_source_rss', mode, path],
+                            capture_output=True, text=True, check=True).stdout
+    count, kilobytes = output.split()
+    return int(count), int(kilobytes) / 1024
+
+def main(megabytes=32):
+    handle, path = tempfile.mkstemp(suffix='.sl')
+    try:
+        # Some non-ASCII identifiers so the read path decodes into a wide str, as real sources do.
+        chunk = (PROGRAM + 'let größe = größe + 1;\n').encode('utf-8')
+        with os.fdopen(handle, 'wb') as file:
+            for _ in range(megabytes * 2 ** 20 // len(chunk)):
+                file.write(chunk)
+        print(f"source: {os.path.getsize(path) / 2 ** 20:.0f} MB")
+        read_tokens, read_rss = measure('read', path)
+        mmap_tokens, mmap_rss = measure('mmap', path)
+        assert read_tokens == mmap_tokens
+        print(f"read().decode(): peak RSS {read_rss:7.1f} MB ({read_tokens} tokens)")
+        print(f"mmap:            peak RSS {mmap_rss:7.1f} MB (mapped pages are counted while resident)")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        lex(sys.argv[1], sys.argv[2])
+    else:
+        main(*map(int, sys.argv[1:]))
@@ -0,0 +1,28 @@
+import io
+import time
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer, TokenType
+from simplelang.sl_parser import Parser
+
+def tokenize(text):
+    lexer = Lexer(text)
+    tokens = []
+    while True:
+        token = lexer.get_next_token()
+        if token.type == TokenType.EOF:
+            break
+        tokens.append(token)
+    return tokens
+
+def run_engine(engine, text):
+    """ Run `text` on an engine class taking a parser; returns (seconds, stdout). """
+    parser = Parser(tokenize(text))
+    output = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        engine(parser).interpret()
+    return time.perf_counter() - start, output.getvalue()
+
+def best_of(repeat, function, *args):
+    results = [function(*args) for _ in range(repeat)]
+    return min(results, key=lambda result: result[0])
@@ -0,0 +1,160 @@
+from array import array
+
+from simplelang.lexer import Token
+from simplelang.sl_parser import (VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                                  FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode)
+
+NODE_CLASSES = [VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode]
+KINDS = {cls: kind for kind, cls in enumerate(NODE_CLASSES)}
+LIST_FIELDS = {'elements', 'parameters', 'body', 'arguments'}
+FIELD_COUNT = max(len(cls.__slots__) for cls in NODE_CLASSES)
+
+def view_class(cls):
+    """
+    A subclass of node class `cls` whose fields are read from an arena, so code using
+    isinstance checks or `visit_<class name>` dispatch walks views like ordinary nodes.
+
+    The first field read fills in all of the view's fields (children stay views, read
+    in turn when they are reached) and turns it into a plain `cls` subclass of the same
+    name, so walking it again, e.g. a loop body or a function called often, is as fast
+    as walking nodes.
+    """
+    slots = [(position, field, getattr(cls, field)) for position, field in enumerate(cls.__slots__)]
+    filled = type(cls.__name__, (cls,), {'__slots__': ('arena', 'id')})
+
+    def fill(self):
+        arena = self.arena
+        for position, field, slot in slots:
+            reference = arena.fields[position][self.id]
+            slot.__set__(self, arena.list(reference) if field in LIST_FIELDS else arena.value(reference))
+        self.__class__ = filled
+
+    namespace = {'__slots__': ('arena', 'id')}
+    for field in cls.__slots__:
+        namespace[field] = property(lambda self, field=field: fill(self) or getattr(self, field))
+    return type(cls.__name__, (cls,), namespace)
+
+VIEW_CLASSES = [view_class(cls) for cls in NODE_CLASSES]
+
+class ASTArena:
+    """
+    Struct-of-arrays storage for a program's AST.
+
+    Node `i` is described by `kinds[i]` (an index into `NODE_CLASSES`) and `fields[f][i]`
+    for the node class's f-th slot. A field holds a reference: a node ID (>= 0), or
+    `~index` into the constant `pool` for names, numbers, operator tokens and None.
+    List fields hold an offset into `items`, where a length is followed by that many
+    references. `roots` lists the top-level statements.
+
+    `statements()`/`parse()` yield views, so an arena can be handed to any engine
+    in place of a `Parser`; a view reads its fields from the arrays once, when
+    first used (see `view_class`). Arenas pickle as a handful of arrays plus the pool.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.fields = [array('i') for _ in range(FIELD_COUNT)]
+        self.items = array('i')
+        self.pool = []
+        self.pool_index = {}
+        self.roots = array('i')
+
+    def __repr__(self):
+        return f"ASTArena({len(self.kinds)} nodes, {len(self.roots)} statements)"
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getstate__(self):
+        return self.kinds, self.fields, self.items, self.pool, self.roots
+
+    def __setstate__(self, state):
+        self.kinds, self.fields, self.items, self.pool, self.roots = state
+        self.pool_index = {self.pool_key(value): index for index, value in enumerate(self.pool)}
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        """ Build an arena from an iterable of statements, e.g. `Parser.statements()`. """
+        arena = cls()
+        for node in nodes:
+            arena.roots.append(arena.add(node))
+        return arena
+
+    def pool_key(self, value):
+        if isinstance(value, Token):
+            return Token, value.type, value.value
+        return type(value), value
+
+    def constant(self, value):
+        key = self.pool_key(value)
+        index = self.pool_index.get(key)
+        if index is None:
+            index = self.pool_index[key] = len(self.pool)
+            self.pool.append(value)
+        return ~index
+
+    def reference(self, value):
+        if type(value) in KINDS:
+            return self.add(value)
+        return self.constant(value)
+
+    def add(self, node):
+        """ Store `node` and everything below it; returns its ID. """
+        cls = type(node)
+        values = []
+        for field in cls.__slots__:
+            value = getattr(node, field)
+            if field in LIST_FIELDS:
+                references = [self.reference(item) for item in value]
+                values.append(len(self.items))
+                self.items.append(len(references))
+                self.items.extend(references)
+            else:
+                values.append(self.reference(value))
+        node_id = len(self.kinds)
+        self.kinds.append(KINDS[cls])
+        for position, field in enumerate(self.fields):
+            field.append(values[position] if position < len(values) else 0)
+        return node_id
+
+    def value(self, reference):
+        if reference < 0:
+            return self.pool[~reference]
+        return self.view(reference)
+
+    def view(self, node_id):
+        view = VIEW_CLASSES[self.kinds[node_id]].__new__(VIEW_CLASSES[self.kinds[node_id]])
+        view.arena = self
+        view.id = node_id
+        return view
+
+    def list(self, offset):
+        items = self.items
+        return [self.value(items[position]) for position in range(offset + 1, offset + 1 + items[offset])]
+
+    def node(self, node_id):
+        """ Rebuild node `node_id` and its subtree as ordinary node objects. """
+        cls = NODE_CLASSES[self.kinds[node_id]]
+        node = cls.__new__(cls)
+        for position, field in enumerate(cls.__slots__):
+            reference = self.fields[position][node_id]
+            if field in LIST_FIELDS:
+                items = self.items
+                references = items[reference + 1:reference + 1 + items[reference]]
+                setattr(node, field, [self.materialize(item) for item in references])
+            else:
+                setattr(node, field, self.materialize(reference))
+        return node
+
+    def materialize(self, reference):
+        return self.pool[~reference] if reference < 0 else self.node(reference)
+
+    def statements(self):
+        for root in self.roots:
+            yield self.view(root)
+
+    def parse(self):
+        return list(self.statements())
+
+    def to_nodes(self):
+        return [self.node(root) for root in self.roots]
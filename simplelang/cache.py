@@ -0,0 +1,223 @@
+import functools
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import time
+
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.ast_arena import ASTArena
+from simplelang.compiler.optimizer import OptimizingParser
+
+# Bump whenever the parser, the optimizer, the ASTArena layout or a lowering (bytecode, TAC) changes its output.
+COMPILER_VERSION = 3
+
+MAGIC = b'SLC\x00'
+# magic, compiler version, key, payload SHA-256, payload length
+HEADER = struct.Struct('<4sI32s32sQ')
+
+def default_cache_dir():
+    if os.environ.get('SIMPLELANG_CACHE_DIR'):
+        return os.environ['SIMPLELANG_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'simplelang')
+
+class Program:
+    """ Parser stand-in for statements that were already parsed. """
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def __repr__(self):
+        return f"Program({len(self.nodes)} statements)"
+
+    def statements(self):
+        return iter(self.nodes)
+
+    def parse(self):
+        return list(self.nodes)
+
+class RecordingParser:
+    """ Streams a parser's statements and calls `done(arena)` once all of them have been parsed. """
+    def __init__(self, parser, done):
+        self.parser = parser
+        self.done = done
+
+    def __repr__(self):
+        return f"RecordingParser({repr(self.parser)})"
+
+    def statements(self):
+        arena = ASTArena()
+        for node in self.parser.statements():
+            arena.roots.append(arena.add(node))
+            yield node
+        self.done(arena)
+
+    def parse(self):
+        return list(self.statements())
+
+class CompilationCache:
+    """
+    pyc-style cache of parsed and lowered programs in one directory.
+
+    An entry is `<key>.slc`, where the key hashes the compiler version, the Python
+    cache tag, the artifact kind (`ast`, or an engine's lowered form) and the
+    source text with its encoding, so any change to either gives a new entry.
+    Entries are written to a temporary file and renamed into place.
+
+    On load, the magic number, compiler version, key, payload length and payload
+    SHA-256 are all checked. A mismatching or unreadable entry counts as a miss and
+    is deleted.
+
+    Eviction is least-recently-used: every hit refreshes the entry's mtime. After
+    each store, the oldest entries are removed until at most `max_entries`
+    entries totalling at most `max_bytes` remain. Temporary files left behind by
+    interrupted writers are removed once they are an hour old.
+
+    The cache is a convenience: I/O errors while reading or writing it are ignored.
+    Entries are pickles, so the directory must only be writable by trusted users,
+    as with __pycache__.
+    """
+    def __init__(self, directory=None, max_entries=1000, max_bytes=256 * 2 ** 20):
+        self.directory = directory or default_cache_dir()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"CompilationCache({repr(self.directory)}, hits={self.hits}, misses={self.misses})"
+
+    def key(self, text, encoding, kind):
+        digest = hashlib.sha256(f"{COMPILER_VERSION}\0{sys.implementation.cache_tag}\0{kind}\0{encoding}\0".encode())
+        digest.update(text.encode('utf-8', 'surrogatepass') if isinstance(text, str) else text)
+        return digest.digest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key.hex() + '.slc')
+
+    def load(self, key):
+        """ Returns the cached object for `key`, or None on a miss. """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            value = self.decode(key, data)
+        except Exception:
+            value = None
+        if value is None:
+            self.misses += 1
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def decode(self, key, data):
+        if len(data) < HEADER.size:
+            return None
+        magic, version, stored_key, checksum, length = HEADER.unpack_from(data)
+        payload = memoryview(data)[HEADER.size:]
+        if (magic != MAGIC or version != COMPILER_VERSION or stored_key != key or length != len(payload)
+                or hashlib.sha256(payload).digest() != checksum):
+            return None
+        return pickle.loads(payload)
+
+    def store(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        header = HEADER.pack(MAGIC, COMPILER_VERSION, key, hashlib.sha256(payload).digest(), len(payload))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as file:
+                    file.write(header)
+                    file.write(payload)
+                os.replace(temporary, self.path(key))
+            except BaseException:
+                self.remove(temporary)
+                raise
+            self.evict()
+        except OSError:
+            pass
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def entries(self):
+        """ (mtime, size, path) for every entry, least recently used first. """
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith('.slc'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif entry.name.endswith('.tmp') and stat.st_mtime < time.time() - 3600:
+                    self.remove(entry.path)
+        entries.sort()
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        count, total = len(entries), sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self.remove(path)
+            count, total = count - 1, total - size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.remove(path)
+
+def run_cached(engine, text, encoding, cache, optimizer=None):
+    """
+    Run source `text` on `engine`, reusing the cached front-end output where possible.
+
+    Engines with a `compile()`/`run(program)` split (the VM and TAC engines) cache their
+    lowered program; the others cache the AST as an `ASTArena`. On a miss the AST is
+    recorded while the engine consumes it, so statements still execute as they are parsed.
+    With an `optimizer`, the cached artifact is the optimized one, keyed by the enabled passes.
+    """
+    def parse():
+        parser = Parser(Lexer(text, encoding))
+        return parser if optimizer is None else OptimizingParser(parser, optimizer)
+
+    suffix = '' if optimizer is None else '-O' + optimizer.key()
+    lowering = engine.func if isinstance(engine, functools.partial) else engine
+    if hasattr(lowering, 'compile'):
+        # Engine options (e.g. a TAC optimizer) can change the lowered program.
+        options = sorted(engine.keywords.items()) if isinstance(engine, functools.partial) else []
+        key = cache.key(text, encoding, lowering.__name__ + suffix + repr(options))
+        program = cache.load(key)
+        if program is not None:
+            interpreter = engine(None)
+        else:
+            interpreter = engine(parse())
+            program = interpreter.compile()
+            cache.store(key, program)
+        interpreter.run(program)
+        return interpreter
+    key = cache.key(text, encoding, 'ast' + suffix)
+    arena = cache.load(key)
+    if arena is not None:
+        interpreter = engine(Program(arena.to_nodes()))
+    else:
+        interpreter = engine(RecordingParser(parse(), lambda arena: cache.store(key, arena)))
+    interpreter.interpret()
+    return interpreter
@@ -0,0 +1,411 @@
+import functools
+import operator
+
+from simplelang.tokens import TokenType
+from simplelang.sl_parser import (VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                                  FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode)
+from simplelang.resolver import Resolver
+from simplelang.purity import pure_functions
+
+
+def _divide(left, right):
+    if right == 0:
+        raise Exception("Division by zero")
+    return left / right
+
+
+BINARY_OPS = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.MUL: operator.mul,
+    TokenType.DIV: _divide,
+    TokenType.GREATER: operator.gt,
+    TokenType.LESS: operator.lt,
+    TokenType.EQUAL_EQUAL: operator.eq,
+    TokenType.NOT_EQUAL: operator.ne,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS_EQUAL: operator.le,
+}
+
+
+class Function:
+    def __init__(self, name, parameters, body, size):
+        self.name = name
+        self.parameters = parameters
+        self.body = body
+        # Each call's frame starts as a copy of this template.
+        self.blank = [None] * size
+
+    def __repr__(self):
+        return f"Function({self.name}, {self.parameters})"
+
+
+def memoize(function, size):
+    """
+    Cache `function`'s results by argument tuple in a bounded LRU (`size` None is
+    unbounded). Arguments of different types are different keys, as `2` and `2.0`
+    can give different results. Calls with an array argument, which cannot be a
+    key, run uncached.
+    Tail calls are completed before a result is cached, so memoized functions do
+    not get constant-stack tail calls.
+    """
+    body, padding = function.body, function.blank[len(function.parameters):]
+    argc = len(function.parameters)
+
+    @functools.lru_cache(maxsize=size, typed=True)
+    def cached(*arguments):
+        frame = list(arguments)
+        frame += padding
+        result = body(frame)
+        while type(result) is TailCall:
+            result = result.function.body(result.frame)
+        return result
+
+    def memoized(frame):
+        arguments = frame[:argc]
+        if list in map(type, arguments):
+            return body(frame)
+        return cached(*arguments)
+
+    function.body = memoized
+    function.cache = cached
+
+
+class TailCall:
+    """ What a `return f(...)` in a function evaluates to: the call still to be made by the caller. """
+    __slots__ = ('function', 'frame')
+
+    def __init__(self, function, frame):
+        self.function = function
+        self.frame = frame
+
+
+class Binding:
+    """ The function currently defined under a name. Call sites keep the binding instead of looking the name up. """
+    def __init__(self, name):
+        self.name = name
+        self.function = None
+
+    def __repr__(self):
+        return f"Binding({self.name}, {self.function})"
+
+
+class ClosureInterpreter:
+    """
+    Executes a program by first turning every AST node into a Python closure.
+
+    Dispatch on node type and operator happens once, while compiling, so running
+    a node is a single direct call. Statement closures return None to continue
+    or a one-element tuple holding the value of an executed `return`.
+
+    A `Resolver` gives every variable a slot while compiling, so closures take a
+    list-backed frame and read and write it by index. Globals live in
+    `self.globals`, which only ever grows, so function closures reading a global
+    (with `function_globals`) index it directly.
+
+    With `memoize`, calls to pure functions (see `purity.pure_functions`) and to
+    functions annotated `memo` are cached per definition in an LRU of `memo_size`
+    entries; `nomemo` opts a function out. The analysis needs the whole program,
+    so in this mode it is parsed before anything runs.
+    """
+    def __init__(self, parser, function_globals=False, memoize=False, memo_size=1024):
+        self.parser = parser
+        self.function_globals = function_globals
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self.pure = set()
+        self.caches = {}
+        self.resolver = Resolver(function_globals)
+        self.scope = self.resolver.globals
+        self.globals = []
+        self.functions = {}
+        self.bindings = {}
+        self.compilers = {
+            VarDeclNode: self.compile_VarDeclNode,
+            PrintNode: self.compile_PrintNode,
+            ReturnNode: self.compile_ReturnNode,
+            FunctionNode: self.compile_FunctionNode,
+            IfNode: self.compile_IfNode,
+            ElseNode: self.compile_ElseNode,
+            WhileNode: self.compile_WhileNode,
+            ForNode: self.compile_ForNode,
+        }
+
+    def __repr__(self):
+        return f"ClosureInterpreter({repr(self.parser)}, {repr(self.variables)}, {repr(self.functions)})"
+
+    @property
+    def variables(self):
+        scope, frame = self.resolver.globals, self.globals
+        return {name: frame[slot] for name, slot in scope.slots.items()
+                if slot < len(frame) and (name in scope.assigned or frame[slot] is not None)}
+
+    def compile_load(self, name):
+        coordinate = self.scope.resolve(name)
+        if coordinate is None:
+            return lambda frame: None
+        depth, slot = coordinate
+        if depth == 0:
+            return lambda frame: frame[slot]
+        frame_globals = self.globals
+        return lambda frame: frame_globals[slot]
+
+    def compile_expression(self, node):
+        if isinstance(node, int):
+            return lambda frame: node
+        if isinstance(node, str):
+            return self.compile_load(node)
+        if isinstance(node, BinaryOpNode):
+            return self.compile_BinaryOpNode(node)
+        if isinstance(node, FunctionCallNode):
+            return self.compile_FunctionCallNode(node)
+        if isinstance(node, ArrayIndexNode):
+            return self.compile_ArrayIndexNode(node)
+        if isinstance(node, ArrayNode):
+            elements = [self.compile_expression(element) for element in node.elements]
+            return lambda frame: [element(frame) for element in elements]
+        raise Exception(f"Cannot evaluate {type(node).__name__}")
+
+    def compile_statement(self, node):
+        # Look through the MRO so subclasses of the node classes (e.g. arena views) compile too.
+        compiler = next((self.compilers[cls] for cls in type(node).__mro__ if cls in self.compilers), None)
+        if compiler is not None:
+            return compiler(node)
+        expression = self.compile_expression(node)
+
+        def statement(frame):
+            expression(frame)
+        return statement
+
+    def compile_block(self, nodes):
+        statements = tuple(self.compile_statement(node) for node in nodes)
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(frame):
+            for statement in statements:
+                result = statement(frame)
+                if result is not None:
+                    return result
+        return block
+
+    def compile_BinaryOpNode(self, node):
+        op = node.op.type
+        left = self.compile_expression(node.left)
+        if op == TokenType.AND:
+            right = self.compile_expression(node.right)
+            return lambda frame: left(frame) and right(frame)
+        if op == TokenType.OR:
+            right = self.compile_expression(node.right)
+            return lambda frame: left(frame) or right(frame)
+        function = BINARY_OPS[op]
+        if isinstance(node.right, int):
+            constant = node.right
+            return lambda frame: function(left(frame), constant)
+        right = self.compile_expression(node.right)
+        return lambda frame: function(left(frame), right(frame))
+
+    def compile_ArrayIndexNode(self, node):
+        name = node.array_identifier
+        load = self.compile_load(name)
+        index = self.compile_expression(node.index)
+
+        def array_index(frame):
+            array = load(frame)
+            if array is None:
+                raise Exception(f"Undefined array: {name}")
+            position = index(frame)
+            if position < 0 or position >= len(array):
+                raise Exception(f"Index out of bounds: {position}")
+            return array[position]
+        return array_index
+
+    def binding(self, name):
+        binding = self.bindings.get(name)
+        if binding is None:
+            binding = self.bindings[name] = Binding(name)
+        return binding
+
+    def compile_enter(self, node):
+        """
+        Compile the part of a call that sets up the callee: returns a closure giving
+        (function, callee frame). A call site checks the function bound to its name
+        once and reuses that check until the name is rebound. The callee frame is
+        copied from the function's template and arguments are stored by position,
+        with the common arities unrolled.
+        """
+        name = node.name
+        arguments = tuple(self.compile_expression(argument) for argument in node.arguments)
+        argc = len(arguments)
+        binding = self.binding(name)
+        checked = False
+
+        def check():
+            nonlocal checked
+            function = binding.function
+            if function is None:
+                raise Exception(f"Undefined function: {name}")
+            if argc != len(function.parameters):
+                raise Exception(f"Argument mismatch for function: {name}")
+            checked = function
+            return function
+
+        if argc == 0:
+            def enter(frame):
+                function = binding.function
+                if function is not checked:
+                    function = check()
+                return function, function.blank[:]
+        elif argc == 1:
+            argument, = arguments
+
+            def enter(frame):
+                function = binding.function
+                if function is not checked:
+                    function = check()
+                value = argument(frame)
+                callee = function.blank[:]
+                callee[0] = value
+                return function, callee
+        elif argc == 2:
+            first, second = arguments
+
+            def enter(frame):
+                function = binding.function
+                if function is not checked:
+                    function = check()
+                value, other = first(frame), second(frame)
+                callee = function.blank[:]
+                callee[0] = value
+                callee[1] = other
+                return function, callee
+        else:
+            def enter(frame):
+                function = binding.function
+                if function is not checked:
+                    function = check()
+                callee = [argument(frame) for argument in arguments]
+                callee += function.blank[argc:]
+                return function, callee
+        return enter
+
+    def compile_FunctionCallNode(self, node):
+        enter = self.compile_enter(node)
+
+        def call(frame):
+            function, callee = enter(frame)
+            result = function.body(callee)
+            # Tail calls come back as `TailCall`s and run here, so they never nest.
+            while type(result) is TailCall:
+                result = result.function.body(result.frame)
+            if result is not None:
+                return result[0]
+        return call
+
+    def compile_VarDeclNode(self, node):
+        slot = self.scope.store(node.var_name)
+        value = self.compile_expression(node.value)
+
+        def var_decl(frame):
+            frame[slot] = value(frame)
+        return var_decl
+
+    def compile_PrintNode(self, node):
+        value = self.compile_expression(node.value)
+
+        def print_statement(frame):
+            print(value(frame))
+        return print_statement
+
+    def compile_ReturnNode(self, node):
+        if isinstance(node.value, FunctionCallNode) and self.scope is not self.resolver.globals:
+            enter = self.compile_enter(node.value)
+            return lambda frame: TailCall(*enter(frame))
+        value = self.compile_expression(node.value)
+        return lambda frame: (value(frame),)
+
+    def compile_FunctionNode(self, node):
+        enclosing = self.scope
+        self.scope = self.resolver.function_scope(node)
+        try:
+            body = self.compile_block(node.body)
+        finally:
+            self.scope, scope = enclosing, self.scope
+        function = Function(node.name, node.parameters, body, scope.size)
+        functions = self.functions
+        binding = self.binding(node.name)
+        if self.memoize and node.memo is not False and (node.memo or node.name in self.pure):
+            memoize(function, self.memo_size)
+            caches = self.caches
+
+            def define(frame):
+                functions[function.name] = function
+                binding.function = function
+                caches[function.name] = function.cache
+            return define
+
+        def define(frame):
+            functions[function.name] = function
+            binding.function = function
+        return define
+
+    def compile_IfNode(self, node):
+        condition = self.compile_expression(node.condition)
+        body = self.compile_block(node.body)
+        if node.else_node is None:
+            def if_statement(frame):
+                if condition(frame):
+                    return body(frame)
+            return if_statement
+        else_body = self.compile_block(node.else_node.body)
+
+        def if_else_statement(frame):
+            if condition(frame):
+                return body(frame)
+            return else_body(frame)
+        return if_else_statement
+
+    def compile_ElseNode(self, node):
+        return self.compile_block(node.body)
+
+    def compile_WhileNode(self, node):
+        condition = self.compile_expression(node.condition)
+        body = self.compile_block(node.body)
+
+        def while_statement(frame):
+            while condition(frame):
+                result = body(frame)
+                if result is not None:
+                    return result
+        return while_statement
+
+    def compile_ForNode(self, node):
+        slot = self.scope.store(node.variable)
+        start = self.compile_expression(node.start)
+        end = self.compile_expression(node.end)
+        body = self.compile_block(node.body)
+
+        def for_statement(frame):
+            frame[slot] = start(frame)
+            stop = end(frame)
+            while frame[slot] < stop:
+                result = body(frame)
+                if result is not None:
+                    return result
+                frame[slot] += 1
+        return for_statement
+
+    def memo_stats(self):
+        """ Hits, misses and size of the cache of each memoized function currently defined. """
+        return {name: cache.cache_info() for name, cache in self.caches.items()}
+
+    def interpret(self):
+        frame = self.globals
+        statements = self.parser.statements()
+        if self.memoize:
+            statements = self.parser.parse()
+            self.pure = pure_functions(statements, self.function_globals)
+        for node in statements:
+            statement = self.compile_statement(node)
+            frame.extend([None] * (self.scope.size - len(frame)))
+            statement(frame)
@@ -0,0 +1,290 @@
+import re
+
+# Estimated cycles per executed instruction, by mnemonic (a condition that fails still
+# costs its cycles). 'taken' is added when a branch or a POP into PC changes the flow,
+# 'transfer' for every register a PUSH or POP moves.
+CYCLES = {
+    'MOV': 1, 'MVN': 1, 'ADD': 1, 'SUB': 1, 'RSB': 1, 'CMP': 1,
+    'LSL': 1, 'LSR': 1, 'ASR': 1,
+    'MUL': 3, 'MLA': 3, 'SDIV': 10,
+    'LDR': 2, 'STR': 1, 'PUSH': 1, 'POP': 1,
+    'B': 1, 'BL': 1,
+    'taken': 2,
+    'transfer': 1,
+}
+CONDITIONS = ('EQ', 'NE', 'LT', 'GE', 'GT', 'LE')
+# Longest first, so that BL is not read as B with condition L.
+MNEMONICS = sorted((name for name in CYCLES if name.isupper()), key=len, reverse=True)
+REGISTER_NAMES = {**{f'R{n}': n for n in range(16)}, 'SP': 13, 'LR': 14, 'PC': 15}
+SP, LR, PC = 13, 14, 15
+STACK_TOP = 0x100000
+MAX_STEPS = 100_000_000
+# The runtime routine `BL print` calls: prints the integer in R0.
+PRINT = 'print'
+PROGRAM = '<program>'
+# What a call leaves in the caller-saved registers (0xDEADBEEF, as a signed word).
+CLOBBERED = 0xDEADBEEF - 0x100000000
+
+OPERAND = re.compile(r'\s*(\[[^\]]*\]|\{[^}]*\}|[^,]+)')
+
+def wrap(value):
+    """ `value` as a signed 32-bit integer. """
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+def divide(dividend, divisor):
+    """ SDIV: the quotient truncated toward zero; dividing by zero gives 0. """
+    if divisor == 0:
+        return 0
+    quotient = abs(dividend) // abs(divisor)
+    return wrap(-quotient if (dividend < 0) != (divisor < 0) else quotient)
+
+def split_operands(text):
+    return [operand.strip() for operand in OPERAND.findall(text) if operand.strip()]
+
+def split_mnemonic(word):
+    for mnemonic in MNEMONICS:
+        if word.startswith(mnemonic) and word[len(mnemonic):] in CONDITIONS + ('',):
+            return mnemonic, word[len(mnemonic):] or None
+    raise Exception(f"Unknown instruction: {word}")
+
+class ARMSimulator:
+    """
+    Runs the ARM subset `ARMGenerator` emits (and the peephole optimizer
+    rewrites): MOV/MVN, ADD/SUB/RSB, MUL/MLA/SDIV, shifts, CMP with conditional
+    execution, B/BL, LDR/STR (including `LDR Rd, =constant`) and PUSH/POP, on
+    sixteen 32-bit registers and a word-addressed stack memory.
+
+    Execution starts at the first line and stops when it runs past the last one.
+    `BL print` prints R0 and returns. Each executed instruction is counted under
+    its mnemonic and charged its cost from `cycles` (a table like `CYCLES`, whose
+    entries it overrides).
+    """
+    def __init__(self, assembly, cycles=None, max_steps=MAX_STEPS):
+        self.cycles_table = dict(CYCLES)
+        self.cycles_table.update(cycles or {})
+        self.max_steps = max_steps
+        self.labels = {}
+        self.lines = []
+        for line in assembly:
+            if line.endswith(':'):
+                self.labels[line[:-1]] = len(self.lines)
+            else:
+                self.lines.append(line)
+        self.program = [self.decode(line) for line in self.lines]
+
+    def __repr__(self):
+        return f"ARMSimulator({len(self.program)} instructions)"
+
+    def decode(self, line):
+        """ (mnemonic, condition, cost, arguments) for one line of assembly. """
+        word, _, rest = line.partition(' ')
+        mnemonic, condition = split_mnemonic(word)
+        operands = split_operands(rest)
+        cost = self.cycles_table[mnemonic]
+        if mnemonic in ('B', 'BL'):
+            return mnemonic, condition, cost, (operands[0],)
+        if mnemonic in ('PUSH', 'POP'):
+            registers = sorted(REGISTER_NAMES[name.strip()] for name in operands[0][1:-1].split(','))
+            return mnemonic, condition, cost + self.cycles_table['transfer'] * len(registers), (registers,)
+        if mnemonic in ('LDR', 'STR'):
+            if operands[1].startswith('='):
+                return mnemonic, condition, cost, (self.register(operands[0]), None, int(operands[1][1:]))
+            parts = [part.strip() for part in operands[1][1:-1].split(',')]
+            base = self.register(parts[0])
+            if len(parts) == 1:
+                offset = ('#', 0)
+            elif parts[1].startswith('#'):
+                offset = ('#', int(parts[1][1:]))
+            else:
+                shift = int(parts[2].split('#')[1]) if len(parts) > 2 else 0
+                offset = (self.register(parts[1]), shift)
+            return mnemonic, condition, cost, (self.register(operands[0]), base, offset)
+        registers = []
+        while operands and operands[0].upper() in REGISTER_NAMES:
+            registers.append(self.register(operands.pop(0)))
+        return mnemonic, condition, cost, (registers, self.operand2(operands))
+
+    def register(self, name):
+        try:
+            return REGISTER_NAMES[name.upper()]
+        except KeyError:
+            raise Exception(f"Unknown register: {name}")
+
+    def operand2(self, operands):
+        """ A trailing `#imm` or `LSL #n`-style shift of the last register operand, as ('#', value) or (shift, amount) or None. """
+        if not operands:
+            return None
+        if operands[0].startswith('#'):
+            return ('#', int(operands[0][1:]))
+        shift, amount = operands[0].split()
+        return (shift.upper(), int(amount[1:]))
+
+    def holds(self, condition):
+        n, z, v = self.n, self.z, self.v
+        if condition == 'EQ':
+            return z
+        if condition == 'NE':
+            return not z
+        if condition == 'LT':
+            return n != v
+        if condition == 'GE':
+            return n == v
+        if condition == 'GT':
+            return not z and n == v
+        return z or n != v
+
+    def run(self):
+        registers = self.registers = [0] * 16
+        registers[SP] = STACK_TOP
+        registers[LR] = len(self.program)
+        memory = self.memory = {}
+        self.n = self.z = self.v = self.c = False
+        counts = self.counts = {}
+        # Registers written, per function: BL enters one, POP into PC leaves it, B to one replaces it (a tail call).
+        functions = {arguments[0] for mnemonic, _, _, arguments in self.program if mnemonic == 'BL'} - {PRINT}
+        active = [PROGRAM]
+        pressure = self.pressure = {PROGRAM: set()}
+        written = pressure[PROGRAM]
+        self.lowest_sp = STACK_TOP
+        self.cycles = 0
+        self.steps = 0
+        self.output = []
+        table = self.cycles_table
+        program = self.program
+        end = len(program)
+        pc = 0
+        while pc < end:
+            mnemonic, condition, cost, arguments = program[pc]
+            counts[mnemonic] = counts.get(mnemonic, 0) + 1
+            self.cycles += cost
+            self.steps += 1
+            if self.steps > self.max_steps:
+                raise Exception(f"Step limit of {self.max_steps} instructions exceeded")
+            pc += 1
+            if condition is not None and not self.holds(condition):
+                continue
+            if mnemonic in ('B', 'BL'):
+                target = arguments[0]
+                if mnemonic == 'BL' and target == PRINT:
+                    self.print(registers[0])
+                    continue
+                if target not in self.labels:
+                    raise Exception(f"Unknown label: {target}")
+                if mnemonic == 'BL':
+                    registers[LR] = pc
+                    active.append(target)
+                elif target in functions:
+                    active[-1] = target
+                if target in functions:
+                    written = pressure.setdefault(target, set())
+                pc = self.labels[target]
+                self.cycles += table['taken']
+            elif mnemonic in ('LDR', 'STR'):
+                target, base, offset = arguments
+                if base is None:
+                    # LDR Rd, =constant
+                    registers[target] = wrap(offset)
+                    written.add(target)
+                    continue
+                offset, shift = offset
+                address = registers[base] + (shift if offset == '#' else registers[offset] << shift)
+                if address % 4:
+                    raise Exception(f"Unaligned access at {address:#x}")
+                if mnemonic == 'LDR':
+                    registers[target] = memory.get(address, 0)
+                    written.add(target)
+                else:
+                    memory[address] = registers[target]
+            elif mnemonic == 'PUSH':
+                registers[SP] -= 4 * len(arguments[0])
+                for index, register in enumerate(arguments[0]):
+                    memory[registers[SP] + 4 * index] = registers[register]
+                self.lowest_sp = min(self.lowest_sp, registers[SP])
+            elif mnemonic == 'POP':
+                for index, register in enumerate(arguments[0]):
+                    registers[register] = memory.get(registers[SP] + 4 * index, 0)
+                    written.add(register)
+                registers[SP] += 4 * len(arguments[0])
+                if PC in arguments[0]:
+                    pc = registers[PC]
+                    self.cycles += table['taken']
+                    active.pop()
+                    written = pressure[active[-1]]
+            else:
+                self.execute(mnemonic, arguments, written)
+                if registers[SP] < self.lowest_sp:
+                    self.lowest_sp = registers[SP]
+        return self
+
+    def execute(self, mnemonic, arguments, written):
+        """ A data-processing instruction: MOV, MVN, CMP, arithmetic or a shift. """
+        registers = self.registers
+        operands, last = arguments
+        values = [registers[register] for register in operands]
+        if last is not None:
+            kind, amount = last
+            if kind == '#':
+                values.append(amount)
+            elif kind == 'LSL':
+                values[-1] = wrap(values[-1] << amount)
+            elif kind == 'ASR':
+                values[-1] = values[-1] >> amount
+            elif kind == 'LSR':
+                values[-1] = (values[-1] & 0xFFFFFFFF) >> amount
+        if mnemonic == 'CMP':
+            left, right = values
+            difference = left - right
+            self.n = wrap(difference) < 0
+            self.z = wrap(difference) == 0
+            self.v = wrap(difference) != difference
+            self.c = (left & 0xFFFFFFFF) >= (right & 0xFFFFFFFF)
+            return
+        target = operands[0]
+        values = values[1:]
+        if mnemonic == 'MOV':
+            result = values[0]
+        elif mnemonic == 'MVN':
+            result = ~values[0]
+        elif mnemonic == 'ADD':
+            result = values[0] + values[1]
+        elif mnemonic == 'SUB':
+            result = values[0] - values[1]
+        elif mnemonic == 'RSB':
+            result = values[1] - values[0]
+        elif mnemonic == 'MUL':
+            result = values[0] * values[1]
+        elif mnemonic == 'MLA':
+            result = values[0] * values[1] + values[2]
+        elif mnemonic == 'SDIV':
+            result = divide(values[0], values[1])
+        elif mnemonic == 'LSL':
+            result = values[0] << values[1]
+        elif mnemonic == 'LSR':
+            result = (values[0] & 0xFFFFFFFF) >> values[1]
+        else:
+            result = values[0] >> values[1]
+        registers[target] = wrap(result)
+        written.add(target)
+
+    def print(self, value):
+        self.output.append(value)
+        print(value)
+        # Like any callee, the routine may leave anything in the caller-saved registers.
+        for register in (0, 1, 2, 3, 12):
+            self.registers[register] = CLOBBERED
+
+    def report(self):
+        """
+        What the last `run` cost: instructions executed (in all and by
+        mnemonic), estimated cycles, the stack used and, as register pressure,
+        how many of R0-R12 each function (and the program) wrote.
+        """
+        return {
+            'instructions': self.steps,
+            'cycles': self.cycles,
+            'counts': dict(sorted(self.counts.items())),
+            'register_pressure': {name: len({register for register in written if register < SP})
+                                  for name, written in self.pressure.items()},
+            'stack_bytes': STACK_TOP - self.lowest_sp,
+        }
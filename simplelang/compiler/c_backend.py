@@ -0,0 +1,611 @@
+import ctypes
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from simplelang.cache import default_cache_dir
+from simplelang.errors import MAX_DEPTH, StackOverflowError
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.cfg import CFG, ELEMENT, Liveness, defines, direct_calls, split_functions, uses
+from simplelang.compiler.tac_interpreter import TACInterpreter
+
+PROGRAM = '<program>'
+CFLAGS = ('-O2', '-shared', '-fPIC')
+# Native code runs on a thread of its own with this much stack; calls nesting
+# deeper than it allows end in a stack overflow, whatever `max_depth` says.
+STACK_BYTES = 256 * 2 ** 20
+STACK_MARGIN = 2 ** 20
+
+ARITHMETIC = {'+', '-', '*'}
+COMPARISONS = {'<', '>', '<=', '>=', '==', '!='}
+# How sl_run's print callback is told what it is printing.
+PRINT_KINDS = {'int': 0, 'bool': 1, 'float': 2}
+OK, ERROR, STACK_OVERFLOW = range(3)
+
+RUNTIME = r'''
+#include <setjmp.h>
+#include <stdarg.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+enum { SL_OK, SL_ERROR, SL_STACK_OVERFLOW };
+
+typedef union sl_value {
+    int64_t i;
+    double f;
+    struct sl_array *a;
+} sl_value;
+
+typedef struct sl_array {
+    struct sl_array *next;
+    int64_t length;
+    sl_value items[];
+} sl_array;
+
+static void (*sl_print)(int64_t, double, int);
+static jmp_buf sl_failure;
+static int sl_status;
+static char *sl_message;
+static size_t sl_message_size;
+static int64_t sl_depth, sl_max_depth;
+static uintptr_t sl_stack_limit;
+/* Every array allocated by the run, freed when it ends. */
+static sl_array *sl_arrays;
+
+static void sl_fail(int status, const char *format, ...) {
+    va_list arguments;
+    va_start(arguments, format);
+    vsnprintf(sl_message, sl_message_size, format, arguments);
+    va_end(arguments);
+    sl_status = status;
+    longjmp(sl_failure, 1);
+}
+
+/* Counts the call against `max_depth` and checks the machine stack has room for it. */
+#define SL_ENTER(name) do { \
+        char sl_probe; \
+        if (++sl_depth > sl_max_depth || (uintptr_t)&sl_probe < sl_stack_limit) \
+            sl_fail(SL_STACK_OVERFLOW, "%s", name); \
+    } while (0)
+/* Leaves the frame before evaluating `value`, so that a call there is a tail call. */
+#define SL_RETURN(value) do { sl_depth--; return value; } while (0)
+
+static sl_array *sl_alloc(int64_t length) {
+    sl_array *array = calloc(1, sizeof(sl_array) + length * sizeof(sl_value));
+    if (array == NULL) {
+        sl_fail(SL_ERROR, "Out of memory");
+    }
+    array->length = length;
+    array->next = sl_arrays;
+    sl_arrays = array;
+    return array;
+}
+
+static inline sl_value *sl_element(sl_array *array, int64_t index, const char *name) {
+    if (array == NULL) {
+        sl_fail(SL_ERROR, "Undefined array: %s", name);
+    }
+    if (index < 0 || index >= array->length) {
+        sl_fail(SL_ERROR, "Index out of bounds: %lld", (long long)index);
+    }
+    return &array->items[index];
+}
+
+static void sl_arguments(sl_array *array, int64_t count, const char *name) {
+    if (array == NULL || array->length != count) {
+        sl_fail(SL_ERROR, "Argument mismatch for function: %s", name);
+    }
+}
+
+static inline double sl_divide(double left, double right) {
+    if (right == 0) {
+        sl_fail(SL_ERROR, "Division by zero");
+    }
+    return left / right;
+}
+'''
+
+ENTRY = r'''
+int sl_run(void (*print)(int64_t, double, int), int64_t max_depth, int64_t stack_bytes,
+           char *message, size_t size, int64_t *depth) {
+    char base;
+    sl_print = print;
+    sl_max_depth = max_depth;
+    sl_depth = 0;
+    sl_stack_limit = (uintptr_t)&base - (uintptr_t)stack_bytes;
+    sl_message = message;
+    sl_message_size = size;
+    sl_status = SL_OK;
+    if (setjmp(sl_failure) == 0) {
+        sl_program();
+    }
+    *depth = sl_depth;
+    while (sl_arrays != NULL) {
+        sl_array *next = sl_arrays->next;
+        free(sl_arrays);
+        sl_arrays = next;
+    }
+    return sl_status;
+}
+'''
+
+class Unsupported(Exception):
+    """ The program needs something native code does not model; it runs on the TAC interpreter instead. """
+
+class CompileError(Exception):
+    pass
+
+def mangle(prefix, name):
+    """ A C identifier for SimpleLang `name`, which may contain `$` (hoisted invariants) or `.` (SSA versions). """
+    return prefix + ''.join(c if c.isalnum() else '__' if c == '_' else f'_{ord(c):x}_' for c in name)
+
+def join(kind, other, name):
+    """ The kind of a name holding values of both kinds, or Unsupported when they differ. """
+    if kind is None or kind == other:
+        return other
+    if other is None:
+        return kind
+    if isinstance(kind, tuple) and isinstance(other, tuple):
+        return ('array', join(kind[1], other[1], f'{name}[]'))
+    raise Unsupported(f"{name} holds both {describe(kind)} and {describe(other)} values")
+
+def describe(kind):
+    return f'array of {describe(kind[1])}' if isinstance(kind, tuple) else kind or 'unknown'
+
+def ctype(kind):
+    if isinstance(kind, tuple):
+        return 'sl_array *'
+    return 'double' if kind == 'float' else 'int64_t'
+
+def field(kind):
+    """ The `sl_value` member an array element of `kind` is kept in. """
+    if isinstance(kind, tuple):
+        return 'a'
+    return 'f' if kind == 'float' else 'i'
+
+class CGenerator:
+    """
+    Translates TAC into a C translation unit exporting
+    `int sl_run(print, max_depth, stack_bytes, message, size, depth)`.
+
+    Every SimpleLang function becomes a C function and every variable a C local,
+    typed by a kind inferred over the whole program: `int64_t` for integers and
+    booleans, `double` for floats (what `/` produces, as in the interpreter),
+    or a pointer to a heap array of such elements. A name that would hold values
+    of two kinds, an array printed, compared or tested, or a constant C has no
+    literal for raises `Unsupported`. Integer arithmetic wraps at 64 bits
+    instead of growing. C has no value for what the interpreter sees as None,
+    so a variable that may be read before it is set (in a function, any name
+    that is not a parameter or assigned there first) and the used result of a
+    function that may end without `return` raise `Unsupported` too. So does a
+    definition that is nested or may run after a call, as C binds functions
+    before the program starts.
+
+    Errors (division by zero, a bad index, a call that does not match a
+    function) end the run with the interpreter's message; more than
+    `max_depth` nested calls, or than fit in `stack_bytes` of stack, end it
+    with a stack overflow, leaving the depth reached in `depth`. Tail calls of a
+    function to itself jump back to its start, so they never nest. Output goes
+    through `print`, a callback taking (integer, float, kind) with kind from
+    `PRINT_KINDS`.
+    """
+    def __init__(self, tac):
+        self.tac = tac
+        main, functions = split_functions(tac.code, anchored=True)
+        self.units = {PROGRAM: ((), direct_calls([quad for quad in main if quad[0] != 'def']))}
+        for name, _, body in functions:
+            if name in self.units:
+                raise Unsupported(f"function {name} is defined more than once")
+            for quad in body:
+                if quad[0] == 'def':
+                    raise Unsupported(f"function {quad[3]} is defined inside {name}")
+            self.units[name] = (tuple(tac.functions.get(name, ())), direct_calls(body))
+        self.check_definitions(main)
+        self.kinds = {name: {} for name in self.units}
+        self.returns = {name: None for name in self.units}
+
+    def __repr__(self):
+        return f"CGenerator({len(self.units) - 1} functions)"
+
+    def source(self):
+        self.check_values()
+        self.infer()
+        lines = [RUNTIME]
+        for name in self.units:
+            if name != PROGRAM:
+                lines.append(self.signature(name) + ';')
+        lines.append('static void sl_program(void);')
+        for name in self.units:
+            if name != PROGRAM:
+                lines.extend(self.function(name))
+        lines.extend(self.function(PROGRAM))
+        lines.append(ENTRY)
+        return '\n'.join(lines)
+
+    def infer(self):
+        """ Fill `kinds` and `returns`; names nothing gives a kind (see the class docstring) are integers. """
+        while True:
+            self.changed = True
+            while self.changed:
+                self.changed = False
+                for unit, (parameters, code) in self.units.items():
+                    for quad in code:
+                        self.infer_quad(unit, quad)
+            unknown = False
+            for unit, (parameters, code) in self.units.items():
+                kinds = self.kinds[unit]
+                names = set(parameters)
+                for quad in code:
+                    names.update(name for name in uses(quad) + (defines(quad),) if name is not None)
+                for name in names:
+                    if kinds.get(name) is None:
+                        kinds[name] = 'int'
+                        unknown = True
+            if not unknown:
+                return
+
+    def check_definitions(self, main):
+        """ Raise `Unsupported` unless every call the program makes runs after every definition. """
+        if not main:
+            return
+        cfg = CFG(main)
+        dominators = cfg.dominators()
+        definitions = [position for position, quad in enumerate(main) if quad[0] == 'def']
+        for position, (op, arg1, _, _) in enumerate(main):
+            if op not in ('call', 'tailcall'):
+                continue
+            block = cfg.block_of(position).index
+            if not dominators[block]:
+                continue
+            for definition in definitions:
+                defined = cfg.block_of(definition).index
+                if not dominators[block] >> defined & 1 or (defined == block and definition > position):
+                    raise Unsupported(f"function {main[definition][3]} may be defined after {arg1} is called")
+
+    def check_values(self):
+        """ Raise `Unsupported` where the interpreter could see None (see the class docstring). """
+        ends = {}
+        tails = {}
+        for unit, (parameters, code) in self.units.items():
+            cfg = CFG(code)
+            liveness = Liveness(cfg)
+            unset = liveness.names(liveness.live_in[cfg.entry.index]) - set(parameters)
+            if unset:
+                where = '' if unit == PROGRAM else f' in {unit}'
+                raise Unsupported(f"{min(unset)} may be read before it is set{where}")
+            reachable = cfg.postorder()
+            ends[unit] = any(block.end == block.start or cfg.code[block.end - 1][0] not in ('return', 'tailcall')
+                             for block in reachable if block in cfg.exits)
+            tails[unit] = {quad[1] for block in reachable for quad in cfg.quads(block)
+                           if quad[0] == 'tailcall' and quad[1] in self.units}
+        # Handing back what a tail call returns, a function also ends without `return` when its callee can.
+        changed = True
+        while changed:
+            changed = False
+            for unit, callees in tails.items():
+                if not ends[unit] and any(ends[callee] for callee in callees):
+                    ends[unit] = changed = True
+        for unit, (_, code) in self.units.items():
+            read = {name for quad in code for name in uses(quad)}
+            for op, arg1, _, result in code:
+                if op == 'call' and result in read and ends.get(arg1):
+                    raise Unsupported(f"{arg1} may end without return, but its result is used")
+
+    def define(self, unit, name, kind):
+        kinds = self.kinds[unit]
+        joined = join(kinds.get(name), kind, name)
+        if joined != kinds.get(name):
+            kinds[name] = joined
+            self.changed = True
+
+    def kind(self, unit, value):
+        if isinstance(value, bool):
+            return 'bool'
+        if isinstance(value, int):
+            return 'int'
+        if isinstance(value, float):
+            return 'float'
+        if isinstance(value, str):
+            return self.kinds[unit].get(value)
+        raise Unsupported(f"constant {value!r}")
+
+    def numeric(self, unit, value):
+        kind = self.kind(unit, value)
+        if isinstance(kind, tuple):
+            raise Unsupported(f"{value} is an array used as a number")
+        return kind
+
+    def infer_quad(self, unit, quad):
+        op, arg1, arg2, result = quad
+        if op == '=':
+            if ELEMENT.match(result):
+                array, index = ELEMENT.match(result).groups()
+                self.numeric(unit, int(index) if index.isdigit() else index)
+                self.define(unit, array, ('array', self.kind(unit, arg1)))
+            elif isinstance(arg1, str) and ELEMENT.match(arg1):
+                array, index = ELEMENT.match(arg1).groups()
+                self.numeric(unit, int(index) if index.isdigit() else index)
+                kind = self.kind(unit, array)
+                if kind is not None and not isinstance(kind, tuple):
+                    raise Unsupported(f"{array} is indexed but holds {describe(kind)} values")
+                self.define(unit, result, kind and kind[1])
+            else:
+                self.define(unit, result, self.kind(unit, arg1))
+        elif op in ARITHMETIC:
+            left, right = self.numeric(unit, arg1), self.numeric(unit, arg2)
+            if left is not None and right is not None:
+                self.define(unit, result, 'float' if 'float' in (left, right) else 'int')
+        elif op == '/':
+            self.numeric(unit, arg1), self.numeric(unit, arg2)
+            self.define(unit, result, 'float')
+        elif op in COMPARISONS:
+            self.numeric(unit, arg1), self.numeric(unit, arg2)
+            self.define(unit, result, 'bool')
+        elif op in ('&&', '||'):
+            # The result is one of the operands, so both must be of one kind.
+            left, right = self.numeric(unit, arg1), self.numeric(unit, arg2)
+            if left is not None and right is not None:
+                self.define(unit, result, join(left, right, f'{arg1} {op} {arg2}'))
+        elif op in ('ifFalse', 'print'):
+            self.numeric(unit, arg1)
+        elif op == 'alloc':
+            self.define(unit, result, ('array', None))
+        elif op in ('call', 'tailcall'):
+            if arg1 not in self.units:
+                return
+            parameters = self.units[arg1][0]
+            if isinstance(arg2, tuple):
+                arguments = [self.kind(unit, value) for value in arg2]
+            else:
+                array = self.kind(unit, arg2)
+                arguments = [array[1] if isinstance(array, tuple) else None] * len(parameters)
+            if len(arguments) == len(parameters):
+                for parameter, kind in zip(parameters, arguments):
+                    self.define(arg1, parameter, kind)
+            if op == 'call' and result is not None:
+                self.define(unit, result, self.returns[arg1])
+            elif op == 'tailcall':
+                self.returned(unit, self.returns[arg1])
+        elif op == 'return':
+            if unit != PROGRAM:
+                self.returned(unit, self.kind(unit, arg1))
+        elif op not in ('goto', 'label'):
+            raise Unsupported(f"TAC op {op}")
+
+    def returned(self, unit, kind):
+        joined = join(self.returns[unit], kind, f'the result of {unit}')
+        if joined != self.returns[unit]:
+            self.returns[unit] = joined
+            self.changed = True
+
+    def signature(self, name):
+        parameters, _ = self.units[name]
+        kinds = self.kinds[name]
+        declared = ', '.join(f'{ctype(kinds[parameter])} {mangle("v_", parameter)}' for parameter in parameters)
+        return f'static {ctype(self.returns[name] or "int")} {mangle("f_", name)}({declared or "void"})'
+
+    def function(self, name):
+        parameters, code = self.units[name]
+        kinds = self.kinds[name]
+        if name == PROGRAM:
+            lines = ['static void sl_program(void) {']
+        else:
+            lines = [self.signature(name) + ' {']
+        for variable in sorted(set(kinds) - set(parameters)):
+            lines.append(f'    {ctype(kinds[variable])} {mangle("v_", variable)} = 0;')
+        if name != PROGRAM:
+            lines.append(f'    SL_ENTER("{name}");')
+            lines.append('sl_entry: ;')
+        self.unit = name
+        for quad in code:
+            lines.extend(self.statement(quad))
+        lines.append('    SL_RETURN(0);' if name != PROGRAM else '    return;')
+        lines.append('}')
+        return lines
+
+    def value(self, value):
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, int):
+            if not -2 ** 63 <= value < 2 ** 63:
+                raise Unsupported(f"constant {value} does not fit 64 bits")
+            return f'INT64_C({value})' if abs(value) >= 2 ** 31 else f'{value}'
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                raise Unsupported(f"constant {value}")
+            return repr(value)
+        return mangle('v_', value)
+
+    def element(self, operand):
+        """ C for the `sl_value` an element operand names (checked against the array's bounds). """
+        array, index = ELEMENT.match(operand).groups()
+        index = self.value(int(index) if index.isdigit() else index)
+        return f'sl_element({mangle("v_", array)}, {index}, "{array}")->{field(self.kinds[self.unit][array][1])}'
+
+    def statement(self, quad):
+        op, arg1, arg2, result = quad
+        kinds = self.kinds[self.unit]
+        if op == 'label':
+            return [f'{mangle("L_", result)}: ;']
+        if op == '=':
+            if ELEMENT.match(result):
+                return [f'    {self.element(result)} = {self.value(arg1)};']
+            if isinstance(arg1, str) and ELEMENT.match(arg1):
+                return [f'    {self.value(result)} = {self.element(arg1)};']
+            return [f'    {self.value(result)} = {self.value(arg1)};']
+        if op in ARITHMETIC:
+            left, right = self.value(arg1), self.value(arg2)
+            if kinds[result] == 'float':
+                return [f'    {self.value(result)} = {left} {op} {right};']
+            # Unsigned arithmetic wraps where signed overflow would be undefined.
+            return [f'    {self.value(result)} = (int64_t)((uint64_t){left} {op} (uint64_t){right});']
+        if op == '/':
+            return [f'    {self.value(result)} = sl_divide({self.value(arg1)}, {self.value(arg2)});']
+        if op in COMPARISONS:
+            return [f'    {self.value(result)} = {self.value(arg1)} {op} {self.value(arg2)};']
+        if op == '&&':
+            return [f'    {self.value(result)} = {self.value(arg1)} ? {self.value(arg2)} : {self.value(arg1)};']
+        if op == '||':
+            return [f'    {self.value(result)} = {self.value(arg1)} ? {self.value(arg1)} : {self.value(arg2)};']
+        if op == 'goto':
+            return [f'    goto {mangle("L_", result)};']
+        if op == 'ifFalse':
+            return [f'    if (!{self.value(arg1)}) goto {mangle("L_", result)};']
+        if op == 'print':
+            kind = self.kind(self.unit, arg1)
+            if kind == 'float':
+                return [f'    sl_print(0, {self.value(arg1)}, {PRINT_KINDS[kind]});']
+            return [f'    sl_print({self.value(arg1)}, 0, {PRINT_KINDS[kind]});']
+        if op == 'alloc':
+            return [f'    {self.value(result)} = sl_alloc({arg1});']
+        if op in ('call', 'tailcall'):
+            return self.call(op, arg1, arg2, result)
+        if op == 'return':
+            if self.unit == PROGRAM:
+                return ['    return;']
+            return [f'    SL_RETURN({self.value(arg1)});']
+        raise Unsupported(f"TAC op {op}")
+
+    def call(self, op, name, arguments, result):
+        if name not in self.units:
+            return [f'    sl_fail(SL_ERROR, "Undefined function: %s", "{name}");']
+        parameters = self.units[name][0]
+        lines = []
+        if isinstance(arguments, tuple):
+            if len(arguments) != len(parameters):
+                return [f'    sl_fail(SL_ERROR, "Argument mismatch for function: %s", "{name}");']
+            values = [self.value(value) for value in arguments]
+        else:
+            lines.append(f'    sl_arguments({self.value(arguments)}, {len(parameters)}, "{name}");')
+            values = [self.element(f'{arguments}[{index}]') for index in range(len(parameters))]
+        if op == 'tailcall' and name == self.unit:
+            # Reuse the frame: bind the new arguments all at once, then start over.
+            kinds = self.kinds[name]
+            temporaries = [f'{ctype(kinds[parameter])} sl_a{index} = {value};'
+                           for index, (parameter, value) in enumerate(zip(parameters, values))]
+            bindings = [f'{mangle("v_", parameter)} = sl_a{index};' for index, parameter in enumerate(parameters)]
+            lines.append(f"    {{ {' '.join(temporaries + bindings)} }}")
+            lines.append('    goto sl_entry;')
+            return lines
+        call = f'{mangle("f_", name)}({", ".join(values)})'
+        if op == 'tailcall':
+            lines.append(f'    SL_RETURN({call});')
+        elif result is not None:
+            lines.append(f'    {self.value(result)} = {call};')
+        else:
+            lines.append(f'    {call};')
+        return lines
+
+def find_compiler():
+    """ The C compiler to use: $CC, else `cc`, if it is on the PATH; None when there is none. """
+    return shutil.which(os.environ.get('CC') or 'cc')
+
+def build(source, directory, compiler):
+    """
+    Path of a shared object compiled from C `source` by `compiler`, kept in
+    `directory` under a hash of the compiler, its flags and the source, so the
+    same program is compiled only once. Objects are built in a temporary
+    directory and renamed into place.
+    """
+    digest = hashlib.sha256(f"{compiler}\0{' '.join(CFLAGS)}\0{sys.platform}\0".encode())
+    digest.update(source.encode())
+    path = os.path.join(directory, digest.hexdigest() + '.so')
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as work:
+        source_path = os.path.join(work, 'program.c')
+        with open(source_path, 'w') as file:
+            file.write(source)
+        library = os.path.join(work, 'program.so')
+        completed = subprocess.run([compiler, *CFLAGS, '-o', library, source_path], capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise CompileError(f"{compiler} failed: {completed.stderr.strip()}")
+        os.replace(library, path)
+    return path
+
+PRINTER = ctypes.CFUNCTYPE(None, ctypes.c_int64, ctypes.c_double, ctypes.c_int)
+
+def print_value(integer, real, kind):
+    print(bool(integer) if kind == PRINT_KINDS['bool'] else real if kind == PRINT_KINDS['float'] else integer)
+
+class CInterpreter:
+    """
+    Engine running a program as native code: its TAC (optimized by
+    `optimizer`, a `TACOptimizer`) goes through `CGenerator`, the local C
+    compiler and `ctypes`. Compiled programs are cached in the `c`
+    subdirectory of `cache_dir` (default: the compilation cache's directory).
+
+    When there is no compiler, it fails, or the program is `Unsupported`, the
+    same TAC runs on the `TACInterpreter` instead and `fallback` says why.
+    """
+    def __init__(self, parser, max_depth=None, optimizer=None, cache_dir=None, compiler=None):
+        self.parser = parser
+        self.max_depth = max_depth
+        self.optimizer = optimizer
+        self.cache_dir = cache_dir
+        self.compiler = compiler
+        self.fallback = None
+        self.variables = {}
+
+    def __repr__(self):
+        return f"CInterpreter({repr(self.parser)}, fallback={repr(self.fallback)})"
+
+    def compile(self):
+        tac = TAC()
+        for node in self.parser.parse():
+            tac.generate_tac(node)
+        if self.optimizer is not None:
+            tac = self.optimizer.optimize(tac)
+        return tac
+
+    def source(self):
+        return CGenerator(self.compile()).source()
+
+    def interpret(self):
+        self.run(self.compile())
+
+    def run(self, tac):
+        try:
+            source = CGenerator(tac).source()
+            compiler = self.compiler or find_compiler()
+            if compiler is None:
+                raise CompileError("no C compiler found")
+            library = ctypes.CDLL(build(source, os.path.join(self.cache_dir or default_cache_dir(), 'c'), compiler))
+        except (Unsupported, CompileError, OSError) as error:
+            self.fallback = str(error)
+            interpreter = TACInterpreter(None, self.max_depth or MAX_DEPTH)
+            interpreter.run(tac)
+            self.variables = interpreter.variables
+            return
+        self.run_native(library)
+
+    def run_native(self, library):
+        run = library.sl_run
+        run.argtypes = (PRINTER, ctypes.c_int64, ctypes.c_int64, ctypes.c_char_p, ctypes.c_size_t,
+                        ctypes.POINTER(ctypes.c_int64))
+        run.restype = ctypes.c_int
+        message = ctypes.create_string_buffer(256)
+        depth = ctypes.c_int64()
+        printer = PRINTER(print_value)
+        outcome = []
+        previous = threading.stack_size(STACK_BYTES)
+        try:
+            thread = threading.Thread(target=lambda: outcome.append(
+                run(printer, self.max_depth or MAX_DEPTH, STACK_BYTES - STACK_MARGIN, message, len(message), depth)),
+                daemon=True)
+            thread.start()
+        finally:
+            threading.stack_size(previous)
+        thread.join()
+        status = outcome[0]
+        if status == STACK_OVERFLOW:
+            raise StackOverflowError(message.value.decode(), depth.value - 1)
+        if status != OK:
+            raise Exception(message.value.decode())
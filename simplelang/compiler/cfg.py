@@ -0,0 +1,549 @@
+import heapq
+import re
+
+from simplelang.compiler.tac import BINARY_OPS
+
+ELEMENT = re.compile(r'^(.+)\[(.+)\]$')
+
+JUMPS = {'goto', 'ifFalse'}
+# Quads after which control never falls through to the next one.
+TERMINATORS = {'goto', 'return', 'tailcall'}
+
+def split_functions(code, anchored=False):
+    """
+    Split a TAC listing into the top-level program and its functions.
+
+    Returns (main, functions): `main` is the program's quads with every function
+    removed, `functions` a list of (name, parameter count, body quads) in order of
+    definition, nested functions included. Bodies exclude the `label`/`beginFunc`/
+    `endFunc` wrapper. `join_functions` puts the pieces back together.
+
+    With `anchored`, every definition leaves a `('def', index, None, name)` quad
+    where it was, `index` being its position in `functions`, so that joining puts
+    it back there: definitions take effect when they are run.
+    """
+    main = []
+    functions = []
+    open_functions = []
+    for quad in code:
+        op = quad[0]
+        if op == 'beginFunc':
+            # The function's name is the label just before `beginFunc`.
+            enclosing = open_functions[-1] if open_functions else main
+            name = enclosing.pop()[3]
+            if anchored:
+                enclosing.append(('def', len(functions), None, name))
+            open_functions.append([])
+            functions.append((name, quad[1], open_functions[-1]))
+        elif op == 'endFunc':
+            open_functions.pop()
+        elif open_functions:
+            open_functions[-1].append(quad)
+        else:
+            main.append(quad)
+    return main, functions
+
+def join_functions(main, functions, anchored=False):
+    """
+    A TAC listing running `main` with every function in `functions` defined:
+    in front of it, or with `anchored` (see `split_functions`) at their `def`
+    quads. Functions whose `def` is gone are left out.
+    """
+    def define(index):
+        name, parameter_count, body = functions[index]
+        return ([('label', None, None, name), ('beginFunc', parameter_count, None, None)]
+                + place(body) + [('endFunc', None, None, None)])
+
+    def place(quads):
+        if not anchored:
+            return list(quads)
+        code = []
+        for quad in quads:
+            code.extend(define(quad[1]) if quad[0] == 'def' else [quad])
+        return code
+
+    code = []
+    if not anchored:
+        for index in range(len(functions)):
+            code.extend(define(index))
+    return code + place(main)
+
+def operand_names(value):
+    """ The variables read when `value` is used as an operand (an element operand reads the array and index). """
+    if not isinstance(value, str):
+        return ()
+    match = ELEMENT.match(value)
+    if match is None:
+        return (value,)
+    array, index = match.groups()
+    return (array,) if index.isdigit() else (array, index)
+
+def uses(quad):
+    """ Names of the variables `quad` reads. """
+    op, arg1, arg2, result = quad
+    if op == '=':
+        names = operand_names(arg1)
+        if isinstance(result, str) and ELEMENT.match(result):
+            # Storing into an element reads the array (and index); it does not redefine the array.
+            names += operand_names(result)
+        return names
+    if op in BINARY_OPS:
+        return operand_names(arg1) + operand_names(arg2)
+    if op in ('ifFalse', 'print', 'return'):
+        return operand_names(arg1)
+    if op in ('call', 'tailcall'):
+        if isinstance(arg2, tuple):
+            # After `direct_calls`, the argument operands themselves instead of an array.
+            return tuple(name for value in arg2 for name in operand_names(value))
+        return operand_names(arg2)
+    if op == 'phi':
+        # SSA form (see ssa.py): arg1 holds (predecessor label, value) pairs.
+        return tuple(name for _, value in arg1 for name in operand_names(value))
+    return ()
+
+def defines(quad):
+    """ The variable `quad` assigns, or None. """
+    op, _, _, result = quad
+    if op in BINARY_OPS or op in ('alloc', 'call', 'phi') or (op == '=' and not ELEMENT.match(result)):
+        return result
+    return None
+
+def direct_calls(code):
+    """
+    `code` with each call whose argument array is only filled and then passed
+    to it taking the tuple of the element values instead: the `alloc`, the
+    element stores and the call become one call quad. The native backends pass
+    such arguments in registers rather than through an array.
+    """
+    read = {}
+    for quad in code:
+        for name in uses(quad):
+            read[name] = read.get(name, 0) + 1
+    direct = []
+    position = 0
+    while position < len(code):
+        quad = code[position]
+        if quad[0] == 'alloc':
+            arguments = call_arguments(code, position, read)
+            if arguments is not None:
+                op, name, _, target = code[position + len(arguments) + 1]
+                direct.append((op, name, arguments, target))
+                position += len(arguments) + 2
+                continue
+        direct.append(quad)
+        position += 1
+    return direct
+
+def call_arguments(code, position, read):
+    """ The argument values when code[position] allocates an array only filled and passed to the next call, else None. """
+    _, count, _, array = code[position]
+    end = position + count + 1
+    if end >= len(code) or read.get(array) != count + 1:
+        return None
+    call = code[end]
+    if call[0] not in ('call', 'tailcall') or call[2] != array:
+        return None
+    arguments = []
+    for index, (op, value, _, target) in enumerate(code[position + 1:end]):
+        if op != '=' or target != f'{array}[{index}]' or (isinstance(value, str) and ELEMENT.match(value)):
+            return None
+        arguments.append(value)
+    return tuple(arguments)
+
+class BasicBlock:
+    """ Quads `start` up to `end` (exclusive) of a CFG's code: control enters only at the first and leaves only after the last. """
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.successors = []
+        self.predecessors = []
+
+    def __repr__(self):
+        return f"BasicBlock({self.index}, {self.start}:{self.end}, successors={[block.index for block in self.successors]})"
+
+class Loop:
+    """ A natural loop: `header`, the indices of its `blocks` (header included) and the `latches` jumping back to the header. """
+    def __init__(self, header):
+        self.header = header
+        self.blocks = {header.index}
+        self.latches = []
+
+    def __repr__(self):
+        return f"Loop(header={self.header.index}, blocks={sorted(self.blocks)})"
+
+def positions(mask):
+    """ The positions of the set bits of `mask`, lowest first. """
+    found = []
+    while mask:
+        low = mask & -mask
+        found.append(low.bit_length() - 1)
+        mask ^= low
+    return found
+
+class Universe:
+    """ Numbers a set of items so that sets of them can be held as bit sets (Python ints). """
+    def __init__(self, items=()):
+        self.items = []
+        self.bits = {}
+        for item in items:
+            self.add(item)
+
+    def __repr__(self):
+        return f"Universe({len(self.items)} items)"
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item not in self.bits:
+            self.bits[item] = len(self.items)
+            self.items.append(item)
+        return self.bits[item]
+
+    def bit(self, item):
+        return 1 << self.bits[item]
+
+    def mask(self, items):
+        mask = 0
+        for item in items:
+            mask |= 1 << self.bits[item]
+        return mask
+
+    def members(self, mask):
+        """ The items in bit set `mask`. """
+        return [self.items[position] for position in positions(mask)]
+
+    @property
+    def full(self):
+        return (1 << len(self.items)) - 1
+
+class CFG:
+    """
+    Control-flow graph of one unit of TAC: the top-level program or a function
+    body (see `split_functions`).
+
+    A block starts at the first quad, at every label and after every jump,
+    `return` and `tailcall`. `goto` has its target as only successor, `ifFalse`
+    its target and the next block; `return` and `tailcall` leave the unit, as
+    does the last block when it falls off the end. Those blocks are `exits`.
+    """
+    def __init__(self, code):
+        self.code = list(code)
+        self.blocks = []
+        self.labels = {}
+        self.exits = []
+        leaders = {0}
+        for position, (op, _, _, result) in enumerate(self.code):
+            if op == 'label':
+                leaders.add(position)
+            elif op in JUMPS or op in TERMINATORS:
+                leaders.add(position + 1)
+        leaders = sorted(leader for leader in leaders if leader < len(self.code)) or [0]
+        for index, start in enumerate(leaders):
+            end = leaders[index + 1] if index + 1 < len(leaders) else len(self.code)
+            block = BasicBlock(index, start, end)
+            self.blocks.append(block)
+            position = start
+            while position < end and self.code[position][0] == 'label':
+                self.labels[self.code[position][3]] = block
+                position += 1
+        for block in self.blocks:
+            last = self.code[block.end - 1] if block.end > block.start else ('label', None, None, None)
+            following = self.blocks[block.index + 1] if block.index + 1 < len(self.blocks) else None
+            op = last[0]
+            if op in JUMPS:
+                target = self.labels.get(last[3])
+                if target is None:
+                    raise Exception(f"Unknown label: {last[3]}")
+                block.successors.append(target)
+            if op in ('return', 'tailcall') or (op not in TERMINATORS and following is None):
+                self.exits.append(block)
+            elif op != 'goto' and following is not None and following not in block.successors:
+                block.successors.append(following)
+        for block in self.blocks:
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def __repr__(self):
+        return f"CFG({len(self.code)} quads, {len(self.blocks)} blocks)"
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def quads(self, block):
+        return self.code[block.start:block.end]
+
+    def block_of(self, position):
+        """ The block holding quad `position`. """
+        low, high = 0, len(self.blocks) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.blocks[middle].start <= position:
+                low = middle
+            else:
+                high = middle - 1
+        return self.blocks[low]
+
+    def postorder(self):
+        """ Blocks reachable from the entry, each after all of its DFS descendants. """
+        order = []
+        visited = {self.entry.index}
+        stack = [(self.entry, iter(self.entry.successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if successor.index not in visited:
+                    visited.add(successor.index)
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        return order
+
+    def reverse_postorder(self):
+        return self.postorder()[::-1]
+
+    def dominators(self):
+        """
+        dominators[i]: bit set of the blocks dominating block i (itself included),
+        or 0 for a block unreachable from the entry.
+        """
+        blocks = Universe(range(len(self.blocks)))
+        gen = [blocks.bit(block.index) for block in self.blocks]
+        kill = [0] * len(self.blocks)
+        reachable = blocks.mask(block.index for block in self.postorder())
+        _, out = solve(self, gen, kill, forward=True, meet=INTERSECTION, boundary=0, top=blocks.full)
+        return [dominated if reachable >> index & 1 else 0 for index, dominated in enumerate(out)]
+
+    def immediate_dominators(self):
+        """
+        idom[i]: the block index immediately dominating block i, or None for the
+        entry and unreachable blocks (Cooper, Harvey and Kennedy's iteration).
+        """
+        order = self.reverse_postorder()
+        number = {block.index: position for position, block in enumerate(order)}
+        idom = [None] * len(self.blocks)
+        idom[self.entry.index] = self.entry.index
+
+        def intersect(first, second):
+            while first != second:
+                while number[first] > number[second]:
+                    first = idom[first]
+                while number[second] > number[first]:
+                    second = idom[second]
+            return first
+
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new = None
+                for predecessor in block.predecessors:
+                    if idom[predecessor.index] is not None:
+                        new = predecessor.index if new is None else intersect(predecessor.index, new)
+                if idom[block.index] != new:
+                    idom[block.index] = new
+                    changed = True
+        idom[self.entry.index] = None
+        return idom
+
+    def dominance_frontiers(self):
+        """
+        frontiers[i]: indices of the blocks where block i's dominance ends, i.e.
+        that have a predecessor dominated by block i without being strictly
+        dominated by it themselves. Empty for unreachable blocks.
+        """
+        idom = self.immediate_dominators()
+        frontiers = [set() for _ in self.blocks]
+        for block in self.blocks:
+            if len(block.predecessors) < 2 or (idom[block.index] is None and block is not self.entry):
+                continue
+            for predecessor in block.predecessors:
+                if idom[predecessor.index] is None and predecessor is not self.entry:
+                    continue
+                runner = predecessor.index
+                while runner is not None and runner != idom[block.index]:
+                    frontiers[runner].add(block.index)
+                    runner = idom[runner]
+        return frontiers
+
+    def natural_loops(self):
+        """
+        The natural loops of the graph, innermost (smallest) first. Every edge to
+        a block dominating its source is a back edge; the loop it closes is the
+        header plus all blocks reaching the latch without passing the header.
+        Back edges to the same header make one loop.
+        """
+        dominators = self.dominators()
+        loops = {}
+        for block in self.blocks:
+            for header in block.successors:
+                if not dominators[block.index] >> header.index & 1:
+                    continue
+                loop = loops.get(header.index)
+                if loop is None:
+                    loop = loops[header.index] = Loop(header)
+                loop.latches.append(block)
+                stack = [block]
+                while stack:
+                    current = stack.pop()
+                    if current.index not in loop.blocks and dominators[current.index] >> header.index & 1:
+                        loop.blocks.add(current.index)
+                        stack.extend(current.predecessors)
+        return sorted(loops.values(), key=lambda loop: (len(loop.blocks), loop.header.index))
+
+UNION = 'union'
+INTERSECTION = 'intersection'
+
+def solve(cfg, gen, kill, forward=True, meet=UNION, boundary=0, top=0):
+    """
+    Iterative worklist solver for a bit-vector dataflow problem over `cfg`.
+    Blocks are taken from the worklist in reverse postorder (postorder going
+    backward), so acyclic regions settle in one visit per block.
+
+    `gen[i]` and `kill[i]` are block i's bit sets; the transfer function is
+    `gen | (x & ~kill)`. Forward problems flow from a block's predecessors (the
+    entry also meets `boundary`), backward ones from its successors (exits also
+    meet `boundary`). `meet` is UNION or INTERSECTION; `top` is the initial
+    value, e.g. the full set for intersection problems.
+
+    Returns (ins, outs): the bit sets before and after each block, in program
+    order, whichever the direction.
+    """
+    count = len(cfg.blocks)
+    before, after = [top] * count, [top] * count
+    if forward:
+        order = [block.index for block in cfg.reverse_postorder()]
+        sources = [[predecessor.index for predecessor in block.predecessors] for block in cfg.blocks]
+        targets = [[successor.index for successor in block.successors] for block in cfg.blocks]
+        boundaries = {cfg.entry.index}
+    else:
+        order = [block.index for block in cfg.postorder()]
+        sources = [[successor.index for successor in block.successors] for block in cfg.blocks]
+        targets = [[predecessor.index for predecessor in block.predecessors] for block in cfg.blocks]
+        boundaries = {block.index for block in cfg.exits}
+    # Blocks the entry cannot reach come last. They still matter going backward, e.g. for liveness.
+    reached = set(order)
+    order += [block.index for block in cfg.blocks if block.index not in reached]
+    union = meet == UNION
+    rank = [0] * count
+    for position, index in enumerate(order):
+        rank[index] = position
+    worklist = list(range(len(order)))
+    queued = set(order)
+    while worklist:
+        index = order[heapq.heappop(worklist)]
+        queued.discard(index)
+        inputs = [after[source] for source in sources[index]]
+        if index in boundaries:
+            inputs.append(boundary)
+        value = 0 if union or not inputs else inputs[0]
+        for other in inputs:
+            value = value | other if union else value & other
+        before[index] = value
+        result = gen[index] | (value & ~kill[index])
+        if result != after[index]:
+            after[index] = result
+            for target in targets[index]:
+                if target not in queued:
+                    queued.add(target)
+                    heapq.heappush(worklist, rank[target])
+    if forward:
+        return before, after
+    return after, before
+
+class Liveness:
+    """
+    Live variables of a CFG. `live_in[i]`/`live_out[i]` are bit sets over
+    `variables` for block i; `live_at_exit` names the variables still needed when
+    the unit ends (e.g. the program's globals).
+    """
+    def __init__(self, cfg, live_at_exit=()):
+        self.cfg = cfg
+        self.variables = Universe()
+        gen, kill = [], []
+        for block in cfg.blocks:
+            used = defined = 0
+            for quad in reversed(cfg.quads(block)):
+                target = defines(quad)
+                if target is not None:
+                    bit = 1 << self.variables.add(target)
+                    defined |= bit
+                    used &= ~bit
+                for name in uses(quad):
+                    used |= 1 << self.variables.add(name)
+            gen.append(used)
+            kill.append(defined)
+        for name in live_at_exit:
+            self.variables.add(name)
+        boundary = self.variables.mask(live_at_exit)
+        self.live_in, self.live_out = solve(cfg, gen, kill, forward=False, meet=UNION, boundary=boundary)
+
+    def __repr__(self):
+        return f"Liveness({repr(self.cfg)}, {len(self.variables)} variables)"
+
+    def names(self, mask):
+        return set(self.variables.members(mask))
+
+    def live_after(self, block):
+        """ For each quad of `block` in order, the bit set of variables live right after it. """
+        live = self.live_out[block.index]
+        after = []
+        for quad in reversed(self.cfg.quads(block)):
+            after.append(live)
+            target = defines(quad)
+            if target is not None:
+                live &= ~self.variables.bit(target)
+            for name in uses(quad):
+                live |= self.variables.bit(name)
+        after.reverse()
+        return after
+
+class ReachingDefinitions:
+    """
+    Definitions reaching each block of a CFG. A definition is the position of a
+    quad assigning a variable (`definitions` numbers them); `reach_in[i]`/
+    `reach_out[i]` are bit sets over those. Values the unit starts with
+    (parameters, and globals read before being assigned) have no definition.
+    """
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.definitions = Universe()
+        by_variable = {}
+        for position, quad in enumerate(cfg.code):
+            target = defines(quad)
+            if target is not None:
+                self.definitions.add(position)
+                by_variable[target] = by_variable.get(target, 0) | self.definitions.bit(position)
+        gen, kill = [], []
+        for block in cfg.blocks:
+            generated = killed = 0
+            for position in range(block.start, block.end):
+                target = defines(cfg.code[position])
+                if target is not None:
+                    bit = self.definitions.bit(position)
+                    killed |= by_variable[target]
+                    generated = (generated & ~by_variable[target]) | bit
+            gen.append(generated)
+            kill.append(killed)
+        self.by_variable = by_variable
+        self.reach_in, self.reach_out = solve(cfg, gen, kill, forward=True, meet=UNION, boundary=0)
+
+    def __repr__(self):
+        return f"ReachingDefinitions({repr(self.cfg)}, {len(self.definitions)} definitions)"
+
+    def positions(self, mask):
+        return sorted(self.definitions.members(mask))
+
+    def reaching(self, position, name):
+        """ Positions of the definitions of `name` that reach quad `position`. """
+        block = self.cfg.block_of(position)
+        reach = self.reach_in[block.index]
+        for earlier in range(block.start, position):
+            target = defines(self.cfg.code[earlier])
+            if target is not None:
+                reach = (reach & ~self.by_variable[target]) | self.definitions.bit(earlier)
+        return self.positions(reach & self.by_variable.get(name, 0))
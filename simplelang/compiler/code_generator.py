@@ -1,60 +1,454 @@
+import re
+
 from simplelang.compiler.ir_generator import IRGenerator
-from simplelang.sl_parser import VarDeclNode, BinaryOpNode, ForNode
-from simplelang.lexer import TokenType, Token
+from simplelang.compiler.tac import BINARY_OPS
+from simplelang.compiler.cfg import ELEMENT, direct_calls, split_functions
+from simplelang.compiler.register_allocator import LinearScanAllocator
+from simplelang.compiler.ssa import sequentialize
+
+# R0 carries return values, R11 and R12 are scratch for values that live on the
+# stack; everything else up to R10 holds variables. R4-R11 are callee-saved, so
+# calls (`BL`) only preserve values kept in R4-R10.
+REGISTERS = tuple(f'R{n}' for n in range(1, 11))
+CALLEE_SAVED = tuple(f'R{n}' for n in range(4, 12))
+ARGUMENT_REGISTERS = ('R0', 'R1', 'R2', 'R3')
+SCRATCH = ('R11', 'R12')
+WORD = 4
+PROGRAM = '<program>'
+END = '.Lend'
+# The runtime routine printing the integer in R0.
+PRINT = 'print'
+
+CONDITIONS = {'==': 'EQ', '!=': 'NE', '<': 'LT', '>': 'GT', '<=': 'LE', '>=': 'GE'}
+NEGATED = {'EQ': 'NE', 'NE': 'EQ', 'LT': 'GE', 'GE': 'LT', 'GT': 'LE', 'LE': 'GT'}
+BRANCH = re.compile(r'^B(EQ|NE|LT|GE|GT|LE)? (\S+)$')
+
+def encodable(value):
+    """ Whether `value` fits an ARM data-processing immediate: 8 bits rotated right by an even amount. """
+    value &= 0xFFFFFFFF
+    for rotation in range(0, 32, 2):
+        if ((value << rotation) | (value >> (32 - rotation))) & 0xFFFFFFFF <= 0xFF:
+            return True
+    return False
+
+def register_number(register):
+    return int(register[1:])
+
+def is_label(line):
+    return line.endswith(':')
 
 class ARMGenerator:
-    def __init__(self, ast):
-        self.ir_generator = IRGenerator()
+    """
+    Lowers the program's TAC to ARM assembly one unit (the program, then each
+    function) at a time. Variables get registers from a linear-scan allocation
+    over their live ranges; those that do not fit live in stack slots of the
+    unit's frame, next to the unit's arrays (one block of words per `alloc`).
+
+    Calls follow the AAPCS: the first four arguments go in R0-R3 and the rest on
+    the stack, the result comes back in R0, and a function saves the callee-saved
+    registers it uses. `print` calls a runtime routine of that name. Arithmetic is
+    on 32-bit integers, so `/` truncates. Straight-line execution runs the program
+    and ends at `.Lend`, after the functions.
+
+    After `generate_arm`, `report` maps each unit to its instruction count, the
+    variables it spilled and the loads and stores those cost. A `peephole`
+    optimizer (see `PeepholeOptimizer`) rewrites the finished listing; the
+    instruction counts are then those of the rewritten units.
+    """
+    def __init__(self, ast, optimizer=None, peephole=None):
+        self.ir_generator = IRGenerator(optimizer)
+        self.peephole = peephole
         self.ir = self.ir_generator.generate_ir(ast)
         self.assembly_code = []
-        self.reg_counter = 1
-        self.var_to_reg = {}
         self.op_to_arm = {
-            TokenType.PLUS: 'ADD',
-            TokenType.MINUS: 'SUB',
-            TokenType.MUL: 'MUL',
-            TokenType.DIV: 'DIV',
+            '+': 'ADD',
+            '-': 'SUB',
+            '*': 'MUL',
+            '/': 'SDIV',
         }
-        self.label_counter = 0
+        self.allocator = LinearScanAllocator(REGISTERS, CALLEE_SAVED, ('call', 'print'))
+        self.report = {}
 
     def generate_arm(self):
-        def handle_expression(expression):
-            op = expression[0]
-            if isinstance(op, Token) and op.type in [TokenType.PLUS, TokenType.MINUS, TokenType.MUL, TokenType.DIV]:
-                arg1, arg2 = expression[1], expression[2]
-                result = expression[3]
-                if isinstance(arg1, BinaryOpNode):
-                    handle_expression(arg1)
-                    arg1 = self.var_to_reg[arg1[3]]
-                elif arg1 in self.var_to_reg:
-                    arg1 = self.var_to_reg[arg1]
+        main, functions = split_functions(self.ir)
+        self.assembly_code = []
+        self.report = {}
+        self.functions = self.ir_generator.tac.functions
+        self.generate_unit(PROGRAM, main, (), f'B {END}' if functions else None)
+        for name, _, body in functions:
+            self.assembly_code.append(f'{name}:')
+            self.generate_unit(name, body, self.functions.get(name, ()))
+        if functions:
+            self.assembly_code.append(f'{END}:')
+        if self.peephole is not None:
+            self.assembly_code = self.peephole.optimize(self.assembly_code)
+            self.count_instructions()
+        return self.assembly_code
+
+    def count_instructions(self):
+        """ Recount each unit's instructions in `assembly_code`, a unit running from its label to the next. """
+        for report in self.report.values():
+            report['instructions'] = 0
+        unit = PROGRAM
+        for line in self.assembly_code:
+            if is_label(line):
+                unit = line[:-1] if line[:-1] in self.report else unit
+            else:
+                self.report[unit]['instructions'] += 1
+
+    def legalize(self, code):
+        """
+        `code` with every constant operand of a binary op first copied into a
+        temporary, which gets a register, and with the argument array of a call
+        replaced by the tuple of its elements where nothing else reads the array.
+        """
+        legal = []
+        for op, arg1, arg2, result in direct_calls(code):
+            if op in BINARY_OPS:
+                if not isinstance(arg1, str):
+                    arg1, constant = self.ir_generator.tac.gen_temp(), arg1
+                    legal.append(('=', constant, None, arg1))
+                if not isinstance(arg2, str):
+                    arg2, constant = self.ir_generator.tac.gen_temp(), arg2
+                    legal.append(('=', constant, None, arg2))
+            legal.append((op, arg1, arg2, result))
+        return legal
+
+    def generate_unit(self, name, code, parameters, last=None):
+        code = self.legalize(code)
+        self.unit = name
+        self.lines = []
+        self.allocation = self.allocator.allocate(code)
+        self.report[name] = {
+            'instructions': 0,
+            'spills': len(self.allocation.spilled()),
+            'spill_loads': 0,
+            'spill_stores': 0,
+        }
+        # The frame: spill slots, then the arrays, at offsets from SP.
+        self.arrays = {}
+        words = self.allocation.slots
+        for position, quad in enumerate(code):
+            if quad[0] == 'alloc':
+                self.arrays[position] = words * WORD
+                words += quad[1]
+        self.frame_size = words * WORD
+        self.report[name]['frame_size'] = self.frame_size
+        self.sp_offset = 0
+        self.saved = []
+        if name != PROGRAM:
+            self.saved = [register for register in self.allocation.registers() if register in CALLEE_SAVED]
+            if self.allocation.slots:
+                self.saved.append(SCRATCH[0])
+            self.saved.sort(key=register_number)
+            self.emit(f"PUSH {{{', '.join(self.saved + ['LR'])}}}")
+        self.adjust_sp('SUB', self.frame_size)
+        self.receive_parameters(parameters)
+        position = 0
+        while position < len(code):
+            position = self.generate_quad(code, position)
+        if name == PROGRAM:
+            self.adjust_sp('ADD', self.frame_size)
+            if last is not None:
+                self.emit(last)
+        elif not code or code[-1][0] not in ('return', 'tailcall'):
+            self.load_constant('R0', 0)
+            self.epilogue()
+        lines = self.rotate_loops(self.lines)
+        self.report[name]['instructions'] = sum(not is_label(line) for line in lines)
+        self.assembly_code.extend(lines)
+
+    def receive_parameters(self, parameters):
+        """ Move the arguments from R0-R3 and the caller's stack to where the allocation keeps the parameters. """
+        intervals = self.allocation.intervals
+        live = [(index, parameter) for index, parameter in enumerate(parameters)
+                if parameter in intervals and intervals[parameter].start == 0]
+        moves = []
+        for index, parameter in live:
+            if index < len(ARGUMENT_REGISTERS):
+                register = self.allocation.register(parameter)
+                if register is None:
+                    self.store(ARGUMENT_REGISTERS[index], parameter)
                 else:
-                    self.assembly_code.append(f'MOV R{self.reg_counter}, #{arg1}')
-                    self.var_to_reg[arg1] = f'R{self.reg_counter}'
-                    self.reg_counter += 1
-                    arg1 = self.var_to_reg[arg1]
-                if isinstance(arg2, BinaryOpNode):
-                    handle_expression(arg2)
-                    arg2 = self.var_to_reg[arg2[3]]
-                elif arg2 in self.var_to_reg:
-                    arg2 = self.var_to_reg[arg2]
+                    moves.append((register, ARGUMENT_REGISTERS[index]))
+        self.move(moves)
+        above_frame = self.frame_size + (len(self.saved) + 1) * WORD
+        for index, parameter in live:
+            if index >= len(ARGUMENT_REGISTERS):
+                target = self.allocation.register(parameter) or SCRATCH[1]
+                self.emit(f'LDR {target}, [SP, #{above_frame + (index - len(ARGUMENT_REGISTERS)) * WORD}]')
+                if self.allocation.register(parameter) is None:
+                    self.store(target, parameter)
+
+    def generate_quad(self, code, position):
+        """ Emit code[position]; returns the position of the next quad to emit. """
+        op, arg1, arg2, result = code[position]
+        if op == 'label':
+            self.lines.append(f'{result}:')
+        elif op == 'goto':
+            self.emit(f'B {result}')
+        elif op == 'ifFalse':
+            if not isinstance(arg1, str):
+                if not arg1:
+                    self.emit(f'B {result}')
+            else:
+                self.emit(f'CMP {self.read(arg1, SCRATCH[1])}, #0')
+                self.emit(f'BEQ {result}')
+        elif op in CONDITIONS:
+            following = code[position + 1] if position + 1 < len(code) else None
+            left, right = self.read(arg1, SCRATCH[0]), self.read(arg2, SCRATCH[1])
+            self.emit(f'CMP {left}, {right}')
+            condition = CONDITIONS[op]
+            if (following is not None and following[0] == 'ifFalse' and following[1] == result
+                    and self.allocation.intervals[result].end <= 2 * (position + 1)):
+                # Compare and branch: the flags decide the jump, the boolean is never needed.
+                self.emit(f'B{NEGATED[condition]} {following[3]}')
+                return position + 2
+            target = self.target(result)
+            self.emit(f'MOV{condition} {target}, #1')
+            self.emit(f'MOV{NEGATED[condition]} {target}, #0')
+            self.written(target, result)
+        elif op in ('&&', '||'):
+            # Like the interpreter: `a && b` is b when a is true, else a; `a || b` the other way round.
+            left, right = self.read(arg1, SCRATCH[0]), self.read(arg2, SCRATCH[1])
+            target = self.target(result)
+            self.emit(f'CMP {left}, #0')
+            first, second = ('NE', 'EQ') if op == '&&' else ('EQ', 'NE')
+            self.emit(f'MOV{first} {target}, {right}')
+            self.emit(f'MOV{second} {target}, {left}')
+            self.written(target, result)
+        elif op in self.op_to_arm:
+            left, right = self.read(arg1, SCRATCH[0]), self.read(arg2, SCRATCH[1])
+            target = self.target(result)
+            self.emit(f'{self.op_to_arm[op]} {target}, {left}, {right}')
+            self.written(target, result)
+        elif op == '=':
+            if isinstance(result, str) and ELEMENT.match(result):
+                self.store_element(arg1, result)
+            elif isinstance(arg1, str) and ELEMENT.match(arg1):
+                target = self.target(result)
+                self.emit(f'LDR {target}, {self.address(arg1)}')
+                self.written(target, result)
+            else:
+                target = self.allocation.register(result)
+                if target is None:
+                    self.store(self.operand(arg1, SCRATCH[1]), result)
                 else:
-                    self.assembly_code.append(f'MOV R{self.reg_counter}, #{arg2}')
-                    self.var_to_reg[arg2] = f'R{self.reg_counter}'
-                    self.reg_counter += 1
-                    arg2 = self.var_to_reg[arg2]
-                if result not in self.var_to_reg:
-                    self.var_to_reg[result] = f'R{self.reg_counter}'
-                self.assembly_code.append(f'{self.op_to_arm[op.type]} {self.var_to_reg[result]}, {arg1}, {arg2}')
-                self.reg_counter += 1
-
-        for instruction in self.ir:
-            if instruction[0] == '=':
-                result = instruction[3]
-                if result not in self.var_to_reg:
-                    self.var_to_reg[result] = f'R{self.reg_counter}'
-                    self.reg_counter += 1
-                self.assembly_code.append(f'MOV {self.var_to_reg[result]}, #{instruction[1]}')
+                    self.load(target, arg1)
+        elif op == 'alloc':
+            target = self.target(result)
+            self.add_to_sp(target, self.arrays[position])
+            self.written(target, result)
+        elif op == 'print':
+            self.call(PRINT, (arg1,), None)
+        elif op == 'call':
+            self.call(arg1, arg2, result)
+        elif op == 'tailcall':
+            arguments = self.arguments(arg1, arg2)
+            if len(arguments) > len(ARGUMENT_REGISTERS):
+                # Stack arguments would have to replace our own caller's: make an ordinary call instead.
+                self.call(arg1, arguments, None, returned=True)
             else:
-                handle_expression(instruction)
-        return self.assembly_code
+                self.pass_arguments(arguments)
+                self.epilogue(f'B {arg1}')
+        elif op == 'return':
+            self.load('R0', arg1)
+            self.epilogue()
+        else:
+            raise Exception(f"Unknown TAC op: {op}")
+        return position + 1
+
+    def arguments(self, name, arguments):
+        """ The argument operands of a call: a tuple from `legalize`, or the elements of an argument array. """
+        if isinstance(arguments, tuple):
+            return arguments
+        return tuple(f'{arguments}[{index}]' for index in range(len(self.functions.get(name, ()))))
+
+    def call(self, name, arguments, result, returned=False):
+        arguments = self.arguments(name, arguments)
+        stacked = max(len(arguments) - len(ARGUMENT_REGISTERS), 0) * WORD
+        # Slots and arrays are addressed from SP, which moves down over the stacked arguments.
+        self.adjust_sp('SUB', stacked)
+        self.sp_offset += stacked
+        self.pass_arguments(arguments)
+        self.emit(f'BL {name}')
+        self.adjust_sp('ADD', stacked)
+        self.sp_offset -= stacked
+        if returned:
+            self.epilogue()
+        elif result is not None and result in self.allocation.intervals:
+            target = self.allocation.register(result)
+            if target is None:
+                self.store('R0', result)
+            else:
+                self.emit(f'MOV {target}, R0')
+
+    def pass_arguments(self, arguments):
+        """ Put `arguments` in R0-R3 and at the bottom of the stack (which the caller has made room for). """
+        stacked = arguments[len(ARGUMENT_REGISTERS):]
+        elements = [value for value in arguments if isinstance(value, str) and ELEMENT.match(value)]
+        if elements:
+            # An argument array: elements are loaded through R12, so its register may be overwritten.
+            base = self.read(ELEMENT.match(elements[0]).group(1), SCRATCH[1])
+            if base != SCRATCH[1]:
+                self.emit(f'MOV {SCRATCH[1]}, {base}')
+            for index, _ in enumerate(stacked):
+                self.emit(f'LDR R0, [{SCRATCH[1]}, #{(index + len(ARGUMENT_REGISTERS)) * WORD}]')
+                self.emit(f'STR R0, [SP, #{index * WORD}]')
+            for index, _ in enumerate(arguments[:len(ARGUMENT_REGISTERS)]):
+                self.emit(f'LDR {ARGUMENT_REGISTERS[index]}, [{SCRATCH[1]}, #{index * WORD}]')
+            return
+        for index, value in enumerate(stacked):
+            self.emit(f'STR {self.operand(value, SCRATCH[1])}, [SP, #{index * WORD}]')
+        moves = []
+        later = []
+        for register, value in zip(ARGUMENT_REGISTERS, arguments):
+            source = self.allocation.register(value) if isinstance(value, str) else None
+            if source is None:
+                later.append((register, value))
+            else:
+                moves.append((register, source))
+        self.move(moves)
+        for register, value in later:
+            self.load(register, value)
+
+    def epilogue(self, exit=None):
+        self.adjust_sp('ADD', self.frame_size)
+        if exit is None:
+            self.emit(f"POP {{{', '.join(self.saved + ['PC'])}}}")
+        else:
+            self.emit(f"POP {{{', '.join(self.saved + ['LR'])}}}")
+            self.emit(exit)
+
+    def store_element(self, value, element):
+        array, index = ELEMENT.match(element).groups()
+        base = self.read(array, SCRATCH[0])
+        if index.isdigit():
+            self.emit(f'STR {self.operand(value, SCRATCH[1])}, [{base}, #{int(index) * WORD}]')
+            return
+        offset = self.read(index, SCRATCH[1])
+        if isinstance(value, str) and self.allocation.register(value) is not None:
+            self.emit(f'STR {self.allocation.register(value)}, [{base}, {offset}, LSL #2]')
+        else:
+            # Base, index and value all need a scratch register: fold the index into the address in R12, value in R0.
+            self.emit(f'ADD {SCRATCH[1]}, {base}, {offset}, LSL #2')
+            self.emit(f'STR {self.load("R0", value)}, [{SCRATCH[1]}]')
+
+    def address(self, element):
+        array, index = ELEMENT.match(element).groups()
+        base = self.read(array, SCRATCH[0])
+        if index.isdigit():
+            return f'[{base}, #{int(index) * WORD}]'
+        return f'[{base}, {self.read(index, SCRATCH[1])}, LSL #2]'
+
+    def move(self, moves):
+        """ Copy registers as one parallel assignment; moves is a list of (target, source). """
+        for _, source, _, target in sequentialize(moves, lambda: SCRATCH[1]):
+            self.emit(f'MOV {target}, {source}')
+
+    def operand(self, value, scratch):
+        """ A register holding `value`: the variable's own, or `scratch` loaded with it. """
+        if isinstance(value, str):
+            return self.read(value, scratch)
+        self.load_constant(scratch, value)
+        return scratch
+
+    def load(self, register, value):
+        """ Get `value` (a constant or a variable) into `register`, or return the register already holding it. """
+        if not isinstance(value, str):
+            self.load_constant(register, value)
+            return register
+        source = self.read(value, register)
+        if source != register:
+            self.emit(f'MOV {register}, {source}')
+        return register
+
+    def read(self, name, scratch):
+        """ The register holding variable `name`, loading it into `scratch` when it lives on the stack. """
+        register = self.allocation.register(name)
+        if register is not None:
+            return register
+        self.emit(f'LDR {scratch}, [SP, #{self.allocation.slot(name) * WORD + self.sp_offset}]')
+        self.report[self.unit]['spill_loads'] += 1
+        return scratch
+
+    def target(self, name):
+        """ The register to compute variable `name` into: its own, or R12 when it lives on the stack. """
+        return self.allocation.register(name) or SCRATCH[1]
+
+    def written(self, register, name):
+        if self.allocation.register(name) is None:
+            self.store(register, name)
+
+    def store(self, register, name):
+        self.emit(f'STR {register}, [SP, #{self.allocation.slot(name) * WORD + self.sp_offset}]')
+        self.report[self.unit]['spill_stores'] += 1
+
+    def adjust_sp(self, op, size):
+        if size:
+            if encodable(size):
+                self.emit(f'{op} SP, SP, #{size}')
+            else:
+                self.emit(f'LDR {SCRATCH[1]}, ={size}')
+                self.emit(f'{op} SP, SP, {SCRATCH[1]}')
+
+    def add_to_sp(self, register, offset):
+        offset += self.sp_offset
+        if offset == 0:
+            self.emit(f'MOV {register}, SP')
+        elif encodable(offset):
+            self.emit(f'ADD {register}, SP, #{offset}')
+        else:
+            self.emit(f'LDR {register}, ={offset}')
+            self.emit(f'ADD {register}, SP, {register}')
+
+    def load_constant(self, register, value):
+        if value is None or isinstance(value, bool):
+            value = int(bool(value))
+        if not isinstance(value, int):
+            if not (isinstance(value, float) and value.is_integer()):
+                raise Exception(f"Cannot load {value!r} into an integer register")
+            value = int(value)
+        if encodable(value):
+            self.emit(f'MOV {register}, #{value}')
+        else:
+            self.emit(f'LDR {register}, ={value}')
+
+    def rotate_loops(self, lines):
+        """
+        Move each loop's test below its body, so that an iteration ends in one
+        taken conditional branch back to the body instead of a jump back to a
+        test that falls through:
+
+            head: test; B<cc> exit; body; B head; exit:
+        becomes
+            B head; top: body; head: test; B<!cc> top; exit:
+        """
+        lines = list(lines)
+        rotated = True
+        while rotated:
+            rotated = False
+            labels = {line[:-1]: position for position, line in enumerate(lines) if is_label(line)}
+            for position, line in enumerate(lines):
+                match = BRANCH.match(line)
+                if match is None or match.group(1) or position + 1 >= len(lines):
+                    continue
+                head = labels.get(match.group(2))
+                if head is None or head > position or not is_label(lines[position + 1]):
+                    continue
+                exit = lines[position + 1][:-1]
+                test = head + 1
+                while test < position and not is_label(lines[test]) and not BRANCH.match(lines[test]):
+                    test += 1
+                condition = BRANCH.match(lines[test]) if test < position else None
+                if condition is None or not condition.group(1) or condition.group(2) != exit:
+                    continue
+                top = self.ir_generator.tac.gen_label()
+                lines[head:position + 1] = ([line, f'{top}:'] + lines[test + 1:position] + [lines[head]] +
+                                            lines[head + 1:test] + [f'B{NEGATED[condition.group(1)]} {top}'])
+                rotated = True
+                break
+        return lines
+
+    def emit(self, instruction):
+        self.lines.append(instruction)
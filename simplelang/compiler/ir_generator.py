@@ -1,10 +1,13 @@
 from simplelang.compiler.tac import TAC
 
 class IRGenerator:
-    def __init__(self):
+    def __init__(self, optimizer=None):
         self.tac = TAC()
-    
+        self.optimizer = optimizer
+
     def generate_ir(self, ast):
         for node in ast:
             self.tac.generate_tac(node)
-        return self.tac.code
\ No newline at end of file
+        if self.optimizer is not None:
+            self.tac = self.optimizer.optimize(self.tac)
+        return self.tac.code
@@ -0,0 +1,366 @@
+import operator
+
+from simplelang.tokens import TokenType
+from simplelang.sl_parser import (VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                                  FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode)
+from simplelang.lexer import OPERATOR_TOKENS
+from simplelang.resolver import assigned_names, walk_scope
+
+PASSES = ('fold_constants', 'simplify', 'fold_ifs', 'remove_dead_else', 'hoist_invariants')
+
+# Variables holding hoisted loop invariants are named `$0`, `$1`, ...: no SimpleLang identifier starts with `$`.
+HOISTED = '$'
+
+# Division is left alone: `/` is true division, so folding it would put a float into the AST.
+# `&&` and `||` are too, as the engines do not all agree on their results.
+FOLDABLE = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.MUL: operator.mul,
+    TokenType.GREATER: operator.gt,
+    TokenType.LESS: operator.lt,
+    TokenType.EQUAL_EQUAL: operator.eq,
+    TokenType.NOT_EQUAL: operator.ne,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS_EQUAL: operator.le,
+}
+
+ARITHMETIC = {TokenType.PLUS, TokenType.MINUS, TokenType.MUL}
+
+def is_literal(node):
+    return type(node) in (int, bool)
+
+def count_nodes(node):
+    """ Size of the tree under `node`: one per node object, number and name. """
+    if isinstance(node, list):
+        return sum(count_nodes(item) for item in node)
+    if node is None:
+        return 0
+    if isinstance(node, (int, str)):
+        return 1
+    if isinstance(node, BinaryOpNode):
+        return 1 + count_nodes(node.left) + count_nodes(node.right)
+    if isinstance(node, (VarDeclNode, PrintNode, ReturnNode)):
+        return 1 + count_nodes(node.value)
+    if isinstance(node, ArrayNode):
+        return 1 + count_nodes(node.elements)
+    if isinstance(node, ArrayIndexNode):
+        return 1 + count_nodes(node.index)
+    if isinstance(node, FunctionCallNode):
+        return 1 + count_nodes(node.arguments)
+    if isinstance(node, (FunctionNode, ElseNode)):
+        return 1 + count_nodes(node.body)
+    if isinstance(node, (IfNode, WhileNode)):
+        return 1 + count_nodes(node.condition) + count_nodes(node.body) + count_nodes(getattr(node, 'else_node', None))
+    if isinstance(node, ForNode):
+        return 1 + count_nodes(node.start) + count_nodes(node.end) + count_nodes(node.body)
+    return 1
+
+def is_number(node):
+    """ Whether `node` is a number or arithmetic on numbers only, so it is sure to give a number. """
+    if type(node) is int:
+        return True
+    return (isinstance(node, BinaryOpNode) and node.op.type in ARITHMETIC
+            and is_number(node.left) and is_number(node.right))
+
+def harmless(node):
+    """
+    Whether `node` is only numbers, names and arithmetic on them. Evaluating it has no
+    effect, but it can still fail: `a - 1` raises when `a` holds an array.
+    """
+    if isinstance(node, (int, str)):
+        return True
+    return (isinstance(node, BinaryOpNode) and node.op.type in ARITHMETIC
+            and harmless(node.left) and harmless(node.right))
+
+def pure(node):
+    """ Whether `node` is only numbers, names and binary operations, so evaluating it twice in a row gives one value. """
+    if isinstance(node, (int, str)):
+        return True
+    return isinstance(node, BinaryOpNode) and pure(node.left) and pure(node.right)
+
+def expression_names(node):
+    """ The names read by `node`, an expression `pure` accepts. """
+    if isinstance(node, str):
+        return {node}
+    if isinstance(node, BinaryOpNode):
+        return expression_names(node.left) | expression_names(node.right)
+    return set()
+
+def is_guard(node):
+    """ Whether `node` is an `if` that `Optimizer.optimize_loop` put around hoisted `$n` declarations. """
+    return (isinstance(node, IfNode) and node.else_node is None and bool(node.body)
+            and all(is_guard(statement) or (isinstance(statement, VarDeclNode)
+                                            and statement.var_name.startswith(HOISTED))
+                    for statement in node.body))
+
+class Optimizer:
+    """
+    AST-to-AST optimizer shared by every backend: takes parsed statements and
+    returns new ones, leaving the input untouched (so arena views work too).
+
+    Passes, each enabled by the keyword argument of the same name:
+    - fold_constants: an arithmetic operation or comparison of two numbers
+      becomes its result.
+    - simplify: `x + 0`, `0 + x`, `x - 0`, `x * 1` and `1 * x` become `x`, and
+      `x * 0`, `0 * x` become 0, when `x` is only arithmetic on numbers (see
+      `is_number`). A name could hold a comparison result, and `(1 < 2) + 0` is
+      1, or an array, and `[1, 2] * 0` is `[]`.
+    - fold_ifs: an `if` on a constant condition is replaced by the statements of
+      the branch taken. SimpleLang blocks do not open a scope, so this is safe,
+      except for a branch holding a `return`: `Interpreter` treats a `return`
+      differently depending on the block it is in, so such an `if` is kept.
+    - remove_dead_else: an empty `else`, or one whose `if` condition is a
+      true constant, is dropped.
+    - hoist_invariants: arithmetic in a `while` or `for` loop on names the loop
+      never assigns (see `harmless`) is computed once, into a `$n` variable,
+      before the loop. Only what every iteration evaluates moves: not the
+      bodies of `if`s and inner loops, nor anything after a statement that may
+      `return`. The declarations go in an `if` repeating the loop's test, so a
+      loop that is never entered computes none of them; loops whose test is
+      more than operations on numbers and names (see `pure`) are left alone.
+      A `$n` an inner loop hoisted moves out of the outer one too when it can.
+      `return` values inside loops are left alone, as `Interpreter` hands them
+      back unevaluated.
+
+    `stats` counts, per pass, how often it applied and how many nodes (see
+    `count_nodes`) it eliminated.
+    """
+    def __init__(self, fold_constants=True, simplify=True, fold_ifs=True, remove_dead_else=True,
+                 hoist_invariants=True):
+        self.enabled = {
+            'fold_constants': fold_constants,
+            'simplify': simplify,
+            'fold_ifs': fold_ifs,
+            'remove_dead_else': remove_dead_else,
+            'hoist_invariants': hoist_invariants,
+        }
+        self.stats = {name: {'applied': 0, 'nodes_eliminated': 0} for name in PASSES}
+        self.hoisted = 0
+
+    def __repr__(self):
+        return f"Optimizer({self.key()})"
+
+    def key(self):
+        """ The enabled passes, e.g. for telling apart cached programs optimized differently. """
+        return ','.join(name for name in PASSES if self.enabled[name])
+
+    def nodes_eliminated(self):
+        return sum(stats['nodes_eliminated'] for stats in self.stats.values())
+
+    def record(self, name, before, after):
+        stats = self.stats[name]
+        stats['applied'] += 1
+        stats['nodes_eliminated'] += count_nodes(before) - count_nodes(after)
+        return after
+
+    def optimize(self, nodes):
+        return list(self.statements(nodes))
+
+    def statements(self, nodes):
+        for node in nodes:
+            yield from self.statement(node)
+
+    def block(self, nodes):
+        return self.optimize(nodes)
+
+    def statement(self, node):
+        """ Optimize one statement; returns the list of statements replacing it. """
+        if isinstance(node, IfNode):
+            return self.optimize_IfNode(node)
+        if isinstance(node, VarDeclNode):
+            return [VarDeclNode(node.var_name, self.expression(node.value))]
+        if isinstance(node, PrintNode):
+            return [PrintNode(self.expression(node.value))]
+        if isinstance(node, ReturnNode):
+            return [ReturnNode(self.expression(node.value))]
+        if isinstance(node, FunctionNode):
+            return [FunctionNode(node.name, list(node.parameters), self.block(node.body), node.memo)]
+        if isinstance(node, WhileNode):
+            return self.optimize_loop(WhileNode(self.expression(node.condition), self.block(node.body)))
+        if isinstance(node, ForNode):
+            return self.optimize_loop(ForNode(node.variable, self.expression(node.start), self.expression(node.end),
+                                              self.block(node.body)))
+        if isinstance(node, ElseNode):
+            return [ElseNode(self.block(node.body))]
+        return [self.expression(node)]
+
+    def expression(self, node):
+        if isinstance(node, BinaryOpNode):
+            return self.optimize_BinaryOpNode(node)
+        if isinstance(node, FunctionCallNode):
+            return FunctionCallNode(node.name, [self.expression(argument) for argument in node.arguments])
+        if isinstance(node, ArrayIndexNode):
+            return ArrayIndexNode(node.array_identifier, self.expression(node.index))
+        if isinstance(node, ArrayNode):
+            return ArrayNode([self.expression(element) for element in node.elements])
+        return node
+
+    def optimize_BinaryOpNode(self, node):
+        left, op, right = self.expression(node.left), node.op, self.expression(node.right)
+        node = BinaryOpNode(left, op, right)
+        if self.enabled['fold_constants'] and op.type in FOLDABLE and is_literal(left) and is_literal(right):
+            return self.record('fold_constants', node, FOLDABLE[op.type](left, right))
+        if self.enabled['simplify'] and op.type in ARITHMETIC:
+            simplified = self.simplify(op.type, left, right)
+            if simplified is not None:
+                return self.record('simplify', node, simplified)
+        return node
+
+    def simplify(self, op, left, right):
+        """ The operand (or 0) that `left op right` reduces to by an identity, or None. """
+        if op == TokenType.PLUS:
+            if type(right) is int and right == 0 and is_number(left):
+                return left
+            if type(left) is int and left == 0 and is_number(right):
+                return right
+        elif op == TokenType.MINUS:
+            if type(right) is int and right == 0 and is_number(left):
+                return left
+        elif op == TokenType.MUL:
+            if type(right) is int and right == 1 and is_number(left):
+                return left
+            if type(left) is int and left == 1 and is_number(right):
+                return right
+            if type(right) is int and right == 0 and is_number(left):
+                return 0
+            if type(left) is int and left == 0 and is_number(right):
+                return 0
+        return None
+
+    def optimize_IfNode(self, node):
+        condition = self.expression(node.condition)
+        body = self.block(node.body)
+        else_node = None if node.else_node is None else ElseNode(self.block(node.else_node.body))
+        taken = body if condition else [] if else_node is None else else_node.body
+        if (self.enabled['fold_ifs'] and is_literal(condition)
+                and not any(isinstance(inner, ReturnNode) for inner in walk_scope(taken))):
+            return self.record('fold_ifs', IfNode(condition, body, else_node), taken)
+        if (else_node is not None and self.enabled['remove_dead_else']
+                and (not else_node.body or (is_literal(condition) and condition))):
+            self.record('remove_dead_else', else_node, None)
+            else_node = None
+        return [IfNode(condition, body, else_node)]
+
+    def optimize_loop(self, loop):
+        if not self.enabled['hoist_invariants']:
+            return [loop]
+        assigned = assigned_names(loop.body)
+        if isinstance(loop, ForNode):
+            assigned.add(loop.variable)
+        replacements = {}
+
+        def expression(node, hoisted):
+            if isinstance(node, BinaryOpNode):
+                if harmless(node) and not expression_names(node) & assigned:
+                    key = repr(node)
+                    if key in replacements:
+                        return self.record('hoist_invariants', node, replacements[key])
+                    name = replacements[key] = f"{HOISTED}{self.hoisted}"
+                    self.hoisted += 1
+                    declaration = VarDeclNode(name, node)
+                    hoisted.append(declaration)
+                    return self.record('hoist_invariants', node, [declaration, name])[1]
+                return BinaryOpNode(expression(node.left, hoisted), node.op, expression(node.right, hoisted))
+            if isinstance(node, FunctionCallNode):
+                return FunctionCallNode(node.name, [expression(argument, hoisted) for argument in node.arguments])
+            if isinstance(node, ArrayIndexNode):
+                return ArrayIndexNode(node.array_identifier, expression(node.index, hoisted))
+            if isinstance(node, ArrayNode):
+                return ArrayNode([expression(element, hoisted) for element in node.elements])
+            return node
+
+        # The condition is evaluated whenever the loop is reached, so what it computes goes right in front.
+        before = []
+        if isinstance(loop, WhileNode):
+            loop = WhileNode(expression(loop.condition, before), loop.body)
+            test = loop.condition
+        else:
+            test = BinaryOpNode(loop.start, OPERATOR_TOKENS['<'], loop.end)
+        if not pure(test) or (isinstance(loop, ForNode) and loop.variable in expression_names(test)):
+            # Without repeating the test, a loop that is never entered would still compute the rest.
+            return before + [loop]
+
+        def split(guard):
+            """ `guard`, a statement of the loop, as the `if` of its declarations invariant here and the rest. """
+            if not pure(guard.condition) or expression_names(guard.condition) & assigned:
+                return None, guard
+            moved, kept = [], []
+            for node in guard.body:
+                if isinstance(node, IfNode):
+                    inner_moved, inner_kept = split(node)
+                    moved.extend([inner_moved] if inner_moved else [])
+                    kept.extend([inner_kept] if inner_kept else [])
+                elif harmless(node.value) and not expression_names(node.value) & assigned:
+                    assigned.discard(node.var_name)
+                    moved.append(self.record('hoist_invariants', node, node))
+                else:
+                    kept.append(node)
+            if moved and kept:
+                # Both halves test the condition.
+                self.stats['hoist_invariants']['nodes_eliminated'] -= 1 + count_nodes(guard.condition)
+            return IfNode(guard.condition, moved) if moved else None, IfNode(guard.condition, kept) if kept else None
+
+        def statement(node, hoisted):
+            # Only the parts evaluated whenever `node` is: not the bodies of branches and inner loops.
+            if isinstance(node, VarDeclNode):
+                return VarDeclNode(node.var_name, expression(node.value, hoisted))
+            if isinstance(node, PrintNode):
+                return PrintNode(expression(node.value, hoisted))
+            if isinstance(node, IfNode):
+                return IfNode(expression(node.condition, hoisted), node.body, node.else_node)
+            if isinstance(node, WhileNode):
+                return WhileNode(expression(node.condition, hoisted), node.body)
+            if isinstance(node, ForNode):
+                return ForNode(node.variable, expression(node.start, hoisted), expression(node.end, hoisted),
+                               node.body)
+            if isinstance(node, (ReturnNode, FunctionNode, ElseNode)):
+                return node
+            return expression(node, hoisted)
+
+        hoisted = []
+        body = []
+        every_iteration = True
+        for node in loop.body:
+            if not every_iteration:
+                # After a statement that may `return`, the rest of the body might not be run.
+                body.append(node)
+                continue
+            if (isinstance(node, VarDeclNode) and node.var_name.startswith(HOISTED)
+                    and harmless(node.value) and not expression_names(node.value) & assigned):
+                # Hoisted out of an inner loop, and invariant here too. Only this statement assigns `$n`.
+                assigned.discard(node.var_name)
+                hoisted.append(self.record('hoist_invariants', node, node))
+                continue
+            if is_guard(node):
+                moved, node = split(node)
+                hoisted.extend([moved] if moved else [])
+                if node is None:
+                    continue
+            body.append(statement(node, hoisted))
+            every_iteration = not any(isinstance(inner, ReturnNode) for inner in walk_scope([node]))
+        if isinstance(loop, WhileNode):
+            loop = WhileNode(loop.condition, body)
+        else:
+            loop = ForNode(loop.variable, loop.start, loop.end, body)
+        if not hoisted:
+            return before + [loop]
+        # Repeating the loop's test keeps a loop that is never entered from computing (and failing on) them.
+        guard = IfNode(test, hoisted)
+        self.stats['hoist_invariants']['nodes_eliminated'] -= 1 + count_nodes(test)
+        return before + [guard, loop]
+
+class OptimizingParser:
+    """ Parser stand-in yielding `parser`'s statements as rewritten by `optimizer`, one at a time. """
+    def __init__(self, parser, optimizer):
+        self.parser = parser
+        self.optimizer = optimizer
+
+    def __repr__(self):
+        return f"OptimizingParser({repr(self.parser)}, {repr(self.optimizer)})"
+
+    def statements(self):
+        return self.optimizer.statements(self.parser.statements())
+
+    def parse(self):
+        return list(self.statements())
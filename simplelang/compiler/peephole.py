@@ -0,0 +1,364 @@
+import re
+
+from simplelang.compiler.arm_simulator import REGISTER_NAMES, PRINT, split_mnemonic, split_operands, wrap
+from simplelang.compiler.code_generator import encodable, is_label
+
+PEEPHOLE_RULES = ('fold_immediates', 'remove_redundant_moves', 'combine_multiply_add', 'reduce_to_shifts',
+                  'remove_dead_instructions')
+
+REGISTER = re.compile(r'\b(R\d+|SP|LR|PC)\b')
+# Data-processing instructions writing their first operand and nothing else.
+COMPUTATIONS = {'MOV', 'MVN', 'ADD', 'SUB', 'RSB', 'MUL', 'MLA', 'SDIV', 'LSL', 'LSR', 'ASR'}
+
+def mask(*registers):
+    bits = 0
+    for register in registers:
+        bits |= 1 << REGISTER_NAMES[register]
+    return bits
+
+ARGUMENTS = mask('R0', 'R1', 'R2', 'R3')
+CALLEE_SAVED = mask(*(f'R{n}' for n in range(4, 12)))
+# What a call may overwrite, and what must hold on leaving a function by POP {..., PC} or a tail call.
+CLOBBERED = ARGUMENTS | mask('R12', 'LR')
+RETURNING = mask('R0', 'SP') | CALLEE_SAVED
+TAIL_CALLING = ARGUMENTS | CALLEE_SAVED | mask('SP', 'LR')
+
+def parse(line):
+    """ (mnemonic, condition, operands) of an instruction line. """
+    word, _, rest = line.partition(' ')
+    mnemonic, condition = split_mnemonic(word)
+    return mnemonic, condition, split_operands(rest)
+
+def format_instruction(mnemonic, condition, operands):
+    return f"{mnemonic}{condition or ''} {', '.join(operands)}"
+
+def register_mask(text):
+    return mask(*REGISTER.findall(text))
+
+def is_register(operand):
+    return REGISTER.fullmatch(operand) is not None
+
+def power_of_two(value):
+    """ n when value is 2**n, else None. """
+    if value > 0 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+class PeepholeOptimizer:
+    """
+    Rewrites ARM assembly from `ARMGenerator` a few instructions at a time,
+    repeating its rules until nothing changes:
+
+    - fold_immediates: an ADD, SUB or CMP reading a register known (within the
+      basic block) to hold a constant that fits an immediate takes the
+      immediate instead (`SUB Rd, #k, Rn` becomes RSB); with two constants the
+      result itself is loaded.
+    - remove_redundant_moves: a MOV (or literal load) giving a register the
+      value it already holds is dropped, and `op Rt, ...; MOV Rd, Rt` becomes
+      `op Rd, ...` when Rt is not read afterwards.
+    - combine_multiply_add: `MUL Rt, Ra, Rb; ADD Rd, Rt, Rc` becomes
+      `MLA Rd, Ra, Rb, Rc` when Rt is not read afterwards.
+    - reduce_to_shifts: multiplying by 2**n becomes LSL; dividing by 2**n
+      becomes an ASR rounding toward zero like SDIV does.
+    - remove_dead_instructions: computations whose result no path reads.
+
+    What is read afterwards comes from register liveness over the whole listing,
+    taking a call to read only the argument registers the callee reads and to
+    overwrite R0-R3, R12 and LR, as the AAPCS allows.
+
+    Each rule is enabled by the keyword argument of the same name. `stats` has
+    the instruction counts before and after, and per rule how many
+    instructions it rewrote or removed.
+    """
+    def __init__(self, fold_immediates=True, remove_redundant_moves=True, combine_multiply_add=True,
+                 reduce_to_shifts=True, remove_dead_instructions=True, rounds=8):
+        self.enabled = {
+            'fold_immediates': fold_immediates,
+            'remove_redundant_moves': remove_redundant_moves,
+            'combine_multiply_add': combine_multiply_add,
+            'reduce_to_shifts': reduce_to_shifts,
+            'remove_dead_instructions': remove_dead_instructions,
+        }
+        self.rounds = rounds
+        self.stats = {'instructions_before': 0, 'instructions_after': 0}
+        self.stats.update((name, 0) for name in PEEPHOLE_RULES)
+
+    def __repr__(self):
+        return f"PeepholeOptimizer({','.join(name for name in PEEPHOLE_RULES if self.enabled[name])})"
+
+    def optimize(self, assembly):
+        """ The optimized lines of `assembly`, which is left as it was. """
+        lines = list(assembly)
+        for _ in range(self.rounds):
+            before = list(lines)
+            lines = self.rewrite_known_values(lines)
+            lines = self.rewrite_pairs(lines)
+            if self.enabled['remove_dead_instructions']:
+                lines = self.remove_dead_instructions(lines)
+            if lines == before:
+                break
+        self.stats['instructions_before'] += sum(not is_label(line) for line in assembly)
+        self.stats['instructions_after'] += sum(not is_label(line) for line in lines)
+        return lines
+
+    def count(self, name, changed=1):
+        self.stats[name] += changed
+
+    def liveness(self, lines):
+        """ For each line, the registers (as a bit mask) some path reads after it before writing them. """
+        labels = {line[:-1]: position for position, line in enumerate(lines) if is_label(line)}
+        parsed = [None if is_label(line) else parse(line) for line in lines]
+        functions = {instruction[2][0] for instruction in parsed
+                     if instruction is not None and instruction[0] == 'BL'} - {PRINT}
+        effects = []
+        for position, instruction in enumerate(parsed):
+            uses, defines, successors, callee = self.effects(instruction, labels, functions)
+            successors = [position + 1 if successor == 'next' else successor for successor in successors]
+            effects.append((uses, defines, successors, callee))
+        live_in = [0] * len(lines)
+        live_after = [0] * len(lines)
+        changed = True
+        while changed:
+            changed = False
+            for position in reversed(range(len(lines))):
+                uses, defines, successors, callee = effects[position]
+                if callee is not None:
+                    uses |= live_in[labels[callee]] & ARGUMENTS
+                after = 0
+                for successor in successors:
+                    if successor < len(lines):
+                        after |= live_in[successor]
+                live = uses | (after & ~defines)
+                live_after[position] = after
+                if live != live_in[position]:
+                    live_in[position] = live
+                    changed = True
+        return live_after
+
+    def effects(self, instruction, labels, functions):
+        """ (registers read, registers written, successor positions, called function) of one parsed line. """
+        if instruction is None:
+            return 0, 0, ['next'], None
+        mnemonic, condition, operands = instruction
+        if mnemonic == 'B':
+            target = operands[0]
+            if condition is None and target in functions:
+                return TAIL_CALLING, 0, [], None
+            successors = [labels[target]] if target in labels else []
+            return 0, 0, successors + ([] if condition is None else ['next']), None
+        if mnemonic == 'BL':
+            target = operands[0]
+            if target == PRINT:
+                return mask('R0', 'SP'), CLOBBERED, ['next'], None
+            if target in labels:
+                return mask('SP'), CLOBBERED, ['next'], target
+            return ARGUMENTS | mask('SP'), CLOBBERED, ['next'], None
+        if mnemonic == 'PUSH':
+            return register_mask(operands[0]) | mask('SP'), mask('SP'), ['next'], None
+        if mnemonic == 'POP':
+            popped = register_mask(operands[0])
+            if popped & mask('PC'):
+                return RETURNING & ~popped | mask('SP'), popped | mask('SP'), [], None
+            return mask('SP'), popped | mask('SP'), ['next'], None
+        if mnemonic == 'STR':
+            return register_mask(', '.join(operands)), 0, ['next'], None
+        if mnemonic == 'CMP':
+            return register_mask(', '.join(operands)), 0, ['next'], None
+        target = mask(operands[0])
+        uses = register_mask(', '.join(operands[1:]))
+        if condition is not None:
+            # Only sometimes written: the old value may survive.
+            uses |= target
+        return uses, target, ['next'], None
+
+    def rewrite_known_values(self, lines):
+        """ fold_immediates, reduce_to_shifts and the first half of remove_redundant_moves, in one pass over each block. """
+        live_after = self.liveness(lines)
+        rewritten = []
+        known = {}
+        for position, line in enumerate(lines):
+            if is_label(line):
+                known = {}
+                rewritten.append(line)
+                continue
+            instruction = parse(line)
+            if self.enabled['remove_redundant_moves']:
+                instruction = self.propagate_copies(instruction, known)
+            replacement = self.rewrite_instruction(instruction, known, live_after[position])
+            if replacement is None:
+                replacement = [instruction]
+            for mnemonic, condition, operands in replacement:
+                self.learn(known, mnemonic, condition, operands)
+                rewritten.append(format_instruction(mnemonic, condition, operands))
+        return rewritten
+
+    def propagate_copies(self, instruction, known):
+        """ `instruction` reading, for each register that is a copy of another, the original, so that the copy may die. """
+        mnemonic, condition, operands = instruction
+        if mnemonic not in COMPUTATIONS and mnemonic != 'CMP':
+            return instruction
+        first = 0 if mnemonic == 'CMP' else 1
+        sources = [known[operand][1] if known.get(operand, ('#',))[0] == 'R' else operand
+                   for operand in operands[first:]]
+        return mnemonic, condition, operands[:first] + sources
+
+    def rewrite_instruction(self, instruction, known, live_after):
+        """ What to emit instead of `instruction` given the register values `known`: a list of instructions, or None to keep it. """
+        mnemonic, condition, operands = instruction
+
+        def constant(operand):
+            value = known.get(operand)
+            return value[1] if value is not None and value[0] == '#' else None
+
+        if condition is not None:
+            return None
+        if self.enabled['remove_redundant_moves']:
+            if mnemonic == 'MOV' and is_register(operands[1]):
+                target, source = operands
+                if (target == source or known.get(target) == ('R', source) or known.get(source) == ('R', target)
+                        or (constant(target) is not None and constant(target) == constant(source))):
+                    self.count('remove_redundant_moves')
+                    return []
+            if mnemonic == 'MOV' and operands[1].startswith('#') or mnemonic == 'LDR' and operands[1].startswith('='):
+                if constant(operands[0]) == int(operands[1][1:]):
+                    self.count('remove_redundant_moves')
+                    return []
+        if len(operands) != 3 or not all(is_register(operand) for operand in operands):
+            if mnemonic == 'CMP' and len(operands) == 2 and is_register(operands[1]) and self.enabled['fold_immediates']:
+                value = constant(operands[1])
+                if value is not None and encodable(value) and value >= 0:
+                    self.count('fold_immediates')
+                    return [('CMP', None, [operands[0], f'#{value}'])]
+            return None
+        target, left, right = operands
+        left_value, right_value = constant(left), constant(right)
+        if mnemonic in ('ADD', 'SUB') and self.enabled['fold_immediates']:
+            if left_value is not None and right_value is not None:
+                self.count('fold_immediates')
+                result = wrap(left_value + right_value if mnemonic == 'ADD' else left_value - right_value)
+                return [self.load_constant(target, result)]
+            if mnemonic == 'ADD' and left_value is not None:
+                left, right, right_value = right, left, left_value
+            if right_value is not None:
+                if encodable(right_value) and right_value >= 0:
+                    self.count('fold_immediates')
+                    return [(mnemonic, None, [target, left, f'#{right_value}'])]
+                if encodable(-right_value) and right_value < 0:
+                    self.count('fold_immediates')
+                    return [('SUB' if mnemonic == 'ADD' else 'ADD', None, [target, left, f'#{-right_value}'])]
+            if mnemonic == 'SUB' and left_value is not None and encodable(left_value) and left_value >= 0:
+                self.count('fold_immediates')
+                return [('RSB', None, [target, right, f'#{left_value}'])]
+        if mnemonic == 'MUL' and self.enabled['reduce_to_shifts']:
+            if power_of_two(left_value or 0) is not None and right_value is None:
+                left, right, right_value = right, left, left_value
+            shift = power_of_two(right_value or 0)
+            if shift is not None:
+                self.count('reduce_to_shifts')
+                if shift == 0:
+                    return [('MOV', None, [target, left])]
+                return [('LSL', None, [target, left, f'#{shift}'])]
+        if mnemonic == 'SDIV' and self.enabled['reduce_to_shifts']:
+            shift = power_of_two(right_value or 0)
+            if shift is not None:
+                if shift == 0:
+                    self.count('reduce_to_shifts')
+                    return [('MOV', None, [target, left])]
+                # Round toward zero: add 2**n - 1 to a negative dividend before the arithmetic shift.
+                for temporary in (target, right, 'R12'):
+                    if temporary != left and (temporary == target or not live_after & mask(temporary)):
+                        self.count('reduce_to_shifts')
+                        return [('ASR', None, [temporary, left, '#31']),
+                                ('ADD', None, [temporary, left, f'{temporary}, LSR #{32 - shift}']),
+                                ('ASR', None, [target, temporary, f'#{shift}'])]
+        return None
+
+    def load_constant(self, register, value):
+        if encodable(value):
+            return ('MOV', None, [register, f'#{value}'])
+        return ('LDR', None, [register, f'={value}'])
+
+    def learn(self, known, mnemonic, condition, operands):
+        """ Update `known` (register -> ('#', constant) or ('R', register with the same value)) past one instruction. """
+        if mnemonic in ('B', 'POP') and condition is None or mnemonic == 'BL':
+            # Past a call the caller-saved registers are gone; past a jump control only comes back at a label.
+            if mnemonic == 'BL':
+                for register in ('R0', 'R1', 'R2', 'R3', 'R12'):
+                    self.forget(known, register)
+            else:
+                known.clear()
+            return
+        if mnemonic in ('CMP', 'STR', 'PUSH', 'B'):
+            return
+        target = operands[0]
+        self.forget(known, target)
+        if condition is not None or target in ('SP', 'LR', 'PC'):
+            return
+        if mnemonic == 'MOV' and operands[1].startswith('#') or mnemonic == 'LDR' and operands[1].startswith('='):
+            known[target] = ('#', wrap(int(operands[1][1:])))
+        elif mnemonic == 'MOV' and is_register(operands[1]) and operands[1] not in ('SP', 'LR', 'PC'):
+            source = operands[1]
+            known[target] = known[source] if known.get(source, ('R',))[0] == '#' else ('R', source)
+
+    def forget(self, known, register):
+        known.pop(register, None)
+        for other, value in list(known.items()):
+            if value == ('R', register):
+                del known[other]
+
+    def rewrite_pairs(self, lines):
+        """ combine_multiply_add and the copy-forwarding half of remove_redundant_moves, on adjacent instructions. """
+        if not (self.enabled['combine_multiply_add'] or self.enabled['remove_redundant_moves']):
+            return lines
+        live_after = self.liveness(lines)
+        rewritten = []
+        position = 0
+        while position < len(lines):
+            line = lines[position]
+            if position + 1 < len(lines) and not is_label(line) and not is_label(lines[position + 1]):
+                first, second = parse(line), parse(lines[position + 1])
+                combined = self.combine(first, second, live_after[position + 1])
+                if combined is not None:
+                    rewritten.append(format_instruction(*combined))
+                    position += 2
+                    continue
+            rewritten.append(line)
+            position += 1
+        return rewritten
+
+    def combine(self, first, second, live_after):
+        """ One instruction doing what `first` then `second` do, or None. """
+        mnemonic, condition, operands = first
+        next_mnemonic, next_condition, next_operands = second
+        if condition is not None or next_condition is not None:
+            return None
+        if mnemonic not in COMPUTATIONS and mnemonic != 'LDR':
+            return None
+        written = operands[0]
+        if written in ('SP', 'LR', 'PC'):
+            return None
+        if (self.enabled['remove_redundant_moves'] and next_mnemonic == 'MOV' and next_operands[1] == written
+                and next_operands[0] not in ('SP', 'LR', 'PC') and not live_after & mask(written)):
+            self.count('remove_redundant_moves')
+            return mnemonic, None, [next_operands[0]] + operands[1:]
+        if (self.enabled['combine_multiply_add'] and mnemonic == 'MUL' and next_mnemonic == 'ADD'
+                and len(next_operands) == 3 and all(is_register(operand) for operand in next_operands)
+                and written in next_operands[1:]):
+            addend = next_operands[2] if next_operands[1] == written else next_operands[1]
+            if addend != written and (next_operands[0] == written or not live_after & mask(written)):
+                self.count('combine_multiply_add')
+                return 'MLA', None, [next_operands[0], operands[1], operands[2], addend]
+        return None
+
+    def remove_dead_instructions(self, lines):
+        live_after = self.liveness(lines)
+        kept = []
+        for position, line in enumerate(lines):
+            if not is_label(line):
+                mnemonic, _, operands = parse(line)
+                computes = mnemonic in COMPUTATIONS or mnemonic == 'LDR' and operands[1].startswith('=')
+                if computes and operands[0] not in ('SP', 'LR', 'PC') and not live_after[position] & mask(operands[0]):
+                    self.count('remove_dead_instructions')
+                    continue
+            kept.append(line)
+        return kept
@@ -0,0 +1,249 @@
+import ast
+
+from simplelang.tokens import TokenType
+from simplelang.sl_parser import (VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                                  FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode)
+from simplelang.resolver import walk_scope, assigned_names
+
+BINARY_OPERATORS = {
+    TokenType.PLUS: ast.Add,
+    TokenType.MINUS: ast.Sub,
+    TokenType.MUL: ast.Mult,
+    TokenType.DIV: ast.Div,
+}
+
+COMPARE_OPERATORS = {
+    TokenType.GREATER: ast.Gt,
+    TokenType.LESS: ast.Lt,
+    TokenType.EQUAL_EQUAL: ast.Eq,
+    TokenType.NOT_EQUAL: ast.NotEq,
+    TokenType.GREATER_EQUAL: ast.GtE,
+    TokenType.LESS_EQUAL: ast.LtE,
+}
+
+class TopLevelReturn(Exception):
+    pass
+
+def _sl_index(array, index, name):
+    if array is None:
+        raise Exception(f"Undefined array: {name}")
+    if index < 0 or index >= len(array):
+        raise Exception(f"Index out of bounds: {index}")
+    return array[index]
+
+def _sl_range(start, end):
+    if type(start) is int and type(end) is int:
+        return range(start, end)
+    return _float_range(start, end)
+
+def _float_range(start, end):
+    while start < end:
+        yield start
+        start += 1
+
+def _sl_undefined_function(name):
+    def undefined(*arguments):
+        raise Exception(f"Undefined function: {name}")
+    return undefined
+
+def _sl_argument_mismatch(name):
+    raise Exception(f"Argument mismatch for function: {name}")
+
+RUNTIME = {
+    '_sl_index': _sl_index,
+    '_sl_range': _sl_range,
+    '_sl_undefined_function': _sl_undefined_function,
+    '_sl_argument_mismatch': _sl_argument_mismatch,
+    'TopLevelReturn': TopLevelReturn,
+}
+
+def variable(name):
+    if name.startswith('$'):
+        # Loop invariants the optimizer hoisted (`$0`, ...); `$` cannot start a Python name.
+        return f"h_{name[1:]}"
+    return f"v_{name}"
+
+def function(name):
+    return f"f_{name}"
+
+class PythonGenerator:
+    """
+    Translates a SimpleLang AST into a Python `ast.Module`.
+
+    The differences from `Interpreter` are handled explicitly:
+    - Functions only see their own parameters and variables; any other name
+      (including a global) reads as None, as does a variable read before it is set.
+      Functions live in a separate namespace (`f_` prefix) from variables (`v_`).
+    - `/` is Python true division; a ZeroDivisionError is reported as the
+      interpreter's "Division by zero".
+    - The interpreter turns numeric strings read from variables into ints. String
+      literals parse as identifiers, so a variable can never hold a string and no
+      conversion code is emitted.
+    - A `for` loop leaves its variable one past the last value, as the interpreter does.
+    - A `return` outside any function only ends the top-level statement it is in.
+    """
+    def __init__(self, ast_nodes):
+        self.ast = ast_nodes
+        self.scope = set()
+        self.in_function = False
+        self.hidden_counter = 0
+        self.arities = {}
+        self.function_names = set()
+        for node in self.walk_all(ast_nodes):
+            if isinstance(node, FunctionNode):
+                self.arities.setdefault(node.name, set()).add(len(node.parameters))
+                self.function_names.add(node.name)
+            elif isinstance(node, FunctionCallNode):
+                self.function_names.add(node.name)
+
+    def walk_all(self, body):
+        for node in walk_scope(body):
+            yield node
+            if isinstance(node, FunctionNode):
+                yield from self.walk_all(node.body)
+
+    def hidden(self):
+        self.hidden_counter += 1
+        return f"_sl_tmp{self.hidden_counter}"
+
+    def generate(self):
+        body = [ast.Assign(targets=[ast.Name(function(name), ast.Store())],
+                           value=self.call('_sl_undefined_function', [ast.Constant(name)]))
+                for name in sorted(self.function_names)]
+        self.scope = assigned_names(self.ast)
+        self.in_function = False
+        main_body = self.scope_prologue([], self.ast) + self.statements(self.ast, top_level=True)
+        main_body.append(ast.Return(ast.Dict(keys=[ast.Constant(name) for name in sorted(self.scope)],
+                                             values=[ast.Name(variable(name), ast.Load()) for name in sorted(self.scope)])))
+        body.append(ast.FunctionDef(name='_sl_main', args=self.arguments([]), body=main_body,
+                                    decorator_list=[], returns=None, type_comment=None))
+        module = ast.Module(body=body, type_ignores=[])
+        return ast.fix_missing_locations(module)
+
+    def source(self):
+        return ast.unparse(self.generate())
+
+    def run(self):
+        namespace = dict(RUNTIME)
+        exec(compile(self.generate(), '<simplelang>', 'exec'), namespace)
+        try:
+            variables = namespace['_sl_main']()
+        except ZeroDivisionError:
+            raise Exception("Division by zero") from None
+        return {name: value for name, value in variables.items() if value is not None}
+
+    def call(self, name, arguments):
+        return ast.Call(func=ast.Name(name, ast.Load()), args=arguments, keywords=[])
+
+    def arguments(self, parameters):
+        return ast.arguments(posonlyargs=[], args=[ast.arg(variable(parameter)) for parameter in parameters],
+                             kwonlyargs=[], kw_defaults=[], defaults=[])
+
+    def scope_prologue(self, parameters, body):
+        prologue = []
+        # Every `def` binds the module-level name, wherever it appears, as functions are global.
+        defined = {node.name for node in walk_scope(body) if isinstance(node, FunctionNode)}
+        if defined:
+            prologue.append(ast.Global(names=[function(name) for name in sorted(defined)]))
+        for name in sorted(self.scope - set(parameters)):
+            prologue.append(ast.Assign(targets=[ast.Name(variable(name), ast.Store())], value=ast.Constant(None)))
+        return prologue
+
+    def statements(self, nodes, top_level=False):
+        body = []
+        for node in nodes:
+            translated = self.statement(node)
+            if top_level and any(isinstance(inner, ReturnNode) for inner in walk_scope([node])):
+                translated = [ast.Try(body=translated,
+                                      handlers=[ast.ExceptHandler(type=ast.Name('TopLevelReturn', ast.Load()),
+                                                                  name=None, body=[ast.Pass()])],
+                                      orelse=[], finalbody=[])]
+            body.extend(translated)
+        return body or [ast.Pass()]
+
+    def statement(self, node):
+        if isinstance(node, VarDeclNode):
+            return [ast.Assign(targets=[ast.Name(variable(node.var_name), ast.Store())], value=self.expression(node.value))]
+        if isinstance(node, PrintNode):
+            return [ast.Expr(self.call('print', [self.expression(node.value)]))]
+        if isinstance(node, ReturnNode):
+            if self.in_function:
+                return [ast.Return(self.expression(node.value))]
+            return [ast.Expr(self.expression(node.value)),
+                    ast.Raise(exc=ast.Name('TopLevelReturn', ast.Load()), cause=None)]
+        if isinstance(node, FunctionNode):
+            return [self.function_def(node)]
+        if isinstance(node, IfNode):
+            orelse = self.statements(node.else_node.body) if node.else_node is not None else []
+            return [ast.If(test=self.expression(node.condition), body=self.statements(node.body), orelse=orelse)]
+        if isinstance(node, ElseNode):
+            return self.statements(node.body)
+        if isinstance(node, WhileNode):
+            return [ast.While(test=self.expression(node.condition), body=self.statements(node.body), orelse=[])]
+        if isinstance(node, ForNode):
+            return self.for_loop(node)
+        return [ast.Expr(self.expression(node))]
+
+    def function_def(self, node):
+        enclosing = (self.scope, self.in_function)
+        self.scope = assigned_names(node.body) | set(node.parameters)
+        self.in_function = True
+        body = self.scope_prologue(node.parameters, node.body) + self.statements(node.body)
+        self.scope, self.in_function = enclosing
+        return ast.FunctionDef(name=function(node.name), args=self.arguments(node.parameters), body=body,
+                               decorator_list=[], returns=None, type_comment=None)
+
+    def for_loop(self, node):
+        loop_variable = ast.Name(variable(node.variable), ast.Store())
+        end = self.hidden()
+        setup = [ast.Assign(targets=[loop_variable], value=self.expression(node.start)),
+                 ast.Assign(targets=[ast.Name(end, ast.Store())], value=self.expression(node.end))]
+        below_end = ast.Compare(left=ast.Name(variable(node.variable), ast.Load()), ops=[ast.Lt()],
+                                comparators=[ast.Name(end, ast.Load())])
+        increment = ast.AugAssign(target=ast.Name(variable(node.variable), ast.Store()), op=ast.Add(), value=ast.Constant(1))
+        if node.variable in assigned_names(node.body):
+            # The body moves the loop variable itself, so keep the interpreter's exact while-loop form.
+            return setup + [ast.While(test=below_end, body=self.statements(node.body) + [increment], orelse=[])]
+        loop = ast.For(target=loop_variable,
+                       iter=self.call('_sl_range', [ast.Name(variable(node.variable), ast.Load()), ast.Name(end, ast.Load())]),
+                       body=self.statements(node.body), orelse=[], type_comment=None)
+        return setup + [loop, ast.If(test=below_end, body=[increment], orelse=[])]
+
+    def expression(self, node):
+        if isinstance(node, (int, float)):
+            return ast.Constant(node)
+        if isinstance(node, str):
+            if node in self.scope:
+                return ast.Name(variable(node), ast.Load())
+            return ast.Constant(None)
+        if isinstance(node, BinaryOpNode):
+            op = node.op.type
+            left, right = self.expression(node.left), self.expression(node.right)
+            if op in BINARY_OPERATORS:
+                return ast.BinOp(left=left, op=BINARY_OPERATORS[op](), right=right)
+            if op in COMPARE_OPERATORS:
+                return ast.Compare(left=left, ops=[COMPARE_OPERATORS[op]()], comparators=[right])
+            return ast.BoolOp(op=ast.And() if op == TokenType.AND else ast.Or(), values=[left, right])
+        if isinstance(node, FunctionCallNode):
+            arities = self.arities.get(node.name, set())
+            if arities and len(node.arguments) not in arities:
+                return self.call('_sl_argument_mismatch', [ast.Constant(node.name)])
+            return self.call(function(node.name), [self.expression(argument) for argument in node.arguments])
+        if isinstance(node, ArrayIndexNode):
+            array = self.expression(node.array_identifier)
+            return self.call('_sl_index', [array, self.expression(node.index), ast.Constant(node.array_identifier)])
+        if isinstance(node, ArrayNode):
+            return ast.List(elts=[self.expression(element) for element in node.elements], ctx=ast.Load())
+        raise Exception(f"Cannot translate {type(node).__name__}")
+
+class PythonInterpreter:
+    """ Engine wrapper so the Python backend can be used like `Interpreter`. """
+    def __init__(self, parser):
+        self.parser = parser
+        self.variables = {}
+
+    def __repr__(self):
+        return f"PythonInterpreter({repr(self.parser)}, {repr(self.variables)})"
+
+    def interpret(self):
+        self.variables = PythonGenerator(self.parser.parse()).run()
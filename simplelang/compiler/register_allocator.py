@@ -0,0 +1,133 @@
+import bisect
+
+from simplelang.compiler.cfg import CFG, Liveness, uses, defines
+
+class Interval:
+    """
+    Where variable `name` is live in the linear order of a unit's quads. Quad p
+    reads its operands at position 2p and writes its result at 2p + 1, so a value
+    last read by a quad may share its register with the value that quad writes.
+    """
+    def __init__(self, name, start, end):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.register = None
+        self.slot = None
+        self.crosses_call = False
+
+    def __repr__(self):
+        location = self.register if self.slot is None else f"slot {self.slot}"
+        return f"Interval({self.name}, {self.start}-{self.end}, {location})"
+
+def live_intervals(code, live_at_exit=()):
+    """ name -> `Interval` for every variable of one unit of TAC, from its liveness. """
+    intervals = {}
+
+    def extend(name, position):
+        interval = intervals.get(name)
+        if interval is None:
+            intervals[name] = Interval(name, position, position)
+        else:
+            interval.start = min(interval.start, position)
+            interval.end = max(interval.end, position)
+
+    if not code:
+        return intervals
+    cfg = CFG(code)
+    liveness = Liveness(cfg, live_at_exit)
+    for block in cfg.blocks:
+        if block.end == block.start:
+            continue
+        for name in liveness.variables.members(liveness.live_in[block.index]):
+            extend(name, 2 * block.start)
+        for name in liveness.variables.members(liveness.live_out[block.index]):
+            extend(name, 2 * (block.end - 1) + 1)
+        for position in range(block.start, block.end):
+            quad = cfg.code[position]
+            for name in uses(quad):
+                extend(name, 2 * position)
+            target = defines(quad)
+            if target is not None:
+                extend(target, 2 * position + 1)
+    return intervals
+
+class Allocation:
+    """ The result of `LinearScanAllocator.allocate`: a register or a stack slot for every variable. """
+    def __init__(self, intervals, slots):
+        self.intervals = intervals
+        self.slots = slots
+
+    def __repr__(self):
+        return f"Allocation({len(self.intervals)} variables, {len(self.spilled())} spilled)"
+
+    def register(self, name):
+        """ The register holding `name`, or None when it lives in a stack slot. """
+        return self.intervals[name].register
+
+    def slot(self, name):
+        return self.intervals[name].slot
+
+    def spilled(self):
+        return sorted(interval.name for interval in self.intervals.values() if interval.slot is not None)
+
+    def registers(self):
+        """ The registers handed out, in allocation order of first use. """
+        used = []
+        for interval in sorted(self.intervals.values(), key=lambda interval: interval.start):
+            if interval.register is not None and interval.register not in used:
+                used.append(interval.register)
+        return used
+
+class LinearScanAllocator:
+    """
+    Linear-scan register allocation (Poletto and Sarkar) over `live_intervals`:
+    intervals are taken by start; one whose start is past an active interval's end
+    frees its register, and when none is free the interval ending last (the new
+    one or an active one) goes to a stack slot for all of its lifetime. Registers
+    are handed out in the order of `registers`, lowest first.
+
+    Quads whose op is in `calls` clobber every register but `preserved`; an
+    interval live across one only gets a preserved register (or a slot).
+    """
+    def __init__(self, registers, preserved=None, calls=()):
+        self.registers = list(registers)
+        self.preserved = set(self.registers if preserved is None else preserved)
+        self.calls = set(calls)
+
+    def __repr__(self):
+        return f"LinearScanAllocator({self.registers})"
+
+    def allocate(self, code, live_at_exit=()):
+        intervals = live_intervals(code, live_at_exit)
+        calls = [2 * position for position, quad in enumerate(code) if quad[0] in self.calls]
+        for interval in intervals.values():
+            # Live when a call reads its arguments and still live once it has written its result.
+            index = bisect.bisect_left(calls, interval.start)
+            interval.crosses_call = index < len(calls) and calls[index] + 1 <= interval.end
+        order = {register: position for position, register in enumerate(self.registers)}
+        free = list(self.registers)
+        active = []
+        slots = 0
+        for interval in sorted(intervals.values(), key=lambda interval: (interval.start, interval.end, interval.name)):
+            while active and active[0].end < interval.start:
+                free.append(active.pop(0).register)
+            free.sort(key=order.get)
+            usable = [register for register in free if not interval.crosses_call or register in self.preserved]
+            victims = [other for other in active if not interval.crosses_call or other.register in self.preserved]
+            if usable:
+                interval.register = usable[0]
+                free.remove(usable[0])
+            elif victims and victims[-1].end > interval.end:
+                victim = victims[-1]
+                active.remove(victim)
+                interval.register, victim.register = victim.register, None
+                victim.slot = slots
+                slots += 1
+            else:
+                interval.slot = slots
+                slots += 1
+                continue
+            active.append(interval)
+            active.sort(key=lambda interval: interval.end)
+        return Allocation(intervals, slots)
@@ -0,0 +1,329 @@
+import re
+
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.cfg import CFG, Liveness, split_functions, join_functions, uses, defines
+from simplelang.compiler.tac_optimizer import TACOptimizer, TAC_PASSES, TEMP, is_copy, substitute
+
+VERSION = re.compile(r'^(.+)\.(\d+)$')
+
+def is_version(name):
+    """ Whether `name` is an SSA version such as `x.2` (SimpleLang names have no dots). """
+    return isinstance(name, str) and VERSION.match(name) is not None
+
+def base_name(name):
+    """ The variable an SSA version belongs to: `x` for `x.2`, and `x` for `x` itself. """
+    match = VERSION.match(name)
+    return name if match is None else match.group(1)
+
+def version_number(name):
+    match = VERSION.match(name)
+    return 0 if match is None else int(match.group(2))
+
+def program_variables(code):
+    """ The named variables (not temporaries or versions) the quads of `code` read or assign. """
+    return sorted({name for quad in code for name in uses(quad) + (defines(quad),)
+                   if name is not None and not TEMP.match(name) and not is_version(name)})
+
+def rename(quad, names):
+    """ `quad` with every variable it reads or assigns passed through the mapping `names`. """
+    quad = substitute(quad, lambda name, index=False: names.get(name, name))
+    target = defines(quad)
+    if target is not None and target in names:
+        quad = quad[:3] + (names[target],)
+    return quad
+
+def sequentialize(copies, gen_temp):
+    """
+    Quads performing the parallel assignment `copies`, a list of (target,
+    source), one copy at a time: a target is only overwritten once no pending
+    copy reads it, and a cycle (`a, b = b, a`) is broken through a temporary.
+    """
+    pending = [(target, source) for target, source in copies if target != source]
+    quads = []
+    while pending:
+        sources = {source for _, source in pending if isinstance(source, str)}
+        ready = [copy for copy in pending if copy[0] not in sources]
+        if ready:
+            quads.extend(('=', source, None, target) for target, source in ready)
+            pending = [copy for copy in pending if copy[0] in sources]
+        else:
+            saved = pending[0][0]
+            temp = gen_temp()
+            quads.append(('=', saved, None, temp))
+            pending = [(target, temp if source == saved else source) for target, source in pending]
+    return quads
+
+class SSA:
+    """
+    Converts units of TAC (the program or a function body, see
+    `cfg.split_functions`) into static single assignment form and back.
+
+    In SSA form every variable, temporaries included, is assigned by exactly one
+    quad: the n-th definition of `x` becomes `x.n`, and where definitions from
+    different paths meet, a `('phi', ((label, value), ...), None, 'x.n')` quad
+    right after the block's label takes the value from whichever predecessor
+    (named by the label it starts with) control came from. A variable's bare
+    name is its value when the unit starts (parameters, globals read before
+    being assigned); the final value of every `live_at_exit` variable is copied
+    back to its bare name before the unit ends. Phis are placed at the iterated
+    dominance frontier of a variable's definitions, and only where it is live
+    (pruned SSA). Every block gets a label and unreachable blocks are dropped.
+
+    `destruct` replaces the phis by copies at the end of the predecessors,
+    splitting edges that leave a conditional jump, then gives versions of the
+    same variable their bare name back wherever their values never overlap.
+
+    Fresh labels and temporaries come from `tac`.
+    """
+    def __init__(self, tac):
+        self.tac = tac
+
+    def __repr__(self):
+        return f"SSA({self.tac.label_counter} labels, {self.tac.temp_counter} temps)"
+
+    def construct(self, code, live_at_exit=()):
+        if not code:
+            return list(code)
+        cfg = CFG(self.label_blocks(code))
+        liveness = Liveness(cfg, live_at_exit)
+        idom = cfg.immediate_dominators()
+        frontiers = cfg.dominance_frontiers()
+        labels = [cfg.code[block.start][3] for block in cfg.blocks]
+
+        # Phi placement: phis[i] maps a variable to [version, {predecessor label: value}].
+        defining = {}
+        for block in cfg.blocks:
+            for quad in cfg.quads(block):
+                target = defines(quad)
+                if target is not None:
+                    defining.setdefault(target, set()).add(block.index)
+        phis = [{} for _ in cfg.blocks]
+        for name in sorted(defining):
+            bit = liveness.variables.bit(name)
+            work = sorted(defining[name])
+            visited = set()
+            while work:
+                for frontier in frontiers[work.pop()]:
+                    if frontier not in visited:
+                        visited.add(frontier)
+                        if liveness.live_in[frontier] & bit:
+                            phis[frontier][name] = [None, {}]
+                        work.append(frontier)
+
+        # Renaming, walking the dominator tree with a stack of versions per variable.
+        taken = {name for quad in cfg.code for name in uses(quad) + (defines(quad),) if name is not None}
+        counters = {}
+        stacks = {}
+
+        def new_version(name):
+            number = counters.get(name, 0)
+            while True:
+                number += 1
+                version = f"{name}.{number}"
+                if version not in taken:
+                    break
+            counters[name] = number
+            stacks.setdefault(name, []).append(version)
+            return version
+
+        def current(name, index=False):
+            stack = stacks.get(name)
+            return stack[-1] if stack else name
+
+        children = [[] for _ in cfg.blocks]
+        for block in cfg.blocks:
+            if idom[block.index] is not None:
+                children[idom[block.index]].append(block.index)
+        exits = {block.index for block in cfg.exits}
+        renamed = [None] * len(cfg.blocks)
+        pushed = {}
+        work = [(cfg.entry.index, False)]
+        while work:
+            index, finished = work.pop()
+            if finished:
+                for name in pushed.pop(index):
+                    stacks[name].pop()
+                continue
+            block = cfg.blocks[index]
+            defined = []
+            for name, phi in phis[index].items():
+                phi[0] = new_version(name)
+                defined.append(name)
+            quads = []
+            for quad in cfg.quads(block):
+                quad = substitute(quad, current)
+                target = defines(quad)
+                if target is not None:
+                    quad = quad[:3] + (new_version(target),)
+                    defined.append(target)
+                quads.append(quad)
+            if index in exits:
+                copies = [('=', current(name), None, name) for name in live_at_exit if current(name) != name]
+                if quads[-1][0] in ('return', 'tailcall'):
+                    quads[-1:-1] = copies
+                else:
+                    quads.extend(copies)
+            for successor in block.successors:
+                for name, phi in phis[successor.index].items():
+                    phi[1][labels[index]] = current(name)
+            renamed[index] = quads
+            pushed[index] = defined
+            work.append((index, True))
+            work.extend((child, False) for child in reversed(children[index]))
+
+        code = []
+        for block in cfg.blocks:
+            quads = renamed[block.index]
+            code.append(quads[0])
+            for name, (version, values) in phis[block.index].items():
+                arguments = tuple((labels[predecessor.index], values[labels[predecessor.index]])
+                                  for predecessor in block.predecessors)
+                code.append(('phi', arguments, None, version))
+            code.extend(quads[1:])
+        return code
+
+    def label_blocks(self, code):
+        """ `code` without its unreachable blocks, every block starting with a label and the entry with no predecessors. """
+        cfg = CFG(code)
+        reachable = {block.index for block in cfg.postorder()}
+        labelled = []
+        if cfg.entry.predecessors:
+            # A loop back to the first quad: control also arrives from outside, so it needs a block of its own.
+            labelled.append(('label', None, None, self.tac.gen_label()))
+        for block in cfg.blocks:
+            if block.index in reachable:
+                quads = cfg.quads(block)
+                if quads[0][0] != 'label':
+                    labelled.append(('label', None, None, self.tac.gen_label()))
+                labelled.extend(quads)
+        return labelled
+
+    def destruct(self, code, live_at_exit=(), coalesce=True):
+        if not code:
+            return list(code)
+        cfg = CFG(code)
+        # Parallel copies per block: at its end (before a final goto), and on the
+        # split edges after it (falling through) or at the end of the unit (jumped to).
+        at_end = {}
+        inline = {}
+        retargets = {}
+        edge_blocks = []
+        for block in cfg.blocks:
+            quads = cfg.quads(block)
+            edges = {}
+            for quad in quads:
+                if quad[0] == 'phi':
+                    for label, value in quad[1]:
+                        edges.setdefault(label, []).append((quad[3], value))
+            if not edges:
+                continue
+            label = quads[0][3]
+            for predecessor_label, copies in edges.items():
+                predecessor = cfg.labels[predecessor_label]
+                last = cfg.code[predecessor.end - 1]
+                if last[0] == 'ifFalse':
+                    if cfg.labels.get(last[3]) is block:
+                        split = self.tac.gen_label()
+                        retargets[predecessor.index] = split
+                        edge_blocks.append(('label', None, None, split))
+                        edge_blocks.extend(sequentialize(copies, self.tac.gen_temp))
+                        edge_blocks.append(('goto', None, None, label))
+                    if predecessor.index + 1 == block.index:
+                        inline[predecessor.index] = [('label', None, None, self.tac.gen_label())]
+                        inline[predecessor.index].extend(sequentialize(copies, self.tac.gen_temp))
+                else:
+                    at_end[predecessor.index] = sequentialize(copies, self.tac.gen_temp)
+
+        destructed = []
+        for block in cfg.blocks:
+            quads = [quad for quad in cfg.quads(block) if quad[0] != 'phi']
+            if block.index in retargets:
+                op, arg1, arg2, _ = quads[-1]
+                quads[-1] = (op, arg1, arg2, retargets[block.index])
+            if block.index in at_end:
+                if quads[-1][0] == 'goto':
+                    quads[-1:-1] = at_end[block.index]
+                else:
+                    quads.extend(at_end[block.index])
+            quads.extend(inline.get(block.index, ()))
+            destructed.extend(quads)
+        if edge_blocks:
+            if destructed[-1][0] in ('goto', 'return', 'tailcall'):
+                destructed.extend(edge_blocks)
+            else:
+                end = self.tac.gen_label()
+                destructed.append(('goto', None, None, end))
+                destructed.extend(edge_blocks)
+                destructed.append(('label', None, None, end))
+        if coalesce:
+            destructed = self.coalesce(destructed, live_at_exit)
+        # Drop the edge blocks and labels that turned out not to be needed.
+        cleanup = TACOptimizer(**{name: name in ('thread_jumps', 'remove_unreachable') for name in TAC_PASSES})
+        return cleanup.optimize_unit(destructed, live_at_exit)
+
+    def coalesce(self, code, live_at_exit=()):
+        """
+        Rename versions back to their variable's bare name where that never
+        merges two values that are live at once (a copy between them aside),
+        then drop the copies that became `x = x`.
+        """
+        cfg = CFG(code)
+        liveness = Liveness(cfg, live_at_exit)
+        variables = liveness.variables
+        families = {}
+        for name in variables.items:
+            families[base_name(name)] = families.get(base_name(name), 0) | variables.bit(name)
+        interference = {name: 0 for name in variables.items}
+        for block in cfg.blocks:
+            live_after = liveness.live_after(block)
+            for offset, quad in enumerate(cfg.quads(block)):
+                target = defines(quad)
+                if target is None:
+                    continue
+                live = live_after[offset] & families[base_name(target)] & ~variables.bit(target)
+                if is_copy(quad) and isinstance(quad[1], str):
+                    live &= ~variables.bit(quad[1])
+                interference[target] |= live
+                for other in variables.members(live):
+                    interference[other] |= variables.bit(target)
+        names = {}
+        for base, family in families.items():
+            merged = variables.bit(base) if base in variables.bits else 0
+            for name in sorted(variables.members(family), key=version_number):
+                if name != base and not interference[name] & merged:
+                    merged |= variables.bit(name)
+                    names[name] = base
+        coalesced = []
+        for quad in code:
+            quad = rename(quad, names)
+            if not (is_copy(quad) and quad[1] == quad[3]):
+                coalesced.append(quad)
+        return coalesced
+
+def to_ssa(tac):
+    """ A new `TAC` with the program and every function in SSA form; `tac` itself is left as it was. """
+    converted = copy_tac(tac)
+    ssa = SSA(converted)
+    main, functions = split_functions(tac.code, anchored=True)
+    main = ssa.construct(main, program_variables(main))
+    functions = [(name, count, ssa.construct(body)) for name, count, body in functions]
+    converted.code = join_functions(main, functions, anchored=True)
+    return converted
+
+def from_ssa(tac, coalesce=True):
+    """ A new `TAC` running the SSA form `tac` without phis. """
+    converted = copy_tac(tac)
+    ssa = SSA(converted)
+    main, functions = split_functions(tac.code, anchored=True)
+    main = ssa.destruct(main, program_variables(main), coalesce)
+    functions = [(name, count, ssa.destruct(body, (), coalesce)) for name, count, body in functions]
+    converted.code = join_functions(main, functions, anchored=True)
+    return converted
+
+def copy_tac(tac):
+    copied = TAC()
+    copied.functions = dict(tac.functions)
+    copied.temp_counter = tac.temp_counter
+    copied.label_counter = tac.label_counter
+    copied.code = list(tac.code)
+    return copied
@@ -1,10 +1,32 @@
 from simplelang.sl_parser import BinaryOpNode, VarDeclNode, ForNode, WhileNode, PrintNode, ElseNode, IfNode, ArrayNode, ArrayIndexNode, FunctionNode, FunctionCallNode, ReturnNode
+from simplelang.lexer import Token
+from simplelang.tokens import TokenType
+
+OP_SYMBOLS = {
+    TokenType.PLUS: '+',
+    TokenType.MINUS: '-',
+    TokenType.MUL: '*',
+    TokenType.DIV: '/',
+    TokenType.GREATER: '>',
+    TokenType.LESS: '<',
+    TokenType.GREATER_EQUAL: '>=',
+    TokenType.LESS_EQUAL: '<=',
+    TokenType.EQUAL_EQUAL: '==',
+    TokenType.NOT_EQUAL: '!=',
+    TokenType.AND: '&&',
+    TokenType.OR: '||',
+}
+
+BINARY_OPS = ['+', '-', '/', '*', '<', '>', '<=', '>=', '==', '!=', '&&', '||']
 
 class TAC:
     def __init__(self):
         self.code = []
         self.temp_counter = 0
         self.label_counter = 0
+        self.functions = {}
+        self.function_depth = 0
+        self.statement_end = None
 
     def emit(self, op, arg1=None, arg2=None, result=None):
         self.code.append((op, arg1, arg2, result))
@@ -20,20 +42,40 @@ class TAC:
         return label
     
     def generate_tac(self, node):
+        if self.statement_end is None and not self.function_depth:
+            # A `return` outside of a function only leaves the top-level statement it is in.
+            self.statement_end = False
+            result = self.generate_tac(node)
+            if self.statement_end:
+                self.emit('label', None, None, self.statement_end)
+            self.statement_end = None
+            return result
+
         if isinstance(node, VarDeclNode):
             if isinstance(node.value, ArrayNode):
                 self.emit('alloc', len(node.value.elements), None, node.var_name)
                 for i, element in enumerate(node.value.elements):
-                    self.emit('=', element, None, f"{node.var_name}[{i}]")
+                    self.emit('=', self.generate_tac(element), None, f"{node.var_name}[{i}]")
             else:
                 value = self.generate_tac(node.value)
                 self.emit('=', value, None, node.var_name)
 
         elif isinstance(node, BinaryOpNode):
             temp = self.gen_temp()
+            op = OP_SYMBOLS[node.op.type] if isinstance(node.op, Token) else node.op
+            if op in ('&&', '||'):
+                return self.generate_logical(op, node, temp)
             left_result = self.generate_tac(node.left)  # Recursively process the left operand
             right_result = self.generate_tac(node.right)  # Recursively process the right operand
-            self.emit(node.op, left_result, right_result, temp)
+            self.emit(op, left_result, right_result, temp)
+            return temp
+
+        elif isinstance(node, ArrayNode):
+            elements = [self.generate_tac(element) for element in node.elements]
+            temp = self.gen_temp()
+            self.emit('alloc', len(elements), None, temp)
+            for i, element in enumerate(elements):
+                self.emit('=', element, None, f"{temp}[{i}]")
             return temp
 
         elif isinstance(node, WhileNode):
@@ -43,7 +85,6 @@ class TAC:
             result = self.generate_tac(node.condition)
             self.emit('ifFalse', result, None, l2)
             for n in node.body:
-                print(n)
                 self.generate_tac(n)
             self.emit('goto', None, None, l1)
             self.emit('label', None, None, l2)
@@ -57,8 +98,13 @@ class TAC:
             l2 = self.gen_label()
             start = self.generate_tac(node.start)
             self.emit('=', start, None, node.variable)
+            # The bound is evaluated once, before the loop, like the interpreter does.
+            end = self.generate_tac(node.end)
+            if isinstance(node.end, str):
+                end = self.gen_temp()
+                self.emit('=', node.end, None, end)
             self.emit('label', None, None, l1)
-            result = self.generate_tac(BinaryOpNode(node.variable, '<', node.end))
+            result = self.generate_tac(BinaryOpNode(node.variable, '<', end))
             self.emit('ifFalse', result, None, l2)
             for n in node.body:
                 self.generate_tac(n)
@@ -116,13 +162,23 @@ class TAC:
             self.emit('label', None, None, l3)
 
         elif isinstance(node, ArrayIndexNode):
+            index = self.generate_tac(node.index)
             temp = self.gen_temp()
-            self.emit('=', f"{node.array_identifier}[{node.index}]", None, temp)
+            self.emit('=', f"{node.array_identifier}[{index}]", None, temp)
             return temp
         
         elif isinstance(node, ReturnNode):
-            result = self.generate_tac(node.value)
-            self.emit('return', result, None, None)
+            if self.function_depth and isinstance(node.value, FunctionCallNode):
+                # A call in tail position: the callee's frame replaces the current one.
+                self.emit('tailcall', node.value.name, self.generate_arguments(node.value), None)
+            elif self.function_depth:
+                result = self.generate_tac(node.value)
+                self.emit('return', result, None, None)
+            else:
+                self.generate_tac(node.value)
+                if not self.statement_end:
+                    self.statement_end = self.gen_label()
+                self.emit('goto', None, None, self.statement_end)
 
         elif isinstance(node, FunctionNode):
             """
@@ -137,11 +193,14 @@ class TAC:
             return t0
             endFunc
             """
+            self.functions[node.name] = node.parameters
             self.emit('label', None, None, node.name)
             space_to_hold = len(node.parameters)
             self.emit('beginFunc', space_to_hold, None, None)
+            self.function_depth += 1
             for n in node.body:
                 self.generate_tac(n)
+            self.function_depth -= 1
             self.emit('endFunc', None, None, None)
 
         elif isinstance(node, FunctionCallNode):
@@ -156,20 +215,50 @@ class TAC:
             t2 = alloc 2
             t2[0] = t0
             t2[1] = t1
-            call add, t2
+            t3 = call add, t2
             """
-            for arg in node.arguments:
-                self.generate_tac(arg)
-            temp = self.gen_temp()
-            self.emit('alloc', len(node.arguments), None, temp)
-            for i, arg in enumerate(node.arguments):
-                self.emit('=', arg, None, f"{temp}[{i}]")
-            self.emit('call', node.name, temp, None)
+            temp = self.generate_arguments(node)
+            result = self.gen_temp()
+            self.emit('call', node.name, temp, result)
+            return result
+
+    def generate_arguments(self, node):
+        """ Evaluate a call's arguments into a freshly allocated array; returns its temp. """
+        arguments = [self.generate_tac(arg) for arg in node.arguments]
+        temp = self.gen_temp()
+        self.emit('alloc', len(arguments), None, temp)
+        for i, arg in enumerate(arguments):
+            self.emit('=', arg, None, f"{temp}[{i}]")
+        return temp
+
+    def generate_logical(self, op, node, temp):
+        """
+        Lower `a && b` or `a || b` into `temp`, evaluating `b` only when `a` does
+        not decide the result:
+            temp = a                temp = a
+            ifFalse temp goto l0    ifFalse temp goto l0
+            temp = b                goto l1
+            l0:                     l0:
+                                    temp = b
+                                    l1:
+        """
+        self.emit('=', self.generate_tac(node.left), None, temp)
+        right = self.gen_label()
+        self.emit('ifFalse', temp, None, right)
+        if op == '||':
+            end = self.gen_label()
+            self.emit('goto', None, None, end)
+            self.emit('label', None, None, right)
+        else:
+            end = right
+        self.emit('=', self.generate_tac(node.right), None, temp)
+        self.emit('label', None, None, end)
+        return temp
 
     def __str__(self):
         tac_str = ""
         for (op, arg1, arg2, result) in self.code:
-            if op in ['+', '-', '/', '*', '<', '>', '<=', '>=', '==', '!=']:
+            if op in BINARY_OPS:
                 tac_str += f"{result} = {arg1} {op} {arg2}\n"
             elif op == '=':
                 tac_str += f"{result} = {arg1}\n"
@@ -189,6 +278,12 @@ class TAC:
                 tac_str += f"beginFunc {arg1}\n"
             elif op == 'endFunc':
                 tac_str += f"endFunc\n"
+            elif op == 'call' and result is not None:
+                tac_str += f"{result} = call {arg1}, {arg2}\n"
             elif op == 'call':
                 tac_str += f"call {arg1}, {arg2}\n"
+            elif op == 'tailcall':
+                tac_str += f"tailcall {arg1}, {arg2}\n"
+            elif op == 'phi':
+                tac_str += f"{result} = phi {', '.join(f'{label}: {value}' for label, value in arg1)}\n"
         return tac_str
\ No newline at end of file
@@ -0,0 +1,260 @@
+import operator
+import re
+
+from simplelang.compiler.tac import TAC
+from simplelang.errors import MAX_DEPTH, StackOverflowError
+
+(COPY, LOAD_ELEMENT, STORE_ELEMENT, BINARY, DIVIDE, AND, OR, JUMP, JUMP_IF_FALSE, PRINT, ALLOC, CALL, TAILCALL,
+ RETURN, DEFINE) = range(15)
+
+ARITHMETIC = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+ELEMENT = re.compile(r'^(.+)\[(.+)\]$')
+TEMP = re.compile(r'^t\d+$')
+# SSA versions of a variable (see ssa.py), e.g. `x.2`.
+VERSION = re.compile(r'^.+\.\d+$')
+
+class Unit:
+    """ The top-level program or one function: owns a slot layout for its frames. """
+    def __init__(self, name, parameters=()):
+        self.name = name
+        self.parameters = list(parameters)
+        self.slots = {}
+        self.template = []
+        self.entry = None
+        self.end = None
+        for parameter in self.parameters:
+            self.slot(parameter)
+
+    def __repr__(self):
+        return f"Unit({self.name}, {self.parameters})"
+
+    def slot(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.template)
+            self.template.append(None)
+        return self.slots[name]
+
+    def constant(self, value):
+        key = ('const', type(value), value)
+        if key not in self.slots:
+            self.slots[key] = len(self.template)
+            self.template.append(value)
+        return self.slots[key]
+
+class TACInterpreter:
+    """
+    Register machine for the quadruples produced by `TAC.generate_tac`.
+
+    Before running, labels are resolved to instruction indices and every
+    operand (temporaries, variables and constants alike) becomes a slot in the
+    flat list that makes up a frame. Calls push (return address, frame, result
+    slot) onto an explicit stack, so execution never recurses in Python and
+    calls may nest up to `max_depth` deep before a `StackOverflowError`. A
+    `tailcall` replaces the current frame instead of pushing, so tail-recursive
+    code runs in constant space. A function is bound to its name when its
+    definition runs, so a later definition replaces it from then on. `TAC`
+    lowers a `return` outside of any function to a jump past its top-level
+    statement, as the other engines only leave that statement. With an
+    `optimizer` (a `TACOptimizer`), the quadruples are optimized before they
+    are assembled.
+    """
+    def __init__(self, parser, max_depth=MAX_DEPTH, optimizer=None):
+        self.parser = parser
+        self.max_depth = max_depth
+        self.optimizer = optimizer
+        self.main = None
+        self.frame = []
+        self.units = {}
+
+    def __repr__(self):
+        return f"TACInterpreter({repr(self.parser)}, {repr(self.variables)})"
+
+    @property
+    def variables(self):
+        if self.main is None:
+            return {}
+        return {name: self.frame[slot] for name, slot in self.main.slots.items()
+                if isinstance(name, str) and not TEMP.match(name) and not VERSION.match(name)
+                and self.frame[slot] is not None}
+
+    def interpret(self):
+        self.run(self.compile())
+
+    def compile(self):
+        tac = TAC()
+        for node in self.parser.parse():
+            tac.generate_tac(node)
+        if self.optimizer is not None:
+            tac = self.optimizer.optimize(tac)
+        return tac
+
+    def operand(self, unit, value):
+        if isinstance(value, str):
+            if ELEMENT.match(value):
+                raise Exception(f"Unexpected array element operand: {value}")
+            return unit.slot(value)
+        return unit.constant(value)
+
+    def element(self, unit, value):
+        match = ELEMENT.match(value)
+        index = match.group(2)
+        index = int(index) if index.isdigit() else index
+        return match.group(1), unit.slot(match.group(1)), self.operand(unit, index)
+
+    def assemble(self, tac):
+        """ Translate quadruples into (opcode, a, b, c) tuples with labels and operands resolved. """
+        self.main = Unit('<program>')
+        instructions = []
+        labels = {}
+        fixups = []
+        units = [self.main]
+        pending_label = None
+        for op, arg1, arg2, result in tac.code:
+            unit = units[-1]
+            if op == 'label':
+                labels[result] = len(instructions)
+                pending_label = result
+                continue
+            if op == 'beginFunc':
+                # Running the definition binds the name and skips over the body; calls enter past it.
+                function = Unit(pending_label, tac.functions.get(pending_label, ()))
+                function.entry = len(instructions) + 1
+                fixups.append((len(instructions), function))
+                instructions.append((DEFINE, function.name, function, None))
+                units.append(function)
+            elif op == 'endFunc':
+                instructions.append((RETURN, unit.constant(None), None, None))
+                unit.end = len(instructions)
+                units.pop()
+            elif op == '=':
+                if isinstance(result, str) and ELEMENT.match(result):
+                    _, array, index = self.element(unit, result)
+                    instructions.append((STORE_ELEMENT, array, index, self.operand(unit, arg1)))
+                elif isinstance(arg1, str) and ELEMENT.match(arg1):
+                    name, array, index = self.element(unit, arg1)
+                    instructions.append((LOAD_ELEMENT, array, (index, name), unit.slot(result)))
+                else:
+                    instructions.append((COPY, self.operand(unit, arg1), None, unit.slot(result)))
+            elif op in ARITHMETIC:
+                instructions.append((BINARY, ARITHMETIC[op], (self.operand(unit, arg1), self.operand(unit, arg2)), unit.slot(result)))
+            elif op == '/':
+                instructions.append((DIVIDE, self.operand(unit, arg1), self.operand(unit, arg2), unit.slot(result)))
+            elif op == '&&':
+                instructions.append((AND, self.operand(unit, arg1), self.operand(unit, arg2), unit.slot(result)))
+            elif op == '||':
+                instructions.append((OR, self.operand(unit, arg1), self.operand(unit, arg2), unit.slot(result)))
+            elif op == 'goto':
+                fixups.append((len(instructions), result))
+                instructions.append((JUMP, None, None, None))
+            elif op == 'ifFalse':
+                fixups.append((len(instructions), result))
+                instructions.append((JUMP_IF_FALSE, self.operand(unit, arg1), None, None))
+            elif op == 'print':
+                instructions.append((PRINT, self.operand(unit, arg1), None, None))
+            elif op == 'alloc':
+                instructions.append((ALLOC, arg1, None, unit.slot(result)))
+            elif op == 'call':
+                instructions.append((CALL, arg1, self.operand(unit, arg2), None if result is None else unit.slot(result)))
+            elif op == 'tailcall':
+                instructions.append((TAILCALL, arg1, self.operand(unit, arg2), None))
+            elif op == 'return':
+                instructions.append((RETURN, self.operand(unit, arg1), None, None))
+            else:
+                raise Exception(f"Unknown TAC op: {op}")
+            pending_label = None
+        for position, target in fixups:
+            opcode, a, b, _ = instructions[position]
+            address = target.end if isinstance(target, Unit) else labels[target]
+            instructions[position] = (opcode, a, b, address)
+        instructions.append((RETURN, self.main.constant(None), None, None))
+        return instructions
+
+    def run(self, tac):
+        instructions = self.assemble(tac)
+        (COPY_, LOAD_ELEMENT_, STORE_ELEMENT_, BINARY_, DIVIDE_, AND_, OR_, JUMP_, JUMP_IF_FALSE_, PRINT_, ALLOC_, CALL_,
+         TAILCALL_, RETURN_, DEFINE_) = (COPY, LOAD_ELEMENT, STORE_ELEMENT, BINARY, DIVIDE, AND, OR, JUMP, JUMP_IF_FALSE,
+                                         PRINT, ALLOC, CALL, TAILCALL, RETURN, DEFINE)
+        units = self.units = {}
+        max_depth = self.max_depth
+        calls = []
+        frame = self.frame = list(self.main.template)
+        ip = 0
+        while True:
+            op, a, b, c = instructions[ip]
+            ip += 1
+            if op == BINARY_:
+                frame[c] = a(frame[b[0]], frame[b[1]])
+            elif op == COPY_:
+                frame[c] = frame[a]
+            elif op == JUMP_IF_FALSE_:
+                if not frame[a]:
+                    ip = c
+            elif op == JUMP_:
+                ip = c
+            elif op == CALL_:
+                function = units.get(a)
+                if function is None:
+                    raise Exception(f"Undefined function: {a}")
+                arguments = frame[b]
+                if len(arguments) != len(function.parameters):
+                    raise Exception(f"Argument mismatch for function: {a}")
+                if len(calls) >= max_depth:
+                    raise StackOverflowError(a, max_depth)
+                calls.append((ip, frame, c))
+                frame = list(function.template)
+                frame[:len(arguments)] = arguments
+                ip = function.entry
+            elif op == TAILCALL_:
+                function = units.get(a)
+                if function is None:
+                    raise Exception(f"Undefined function: {a}")
+                arguments = frame[b]
+                if len(arguments) != len(function.parameters):
+                    raise Exception(f"Argument mismatch for function: {a}")
+                frame = list(function.template)
+                frame[:len(arguments)] = arguments
+                ip = function.entry
+            elif op == RETURN_:
+                value = frame[a]
+                if not calls:
+                    return
+                ip, frame, result = calls.pop()
+                if result is not None:
+                    frame[result] = value
+            elif op == LOAD_ELEMENT_:
+                array = frame[a]
+                if array is None:
+                    raise Exception(f"Undefined array: {b[1]}")
+                index = frame[b[0]]
+                if index < 0 or index >= len(array):
+                    raise Exception(f"Index out of bounds: {index}")
+                frame[c] = array[index]
+            elif op == STORE_ELEMENT_:
+                frame[a][frame[b]] = frame[c]
+            elif op == ALLOC_:
+                frame[c] = [None] * a
+            elif op == DIVIDE_:
+                right = frame[b]
+                if right == 0:
+                    raise Exception("Division by zero")
+                frame[c] = frame[a] / right
+            elif op == AND_:
+                frame[c] = frame[a] and frame[b]
+            elif op == OR_:
+                frame[c] = frame[a] or frame[b]
+            elif op == PRINT_:
+                print(frame[a])
+            elif op == DEFINE_:
+                units[a] = b
+                ip = c
@@ -0,0 +1,584 @@
+import re
+
+from simplelang.compiler.tac import TAC, BINARY_OPS
+from simplelang.compiler.cfg import (CFG, Liveness, ReachingDefinitions, Universe, ELEMENT, JUMPS, TERMINATORS,
+                                     INTERSECTION, solve, split_functions, join_functions, uses, defines)
+
+TAC_PASSES = ('thread_jumps', 'remove_unreachable', 'propagate_copies', 'eliminate_common_subexpressions',
+              'hoist_loop_invariants', 'reduce_strength', 'eliminate_dead_code')
+
+TEMP = re.compile(r'^t\d+$')
+
+# Quads that only compute their result, so they may go when it is never used. Division can
+# raise "Division by zero" and element loads can fail, so those always stay.
+REMOVABLE = set(BINARY_OPS) - {'/'} | {'alloc'}
+# Quads computing the same value on every iteration when their operands do (`alloc` makes a new array each time).
+HOISTABLE = set(BINARY_OPS) - {'/'}
+
+def is_variable(value):
+    return isinstance(value, str) and not ELEMENT.match(value)
+
+def is_copy(quad):
+    """ `x = y` or `x = 5`: a plain copy of a variable or constant into a variable. """
+    op, arg1, _, result = quad
+    return op == '=' and is_variable(result) and (is_variable(arg1) or not isinstance(arg1, str))
+
+def substitute(quad, replace):
+    """ `quad` with every variable it reads passed through `replace(name, index=False)`. """
+    op, arg1, arg2, result = quad
+
+    def operand(value):
+        if not isinstance(value, str):
+            return value
+        match = ELEMENT.match(value)
+        if match is None:
+            return replace(value)
+        array, index = match.groups()
+        if not index.isdigit():
+            index = replace(index, True)
+        return f"{replace(array, None)}[{index}]"
+
+    if op == '=':
+        if isinstance(result, str) and ELEMENT.match(result):
+            result = operand(result)
+        return (op, operand(arg1), arg2, result)
+    if op in BINARY_OPS:
+        return (op, operand(arg1), operand(arg2), result)
+    if op in ('ifFalse', 'print', 'return'):
+        return (op, operand(arg1), arg2, result)
+    if op in ('call', 'tailcall'):
+        return (op, arg1, operand(arg2), result)
+    if op == 'phi':
+        return (op, tuple((label, operand(value)) for label, value in arg1), arg2, result)
+    return quad
+
+def increment(quad):
+    """ The constant step of `x = x + c`, `x = c + x` or `x = x - c`, or None for any other quad. """
+    op, arg1, arg2, result = quad
+    if op == '+' and arg1 == result and type(arg2) is int:
+        return arg2
+    if op == '+' and arg2 == result and type(arg1) is int:
+        return arg1
+    if op == '-' and arg1 == result and type(arg2) is int:
+        return -arg2
+    return None
+
+def first_quads(code):
+    """ label -> position of the first quad after it that is not a label. """
+    targets = {}
+    pending = []
+    for position, quad in enumerate(code):
+        if quad[0] == 'label':
+            pending.append(quad[3])
+        else:
+            for label in pending:
+                targets[label] = position
+            pending = []
+    for label in pending:
+        targets[label] = len(code)
+    return targets
+
+class TACOptimizer:
+    """
+    Optimizes the quadruples of a `TAC`, one unit (the program or a function
+    body, see `cfg.split_functions`) at a time, repeating its passes until
+    nothing changes:
+
+    - thread_jumps: a jump to a `goto` goes straight to its target, jumps to the
+      next quad are dropped and an `ifFalse` on a constant becomes a `goto` or
+      nothing.
+    - remove_unreachable: blocks the entry cannot reach are deleted, then labels
+      nothing jumps to.
+    - propagate_copies: after `x = y` (or `x = 5`), reads of `x` use `y` for as
+      long as both hold (available copies, globally), and `t = <expr>; x = t`
+      becomes `x = <expr>` when `t` is dead afterwards.
+    - eliminate_common_subexpressions: a binary operation whose value is already
+      available on every path (available expressions, globally) reuses it
+      through a new temporary.
+    - hoist_loop_invariants: a computation inside a natural loop whose
+      operands no quad of the loop assigns, and that every pass through the
+      loop runs, moves to a preheader in front of the loop. The preheader
+      starts with a copy of the header's exit test, so a loop that is never
+      entered skips it; loops whose header does more than test are left
+      alone. When other values of its result can be seen (it is assigned
+      elsewhere in the loop, or read before it or after the loop) it is
+      computed into a new temporary there and copied in the loop instead.
+    - reduce_strength: in a loop whose variable `i` is only ever stepped by a
+      constant (`i = i + c`) and starts from an integer constant, `i * k`
+      becomes a temporary set to `i * k` in the preheader and increased by
+      `c * k` wherever `i` is.
+    - eliminate_dead_code: computations whose result is never read are deleted.
+      The program's named variables stay live at its end, as
+      `TACInterpreter.variables` shows them.
+
+    Dead-code elimination takes binary operations other than division to be
+    unable to fail, so `x = a - 1` goes when `x` is never read, even if `a`
+    holds an array. Hoisted computations only run when the loop would have run
+    them, though possibly before other quads of its first pass.
+
+    Each pass is enabled by the keyword argument of the same name. `stats` has
+    the quad counts before and after, and per pass how many quads it changed or
+    removed.
+    """
+    def __init__(self, thread_jumps=True, remove_unreachable=True, propagate_copies=True,
+                 eliminate_common_subexpressions=True, hoist_loop_invariants=True, reduce_strength=True,
+                 eliminate_dead_code=True, rounds=8):
+        self.enabled = {
+            'thread_jumps': thread_jumps,
+            'remove_unreachable': remove_unreachable,
+            'propagate_copies': propagate_copies,
+            'eliminate_common_subexpressions': eliminate_common_subexpressions,
+            'hoist_loop_invariants': hoist_loop_invariants,
+            'reduce_strength': reduce_strength,
+            'eliminate_dead_code': eliminate_dead_code,
+        }
+        self.rounds = rounds
+        self.stats = {'quads_before': 0, 'quads_after': 0}
+        self.stats.update((name, 0) for name in TAC_PASSES)
+        self.tac = None
+
+    def __repr__(self):
+        return f"TACOptimizer({','.join(name for name in TAC_PASSES if self.enabled[name])})"
+
+    def optimize(self, tac):
+        """ A new `TAC` equivalent to `tac`; `tac` itself is left as it was. """
+        optimized = TAC()
+        optimized.functions = dict(tac.functions)
+        optimized.temp_counter = tac.temp_counter
+        optimized.label_counter = tac.label_counter
+        self.tac = optimized
+        main, functions = split_functions(tac.code, anchored=True)
+        # Named variables of the program are observable once it ends.
+        globals_ = sorted({name for quad in main for name in uses(quad) + (defines(quad),)
+                           if name is not None and not TEMP.match(name)})
+        main = self.optimize_unit(main, globals_)
+        functions = [(name, count, self.optimize_unit(body, ())) for name, count, body in functions]
+        optimized.code = join_functions(main, functions, anchored=True)
+        self.stats['quads_before'] += len(tac.code)
+        self.stats['quads_after'] += len(optimized.code)
+        return optimized
+
+    def optimize_unit(self, code, live_at_exit):
+        for _ in range(self.rounds):
+            before = list(code)
+            for name in TAC_PASSES:
+                if self.enabled[name]:
+                    if name in ('propagate_copies', 'hoist_loop_invariants', 'eliminate_dead_code'):
+                        code = getattr(self, name)(code, live_at_exit)
+                    else:
+                        code = getattr(self, name)(code)
+            if code == before:
+                break
+        return code
+
+    def count(self, name, changed):
+        self.stats[name] += changed
+
+    def thread_jumps(self, code):
+        targets = first_quads(code)
+        threaded = []
+        changed = 0
+        for position, quad in enumerate(code):
+            op, arg1, arg2, label = quad
+            if op in JUMPS:
+                seen = {label}
+                while targets.get(label, len(code)) < len(code) and code[targets[label]][0] == 'goto':
+                    label = code[targets[label]][3]
+                    if label in seen:
+                        break
+                    seen.add(label)
+                if op == 'ifFalse' and not isinstance(arg1, str):
+                    if arg1:
+                        changed += 1
+                        continue
+                    op, arg1 = 'goto', None
+                following = position + 1
+                while following < len(code) and code[following][0] == 'label':
+                    following += 1
+                # Landing on the quad that would run next anyway: the jump does nothing.
+                if targets.get(label) == following:
+                    changed += 1
+                    continue
+                if (op, arg1, arg2, label) != quad:
+                    quad = (op, arg1, arg2, label)
+                    changed += 1
+            threaded.append(quad)
+        self.count('thread_jumps', changed)
+        return threaded
+
+    def remove_unreachable(self, code):
+        if not code:
+            return code
+        cfg = CFG(code)
+        reachable = {block.index for block in cfg.postorder()}
+        kept = [quad for block in cfg.blocks if block.index in reachable for quad in cfg.quads(block)]
+        targets = {quad[3] for quad in kept if quad[0] in JUMPS}
+        kept = [quad for quad in kept if quad[0] != 'label' or quad[3] in targets]
+        self.count('remove_unreachable', len(code) - len(kept))
+        return kept
+
+    def propagate_copies(self, code, live_at_exit):
+        # Coalescing first keeps `x = <expr>` in place of a temp that forwarding would spread.
+        code, coalesced = self.coalesce_copies(code, live_at_exit)
+        code, changed = self.forward_copies(code)
+        self.count('propagate_copies', changed + coalesced)
+        return code
+
+    def forward_copies(self, code):
+        if not code:
+            return code, 0
+        cfg = CFG(code)
+        copies = Universe(position for position, quad in enumerate(code) if is_copy(quad))
+        mentioning = {}
+        for position in copies.items:
+            _, source, _, target = code[position]
+            for name in (source, target):
+                if isinstance(name, str):
+                    mentioning[name] = mentioning.get(name, 0) | copies.bit(position)
+
+        def transfer(quad, position, available):
+            target = defines(quad)
+            if target is not None:
+                available &= ~mentioning.get(target, 0)
+            if position in copies.bits:
+                available |= copies.bit(position)
+            return available
+
+        gen, kill = [], []
+        for block in cfg.blocks:
+            generated = killed = 0
+            for position in range(block.start, block.end):
+                target = defines(code[position])
+                if target is not None:
+                    killed |= mentioning.get(target, 0)
+                generated = transfer(code[position], position, generated)
+            gen.append(generated)
+            kill.append(killed & ~generated)
+        available_in, _ = solve(cfg, gen, kill, forward=True, meet=INTERSECTION, boundary=0, top=copies.full)
+        reachable = {block.index for block in cfg.postorder()}
+        rewritten = list(code)
+        changed = 0
+        for block in cfg.blocks:
+            available = available_in[block.index] if block.index in reachable else 0
+            for position in range(block.start, block.end):
+                values = {code[copy][3]: code[copy][1] for copy in copies.members(available)}
+
+                def replace(name, index=False):
+                    seen = set()
+                    while name in values and name not in seen:
+                        seen.add(name)
+                        value = values[name]
+                        # An element operand's array must stay a name and its index a non-negative number or name.
+                        if index is None and not isinstance(value, str):
+                            break
+                        if index and not isinstance(value, str) and not (type(value) is int and value >= 0):
+                            break
+                        name = value
+                        if not isinstance(name, str):
+                            break
+                    return name
+
+                quad = substitute(code[position], replace) if values else code[position]
+                if quad != code[position]:
+                    rewritten[position] = quad
+                    changed += 1
+                available = transfer(code[position], position, available)
+        return rewritten, changed
+
+    def coalesce_copies(self, code, live_at_exit):
+        if not code:
+            return code, 0
+        cfg = CFG(code)
+        liveness = Liveness(cfg, live_at_exit)
+        merged = []
+        changed = 0
+        for block in cfg.blocks:
+            live_after = liveness.live_after(block)
+            for offset, quad in enumerate(cfg.quads(block)):
+                position = block.start + offset
+                if (is_copy(quad) and isinstance(quad[1], str) and merged and position > block.start
+                        and defines(merged[-1]) == quad[1] and quad[1] != quad[3]
+                        and not live_after[offset] & liveness.variables.bit(quad[1])):
+                    op, arg1, arg2, _ = merged.pop()
+                    merged.append((op, arg1, arg2, quad[3]))
+                    changed += 1
+                    continue
+                merged.append(quad)
+        return merged, changed
+
+    def eliminate_common_subexpressions(self, code):
+        if not code:
+            return code
+        cfg = CFG(code)
+        expressions = Universe()
+        mentioning = {}
+        for quad in code:
+            op, arg1, arg2, result = quad
+            if op in BINARY_OPS:
+                key = (op, arg1, arg2)
+                if key not in expressions.bits:
+                    expressions.add(key)
+                    for name in (arg1, arg2):
+                        if isinstance(name, str):
+                            mentioning[name] = mentioning.get(name, 0) | expressions.bit(key)
+
+        def computes(quad):
+            op, arg1, arg2, result = quad
+            if op in BINARY_OPS and result not in (arg1, arg2):
+                return (op, arg1, arg2)
+            return None
+
+        def transfer(quad, available):
+            key = computes(quad)
+            target = defines(quad)
+            if target is not None:
+                available &= ~mentioning.get(target, 0)
+            if key is not None:
+                available |= expressions.bit(key)
+            return available
+
+        gen, kill = [], []
+        for block in cfg.blocks:
+            generated = killed = 0
+            for quad in cfg.quads(block):
+                target = defines(quad)
+                if target is not None:
+                    killed |= mentioning.get(target, 0)
+                generated = transfer(quad, generated)
+            gen.append(generated)
+            kill.append(killed & ~generated)
+        available_in, _ = solve(cfg, gen, kill, forward=True, meet=INTERSECTION, boundary=0, top=expressions.full)
+        reachable = {block.index for block in cfg.postorder()}
+        redundant = set()
+        for block in cfg.blocks:
+            available = available_in[block.index] if block.index in reachable else 0
+            for position in range(block.start, block.end):
+                quad = code[position]
+                if quad[0] in BINARY_OPS and available & expressions.bit(quad[:3]):
+                    redundant.add(position)
+                available = transfer(quad, available)
+        if not redundant:
+            return code
+        holders = {}
+        for position in sorted(redundant):
+            key = code[position][:3]
+            if key not in holders:
+                holders[key] = self.tac.gen_temp()
+        rewritten = []
+        for position, quad in enumerate(code):
+            key = quad[:3]
+            if position in redundant:
+                rewritten.append(('=', holders[key], None, quad[3]))
+            elif key in holders and computes(quad) is not None:
+                rewritten.append(quad[:3] + (holders[key],))
+                rewritten.append(('=', holders[key], None, quad[3]))
+            else:
+                rewritten.append(quad)
+        self.count('eliminate_common_subexpressions', len(redundant))
+        return rewritten
+
+    def loops(self, cfg):
+        """ The natural loops of `cfg`, innermost first, that a preheader can be put in front of. """
+        usable = []
+        for loop in cfg.natural_loops():
+            header = loop.header
+            before = cfg.blocks[header.index - 1] if header.index else None
+            # Code put in front of the header must not be run by a latch falling through into it.
+            if before is not None and before.index in loop.blocks and cfg.code[before.end - 1][0] not in TERMINATORS:
+                continue
+            usable.append(loop)
+        return usable
+
+    def loop_positions(self, cfg, loop):
+        return [position for index in sorted(loop.blocks)
+                for position in range(cfg.blocks[index].start, cfg.blocks[index].end)]
+
+    def preheader(self, cfg, loop, quads, replaced):
+        """
+        `quads` as a block entered from outside `loop` instead of its header:
+        outside jumps to the header are retargeted (in `replaced`) to a new label.
+        The caller puts the block right in front of the header.
+        """
+        label = None
+        for predecessor in loop.header.predecessors:
+            if predecessor.index not in loop.blocks:
+                position = predecessor.end - 1
+                op, arg1, arg2, target = cfg.code[position]
+                if op in JUMPS and cfg.labels.get(target) is loop.header:
+                    label = label or self.tac.gen_label()
+                    replaced[position] = [(op, arg1, arg2, label)]
+        return ([('label', None, None, label)] if label else []) + quads
+
+    def guard(self, cfg, loop):
+        """
+        The quads of `loop`'s header when all they do is decide whether to leave
+        it, or None. At the top of a preheader they skip it as the loop would.
+        """
+        quads = [quad for quad in cfg.quads(loop.header) if quad[0] != 'label']
+        if not quads or quads[-1][0] != 'ifFalse' or cfg.labels[quads[-1][3]].index in loop.blocks:
+            return None
+        if all(op in BINARY_OPS or (op == '=' and is_variable(result)) for op, _, _, result in quads[:-1]):
+            return quads
+        return None
+
+    def every_pass(self, cfg, loop, dominators):
+        """ The blocks of `loop` run on every pass through it that gets past the header. """
+        ends = [latch.index for latch in loop.latches]
+        for index in loop.blocks:
+            block = cfg.blocks[index]
+            if index != loop.header.index and (block in cfg.exits or any(successor.index not in loop.blocks
+                                                                         for successor in block.successors)):
+                ends.append(index)
+        return {index for index in loop.blocks if all(dominators[end] >> index & 1 for end in ends)}
+
+    def rewrite(self, code, inserted, replaced):
+        """ `code` with the quads of `inserted[position]` in front of `position` and `replaced[position]` instead of it. """
+        rewritten = []
+        for position, quad in enumerate(code):
+            rewritten.extend(inserted.get(position, ()))
+            rewritten.extend(replaced.get(position, [quad]))
+        return rewritten
+
+    def hoist_loop_invariants(self, code, live_at_exit):
+        if not code:
+            return code
+        cfg = CFG(code)
+        liveness = Liveness(cfg, live_at_exit)
+        dominators = cfg.dominators()
+        inserted = {}
+        replaced = {}
+        changed = 0
+        for loop in self.loops(cfg):
+            positions = self.loop_positions(cfg, loop)
+            if any(position in replaced for position in positions):
+                # An inner loop changed this round; the next one looks at this loop again.
+                continue
+            guard = self.guard(cfg, loop)
+            if guard is None:
+                continue
+            every_pass = self.every_pass(cfg, loop, dominators)
+            assignments = {}
+            for position in positions:
+                target = defines(code[position])
+                if target is not None:
+                    assignments[target] = assignments.get(target, 0) + 1
+            # Values of the loop's variables that can be seen other than by going round it again.
+            visible = liveness.live_in[loop.header.index]
+            for index in loop.blocks:
+                block = cfg.blocks[index]
+                for successor in block.successors:
+                    if successor.index not in loop.blocks:
+                        visible |= liveness.live_in[successor.index]
+                if block in cfg.exits:
+                    visible |= liveness.live_out[index]
+            moved = set()
+
+            def invariant(value):
+                if not isinstance(value, str):
+                    return True
+                return is_variable(value) and (value not in assignments or value in moved)
+
+            hoisted = []
+            progress = True
+            while progress:
+                progress = False
+                for position in positions:
+                    op, arg1, arg2, target = code[position]
+                    if position in replaced or op not in HOISTABLE or not (invariant(arg1) and invariant(arg2)):
+                        continue
+                    if cfg.block_of(position).index not in every_pass:
+                        continue
+                    if assignments[target] == 1 and not visible & liveness.variables.bit(target):
+                        hoisted.append(code[position])
+                        replaced[position] = []
+                        moved.add(target)
+                    else:
+                        holder = self.tac.gen_temp()
+                        hoisted.append((op, arg1, arg2, holder))
+                        replaced[position] = [('=', holder, None, target)]
+                    progress = True
+            if hoisted:
+                inserted[loop.header.start] = self.preheader(cfg, loop, guard + hoisted, replaced)
+                changed += len(hoisted)
+        self.count('hoist_loop_invariants', changed)
+        return self.rewrite(code, inserted, replaced) if changed else code
+
+    def reduce_strength(self, code):
+        if not code:
+            return code
+        cfg = CFG(code)
+        liveness = Liveness(cfg)
+        reaching = ReachingDefinitions(cfg)
+        entry_live = liveness.live_in[cfg.entry.index]
+        inserted = {}
+        replaced = {}
+        changed = 0
+        for loop in self.loops(cfg):
+            positions = self.loop_positions(cfg, loop)
+            if any(position in replaced for position in positions):
+                continue
+            inside = set(positions)
+            steps = {}
+            others = set()
+            for position in positions:
+                target = defines(code[position])
+                if target is None:
+                    continue
+                step = increment(code[position])
+                if step is None:
+                    others.add(target)
+                else:
+                    steps.setdefault(target, []).append((position, step))
+
+            def induction(name):
+                # Stepped by constants only, and an integer on every way in, so `i * k` stays exact.
+                if name not in steps or name in others or entry_live & liveness.variables.bit(name):
+                    return False
+                starts = [position for position in reaching.positions(reaching.reach_in[loop.header.index]
+                                                                       & reaching.by_variable[name])
+                          if position not in inside]
+                return bool(starts) and all(code[position][0] == '=' and type(code[position][1]) is int
+                                            for position in starts)
+
+            holders = {}
+            for position in positions:
+                op, arg1, arg2, target = code[position]
+                if op != '*' or target in (arg1, arg2):
+                    continue
+                if type(arg2) is int and isinstance(arg1, str) and induction(arg1):
+                    key = (arg1, arg2)
+                elif type(arg1) is int and isinstance(arg2, str) and induction(arg2):
+                    key = (arg2, arg1)
+                else:
+                    continue
+                if key not in holders:
+                    holders[key] = self.tac.gen_temp()
+                replaced[position] = [('=', holders[key], None, target)]
+                changed += 1
+            if not holders:
+                continue
+            initial = []
+            for (name, factor), holder in holders.items():
+                initial.append(('*', name, factor, holder))
+                for position, step in steps[name]:
+                    replaced.setdefault(position, [code[position]]).append(('+', holder, step * factor, holder))
+            inserted[loop.header.start] = self.preheader(cfg, loop, initial, replaced)
+        self.count('reduce_strength', changed)
+        return self.rewrite(code, inserted, replaced) if changed else code
+
+    def eliminate_dead_code(self, code, live_at_exit):
+        if not code:
+            return code
+        cfg = CFG(code)
+        liveness = Liveness(cfg, live_at_exit)
+        kept = []
+        for block in cfg.blocks:
+            live_after = liveness.live_after(block)
+            for offset, quad in enumerate(cfg.quads(block)):
+                target = defines(quad)
+                removable = quad[0] in REMOVABLE or is_copy(quad)
+                if target is not None and removable and not live_after[offset] & liveness.variables.bit(target):
+                    continue
+                kept.append(quad)
+        self.count('eliminate_dead_code', len(code) - len(kept))
+        return kept
@@ -0,0 +1,9 @@
+# Deepest nesting of SimpleLang calls the engines with an explicit call stack allow by default.
+MAX_DEPTH = 2_000_000
+
+class StackOverflowError(Exception):
+    """ A program nested more calls than the engine's `max_depth`. """
+    def __init__(self, name, max_depth):
+        super().__init__(f"Stack overflow: more than {max_depth} nested calls (calling {name})")
+        self.name = name
+        self.max_depth = max_depth
@@ -160,6 +160,5 @@ class Interpreter:
         raise Exception(f"No visit_{type(node).__name__} method")
 
     def interpret(self):
-        tree = self.parser.parse()
-        for node in tree:
+        for node in self.parser.statements():
             self.visit(node)
\ No newline at end of file
@@ -1,6 +1,82 @@
+import re
+import sys
+
 from simplelang.tokens import TokenType
 
+KEYWORDS = {
+    'let': TokenType.LET,
+    'print': TokenType.PRINT,
+    'if': TokenType.IF,
+    'else': TokenType.ELSE,
+    'while': TokenType.WHILE,
+    'for': TokenType.FOR,
+    'def': TokenType.DEF,
+    'return': TokenType.RETURN
+}
+
+OPERATORS = {
+    '==': TokenType.EQUAL_EQUAL,
+    '!=': TokenType.NOT_EQUAL,
+    '<=': TokenType.LESS_EQUAL,
+    '>=': TokenType.GREATER_EQUAL,
+    '&&': TokenType.AND,
+    '||': TokenType.OR,
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MUL,
+    '/': TokenType.DIV,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    '[': TokenType.LBRACKET,
+    ']': TokenType.RBRACKET,
+    ',': TokenType.COMMA,
+    ';': TokenType.SEMICOLON,
+    '=': TokenType.EQUAL,
+    '!': TokenType.NOT,
+    '<': TokenType.LESS,
+    '>': TokenType.GREATER,
+}
+
+# One alternation for the whole token set: leading whitespace is skipped, two-character
+# operators come before their one-character prefixes, and any other single character is
+# INVALID. When nothing but whitespace is left no group matches, which means EOF.
+TOKEN_PATTERN = re.compile(r"""
+    \s*
+    (?:
+        ([^\W\d]\w*)                                   # identifier or keyword
+      | (==|!=|<=|>=|&&|\|\||[-+*/(){}\[\],;=!<>])      # operator
+      | (\d+)                                         # number
+      | ("[^"]*"?)                                     # string, possibly unterminated
+      | (.)                                           # anything else is INVALID
+    )?
+""", re.VERBOSE | re.DOTALL)
+
+# The same token set for ASCII-compatible encoded bytes (e.g. a memory-mapped file). Any byte
+# >= 0x80 is treated as part of an identifier; such lexemes are decoded and re-lexed by the
+# text rules above, so non-ASCII letters, spaces and symbols come out as in text mode. (The
+# one difference: a non-ASCII decimal digit directly after ASCII digits starts a new number.)
+# Bytes `\s` leaves out the separators \x1c-\x1f, which are whitespace in text.
+BYTES_TOKEN_PATTERN = re.compile(rb"""
+    [\s\x1c-\x1f]*
+    (?:
+        ([A-Za-z_\x80-\xff][\w\x80-\xff]*)
+      | (==|!=|<=|>=|&&|\|\||[-+*/(){}\[\],;=!<>])
+      | (\d+)
+      | ("[^"]*"?)
+      | (.)
+    )?
+""", re.VERBOSE | re.DOTALL)
+
+WHITESPACE = re.compile(r"\s*")
+DIGITS = re.compile(r"\d*")
+QUOTED = re.compile(r'"[^"]*"?')
+WORD = re.compile(r"\w*")
+
 class Token:
+    __slots__ = ('type', 'value')
+
     def __init__(self, type_, value=None):
         self.type = type_
         self.value = value
@@ -8,176 +84,123 @@ class Token:
     def __repr__(self):
         return f"Token({self.type}, {repr(self.value)})"
 
+# Keywords, operators, INVALID and EOF carry no value, so every occurrence shares one token.
+# Tokens are never modified once produced.
+KEYWORD_TOKENS = {keyword: Token(token_type) for keyword, token_type in KEYWORDS.items()}
+OPERATOR_TOKENS = {operator: Token(token_type) for operator, token_type in OPERATORS.items()}
+BYTES_OPERATOR_TOKENS = {operator.encode('ascii'): token for operator, token in OPERATOR_TOKENS.items()}
+INVALID_TOKEN = Token(TokenType.INVALID)
+EOF_TOKEN = Token(TokenType.EOF)
+
 class Lexer:
-    def __init__(self, text):
+    def __init__(self, text, encoding='utf-8'):
+        """
+        `text` is a str, or a bytes-like object (bytes, mmap, memoryview) in an
+        ASCII-compatible `encoding`; only identifier and string lexemes are decoded.
+        """
         self.text = text
+        self.encoding = encoding
         self.pos = 0
-        self.current_char = self.text[self.pos] if self.text else None
+        if isinstance(text, str):
+            self.stream = self.scan()
+        else:
+            self.stream = self.scan_bytes()
+
+    def char(self, pos):
+        if pos >= len(self.text):
+            return None
+        char = self.text[pos]
+        return char if isinstance(char, str) else chr(char)
+
+    @property
+    def current_char(self):
+        return self.char(self.pos)
 
     def advance(self):
         self.pos += 1
-        if self.pos >= len(self.text):
-            self.current_char = None
-        else:
-            self.current_char = self.text[self.pos]
 
     def peek(self):
-        peek_pos = self.pos + 1
-        if peek_pos >= len(self.text):
-            return None
-        return self.text[peek_pos]
+        return self.char(self.pos + 1)
 
     def skip_whitespace(self):
-        while self.current_char is not None and self.current_char.isspace():
-            self.advance()
+        self.lexeme(WHITESPACE)
+
+    def lexeme(self, pattern):
+        if isinstance(self.text, str):
+            match = pattern.match(self.text, self.pos)
+        else:
+            match = re.compile(pattern.pattern.encode('ascii')).match(self.text, self.pos)
+        self.pos = match.end()
+        lexeme = match.group()
+        return lexeme if isinstance(lexeme, str) else lexeme.decode(self.encoding)
 
     def number(self):
-        result = ''
-        while self.current_char is not None and self.current_char.isdigit():
-            result += self.current_char
-            self.advance()
-        return int(result)
+        return int(self.lexeme(DIGITS))
 
     def string(self):
-        self.advance()
-        result = ''
-        while self.current_char is not None and self.current_char != '"':
-            result += self.current_char
-            self.advance()
-        self.advance()
-        return result
+        return self.lexeme(QUOTED)[1:].rstrip('"')
 
     def identifier(self):
-        result = ''
-        while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
-            result += self.current_char
-            self.advance()
-        return result
+        return self.lexeme(WORD)
+
+    def scan(self):
+        """ Generate the tokens after `self.pos`, keeping `pos` just past the last one produced. """
+        IDENTIFIER, OPERATOR, NUMBER, STRING, INVALID = 1, 2, 3, 4, 5
+        keywords, operators, intern = KEYWORD_TOKENS, OPERATOR_TOKENS, sys.intern
+        for match in TOKEN_PATTERN.finditer(self.text, self.pos):
+            self.pos = match.end()
+            kind = match.lastindex
+            if kind == IDENTIFIER:
+                ident = match[kind]
+                keyword = keywords.get(ident)
+                yield keyword if keyword is not None else Token(TokenType.IDENTIFIER, intern(ident))
+            elif kind == OPERATOR:
+                yield operators[match[kind]]
+            elif kind == NUMBER:
+                yield Token(TokenType.NUMBER, int(match[kind]))
+            elif kind == STRING:
+                yield Token(TokenType.STRING, match[kind][1:].rstrip('"'))
+            elif kind == INVALID:
+                yield INVALID_TOKEN
+            else:
+                return
+
+    def scan_bytes(self):
+        """ `scan` over encoded bytes. """
+        IDENTIFIER, OPERATOR, NUMBER, STRING, INVALID = 1, 2, 3, 4, 5
+        keywords, operators, encoding = KEYWORD_TOKENS, BYTES_OPERATOR_TOKENS, self.encoding
+        names = {}
+        for match in BYTES_TOKEN_PATTERN.finditer(self.text, self.pos):
+            self.pos = match.end()
+            kind = match.lastindex
+            if kind == IDENTIFIER:
+                raw = match[kind]
+                ident = names.get(raw)
+                if ident is None:
+                    ident = raw.decode(encoding)
+                    if not ident.isascii():
+                        yield from Lexer(ident)
+                        continue
+                    ident = names[raw] = sys.intern(ident)
+                keyword = keywords.get(ident)
+                yield keyword if keyword is not None else Token(TokenType.IDENTIFIER, ident)
+            elif kind == OPERATOR:
+                yield operators[match[kind]]
+            elif kind == NUMBER:
+                yield Token(TokenType.NUMBER, int(match[kind]))
+            elif kind == STRING:
+                yield Token(TokenType.STRING, match[kind][1:].rstrip(b'"').decode(encoding))
+            elif kind == INVALID:
+                yield INVALID_TOKEN
+            else:
+                return
+
+    def __iter__(self):
+        """ Iterate over the remaining tokens, stopping before EOF. """
+        return self.stream
 
     def get_next_token(self):
-        while self.current_char is not None:
-            if self.current_char.isspace():
-                self.skip_whitespace()
-                continue
-
-            if self.current_char == '[':
-                self.advance()
-                return Token(TokenType.LBRACKET)
-
-            if self.current_char == ']':
-                self.advance()
-                return Token(TokenType.RBRACKET)
-            
-            if self.current_char == ';':
-                self.advance()
-                return Token(TokenType.SEMICOLON)
-
-            if self.current_char.isdigit():
-                return Token(TokenType.NUMBER, self.number())
-
-            if self.current_char == '"':
-                return Token(TokenType.STRING, self.string())
-
-            if self.current_char.isalpha() or self.current_char == '_':
-                ident = self.identifier()
-                keyword_token = self.check_keyword(ident)
-                if keyword_token:
-                    return keyword_token
-                return Token(TokenType.IDENTIFIER, ident)
-
-            if self.current_char == '+':
-                self.advance()
-                return Token(TokenType.PLUS)
-
-            if self.current_char == '-':
-                self.advance()
-                return Token(TokenType.MINUS)
-
-            if self.current_char == '*':
-                self.advance()
-                return Token(TokenType.MUL)
-
-            if self.current_char == '/':
-                self.advance()
-                return Token(TokenType.DIV)
-
-            if self.current_char == '(':
-                self.advance()
-                return Token(TokenType.LPAREN)
-
-            if self.current_char == ')':
-                self.advance()
-                return Token(TokenType.RPAREN)
-
-            if self.current_char == '{':
-                self.advance()
-                return Token(TokenType.LBRACE)
-
-            if self.current_char == '}':
-                self.advance()
-                return Token(TokenType.RBRACE)
-
-            if self.current_char == ',':
-                self.advance()
-                return Token(TokenType.COMMA)
-
-            if self.current_char == '=':
-                if self.peek() == '=':
-                    self.advance()
-                    self.advance()
-                    return Token(TokenType.EQUAL_EQUAL)
-                self.advance()
-                return Token(TokenType.EQUAL)
-
-            if self.current_char == '!':
-                if self.peek() == '=':
-                    self.advance()
-                    self.advance()
-                    return Token(TokenType.NOT_EQUAL)
-                self.advance()
-                return Token(TokenType.NOT)
-
-            if self.current_char == '<':
-                if self.peek() == '=':
-                    self.advance()
-                    self.advance()
-                    return Token(TokenType.LESS_EQUAL)
-                self.advance()
-                return Token(TokenType.LESS)
-
-            if self.current_char == '>':
-                if self.peek() == '=':
-                    self.advance()
-                    self.advance()
-                    return Token(TokenType.GREATER_EQUAL)
-                self.advance()
-                return Token(TokenType.GREATER)
-
-            if self.current_char == '&':
-                if self.peek() == '&':
-                    self.advance()
-                    self.advance()
-                    return Token(TokenType.AND)
-
-            if self.current_char == '|':
-                if self.peek() == '|':
-                    self.advance()
-                    self.advance()
-                    return Token(TokenType.OR)
-
-            self.advance()
-            return Token(TokenType.INVALID)
-        return Token(TokenType.EOF)
+        return next(self.stream, None) or EOF_TOKEN
 
     def check_keyword(self, ident):
-        keywords = {
-            'let': TokenType.LET,
-            'print': TokenType.PRINT,
-            'if': TokenType.IF,
-            'else': TokenType.ELSE,
-            'while': TokenType.WHILE,
-            'for': TokenType.FOR,
-            'def': TokenType.DEF,
-            'return': TokenType.RETURN
-        }
-        return Token(keywords.get(ident)) if ident in keywords else None
+        return KEYWORD_TOKENS.get(ident)
@@ -1,27 +1,111 @@
 import argparse
-from simplelang.lexer import Lexer, TokenType
+import functools
+import sys
+from simplelang.lexer import Lexer
+from simplelang.source import open_source
 from simplelang.sl_parser import Parser
+from simplelang.ast_arena import ASTArena
+from simplelang.cache import CompilationCache, run_cached
+from simplelang.errors import MAX_DEPTH, StackOverflowError
+from simplelang.compiler.optimizer import PASSES, Optimizer, OptimizingParser
+from simplelang.compiler.tac_optimizer import TAC_PASSES, TACOptimizer
 from simplelang.interpreter import Interpreter
+from simplelang.closure_interpreter import ClosureInterpreter
+from simplelang.vm.machine import VirtualMachine
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.python_backend import PythonGenerator, PythonInterpreter
+from simplelang.compiler.c_backend import CInterpreter
+
+ENGINES = {
+    'interpreter': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VirtualMachine,
+    'tac': TACInterpreter,
+    'python': PythonInterpreter,
+    'c': CInterpreter,
+}
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--path-to-source-code", type=str, required=True)
+    parser.add_argument("--engine", choices=ENGINES, default='interpreter')
+    parser.add_argument("--encoding", type=str, default=None, help="source encoding (default: from BOM, else UTF-8)")
+    parser.add_argument("--ast-arena", action="store_true", help="hold the AST in flat arrays instead of node objects")
+    parser.add_argument("--no-cache", action="store_true", help="always lex and parse, without reading or writing .slc files")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="where .slc files are kept (default: $SIMPLELANG_CACHE_DIR, else ~/.cache/simplelang)")
+    parser.add_argument("--memoize", action="store_true",
+                        help="closure engine: cache calls to pure and `memo` functions (`nomemo` opts out)")
+    parser.add_argument("--memo-size", type=int, default=1024, help="LRU entries per memoized function (0: unbounded)")
+    parser.add_argument("--memo-stats", action="store_true", help="print memoization hits and misses to stderr")
+    parser.add_argument("--function-globals", action="store_true",
+                        help="closure engine: let functions read globals they do not assign")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="vm, tac and c engines: deepest call nesting before a stack overflow (default: %d)" % MAX_DEPTH)
+    parser.add_argument("--no-optimize", action="store_true", help="run the program as parsed, without the AST optimizer")
+    parser.add_argument("--disable-pass", action="append", choices=PASSES + TAC_PASSES, default=[],
+                        help="turn off one AST or (tac and c engines) TAC optimizer pass")
+    parser.add_argument("--optimizer-stats", action="store_true", help="print what the optimizers eliminated to stderr")
+    parser.add_argument("--dump-python", action="store_true", help="print the Python generated by the python engine and exit")
+    parser.add_argument("--dump-c", action="store_true", help="print the C generated by the c engine and exit")
     args = parser.parse_args()
+    engine = ENGINES[args.engine]
+    if args.memoize:
+        if engine is not ClosureInterpreter:
+            parser.error("--memoize needs --engine closure")
+        engine = functools.partial(ClosureInterpreter, memoize=True, memo_size=args.memo_size or None)
+    if args.function_globals:
+        if args.engine != 'closure':
+            parser.error("--function-globals needs --engine closure")
+        engine = functools.partial(engine, function_globals=True)
+    if args.max_depth is not None:
+        if engine not in (VirtualMachine, TACInterpreter, CInterpreter):
+            parser.error("--max-depth needs --engine vm, tac or c")
+        engine = functools.partial(engine, max_depth=args.max_depth)
 
-    with open(args.path_to_source_code, 'r') as file:
-        text = file.read()
+    optimizer = tac_optimizer = None
+    if not args.no_optimize:
+        optimizer = Optimizer(**{name: False for name in args.disable_pass if name in PASSES})
+        if args.engine in ('tac', 'c'):
+            tac_optimizer = TACOptimizer(**{name: False for name in args.disable_pass if name in TAC_PASSES})
+            engine = functools.partial(engine, optimizer=tac_optimizer)
 
-    lexer = Lexer(text)
-    tokens = []
-    while True:
-        token = lexer.get_next_token()
-        if token.type == TokenType.EOF:
-            break
-        tokens.append(token)
+    if args.engine == 'c':
+        engine = functools.partial(engine, cache_dir=args.cache_dir)
 
-    parser = Parser(tokens)
-    interpreter = Interpreter(parser)
-    interpreter.interpret()
+    text, encoding = open_source(args.path_to_source_code, args.encoding)
+    try:
+        if not (args.no_cache or args.ast_arena or args.dump_python or args.dump_c):
+            interpreter = run_cached(engine, text, encoding, CompilationCache(args.cache_dir), optimizer)
+        else:
+            parser = Parser(Lexer(text, encoding))
+            if optimizer is not None:
+                parser = OptimizingParser(parser, optimizer)
+            if args.ast_arena:
+                parser = ASTArena.from_nodes(parser.statements())
+            if args.dump_python:
+                print(PythonGenerator(parser.parse()).source())
+                return
+            if args.dump_c:
+                print(CInterpreter(parser, optimizer=tac_optimizer).source())
+                return
+            interpreter = engine(parser)
+            interpreter.interpret()
+    except StackOverflowError as error:
+        sys.exit(str(error))
+    if getattr(interpreter, 'fallback', None):
+        print(f"c: ran on the TAC interpreter ({interpreter.fallback})", file=sys.stderr)
+    if args.memo_stats and args.memoize:
+        for name, info in interpreter.memo_stats().items():
+            print(f"{name}: {info.hits} hits, {info.misses} misses, {info.currsize} cached", file=sys.stderr)
+    if args.optimizer_stats and optimizer is not None:
+        for name, stats in optimizer.stats.items():
+            print(f"{name}: applied {stats['applied']} times, {stats['nodes_eliminated']} nodes eliminated", file=sys.stderr)
+    if args.optimizer_stats and tac_optimizer is not None:
+        stats = tac_optimizer.stats
+        print(f"tac: {stats['quads_before']} quads before, {stats['quads_after']} after", file=sys.stderr)
+        for name in TAC_PASSES:
+            print(f"{name}: {stats[name]} quads changed or removed", file=sys.stderr)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
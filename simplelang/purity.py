@@ -0,0 +1,57 @@
+from simplelang.sl_parser import PrintNode, FunctionNode, FunctionCallNode, ArrayIndexNode
+from simplelang.resolver import walk_scope, assigned_names
+
+def function_definitions(nodes):
+    """ Every `def` in the program, nested ones included, grouped by name. """
+    definitions = {}
+    stack = list(nodes)
+    while stack:
+        for node in walk_scope([stack.pop()]):
+            if isinstance(node, FunctionNode):
+                definitions.setdefault(node.name, []).append(node)
+                stack.extend(node.body)
+    return definitions
+
+def local_effects(node, function_globals=False):
+    """
+    Returns (pure, callees) for one function body, ignoring what its callees do.
+
+    A body is impure if it prints or contains a `def` (which rebinds a global
+    function name). When functions can read globals, a read of a name the function
+    does not assign also makes it impure, as the result would depend on outer state.
+    Assignments are always local, so a body cannot otherwise write outer state.
+    """
+    local = assigned_names(node.body) | set(node.parameters)
+    callees = set()
+    for inner in walk_scope(node.body):
+        if isinstance(inner, (PrintNode, FunctionNode)):
+            return False, callees
+        if isinstance(inner, FunctionCallNode):
+            callees.add(inner.name)
+        elif function_globals:
+            name = inner.array_identifier if isinstance(inner, ArrayIndexNode) else inner
+            if isinstance(name, str) and name not in local:
+                return False, callees
+    return True, callees
+
+def pure_functions(nodes, function_globals=False):
+    """
+    Names of the functions whose every definition is pure and calls only pure functions.
+
+    Starts from the functions that are pure on their own and removes callers of
+    anything impure or undefined until nothing changes, so (mutually) recursive
+    functions stay pure.
+    """
+    callees = {}
+    for name, definitions in function_definitions(nodes).items():
+        effects = [local_effects(node, function_globals) for node in definitions]
+        if all(pure for pure, _ in effects):
+            callees[name] = set().union(*(called for _, called in effects))
+    changed = True
+    while changed:
+        changed = False
+        for name in list(callees):
+            if not callees[name] <= callees.keys():
+                del callees[name]
+                changed = True
+    return set(callees)
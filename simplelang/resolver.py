@@ -0,0 +1,106 @@
+from simplelang.sl_parser import (VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                                  FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode)
+
+def walk_scope(body):
+    """ Yield the statements and expressions of a scope without entering nested function bodies. """
+    stack = list(body)
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, FunctionNode):
+            continue
+        if isinstance(node, (VarDeclNode, PrintNode, ReturnNode)):
+            stack.append(node.value)
+        elif isinstance(node, BinaryOpNode):
+            stack.extend([node.left, node.right])
+        elif isinstance(node, ArrayNode):
+            stack.extend(node.elements)
+        elif isinstance(node, ArrayIndexNode):
+            stack.append(node.index)
+        elif isinstance(node, FunctionCallNode):
+            stack.extend(node.arguments)
+        elif isinstance(node, (IfNode, WhileNode)):
+            stack.append(node.condition)
+            stack.extend(node.body)
+            if isinstance(node, IfNode) and node.else_node is not None:
+                stack.extend(node.else_node.body)
+        elif isinstance(node, ElseNode):
+            stack.extend(node.body)
+        elif isinstance(node, ForNode):
+            stack.extend([node.start, node.end])
+            stack.extend(node.body)
+
+def assigned_names(body):
+    names = set()
+    for node in walk_scope(body):
+        if isinstance(node, VarDeclNode):
+            names.add(node.var_name)
+        elif isinstance(node, ForNode):
+            names.add(node.variable)
+    return names
+
+class Scope:
+    """
+    Slot layout of one frame: the program's globals or one function's locals.
+
+    Function scopes are closed: their names (parameters first, then every variable
+    the body assigns) are fixed up front. The global scope is open and gives a slot
+    to each new name as top-level statements are resolved.
+    """
+    def __init__(self, parameters=(), names=(), parent=None, open=False):
+        self.parent = parent
+        self.open = open
+        # A repeated parameter binds the last argument, as with the dict-based scopes.
+        self.slots = {parameter: slot for slot, parameter in enumerate(parameters)}
+        self.size = len(parameters)
+        self.assigned = set()
+        for name in names:
+            self.declare(name)
+
+    def __repr__(self):
+        return f"Scope({self.slots})"
+
+    def declare(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = self.size
+            self.size += 1
+        return slot
+
+    def store(self, name):
+        """ Slot for an assignment to `name`, which is always local to this scope. """
+        self.assigned.add(name)
+        return self.declare(name)
+
+    def resolve(self, name):
+        """ (depth, slot) of a read of `name`, or None if no visible frame holds it and it reads as None. """
+        slot = self.slots.get(name)
+        if slot is not None:
+            return 0, slot
+        if self.parent is not None:
+            coordinate = self.parent.resolve(name)
+            return None if coordinate is None else (coordinate[0] + 1, coordinate[1])
+        if self.open:
+            return 0, self.declare(name)
+        return None
+
+class Resolver:
+    """
+    Static name resolution: every variable becomes a (depth, slot) coordinate,
+    depth 0 being the current frame and depth 1 the globals seen from a function.
+
+    Functions only see their own parameters and variables unless `function_globals`
+    is set; then a name a function never assigns reads the global of that name.
+    Nested `def`s see the globals, not the enclosing function's frame, as they can
+    be called from anywhere.
+    """
+    def __init__(self, function_globals=False):
+        self.function_globals = function_globals
+        self.globals = Scope(open=True)
+
+    def __repr__(self):
+        return f"Resolver({self.globals}, function_globals={self.function_globals})"
+
+    def function_scope(self, node):
+        parent = self.globals if self.function_globals else None
+        return Scope(node.parameters, sorted(assigned_names(node.body) - set(node.parameters)), parent)
@@ -1,6 +1,10 @@
+from collections import deque
+
 from simplelang.tokens import TokenType
 
 class VarDeclNode:
+    __slots__ = ('var_name', 'value')
+
     def __init__(self, var_name, value):
         self.var_name = var_name
         self.value = value
@@ -9,6 +13,8 @@ class VarDeclNode:
         return f"VarDeclNode({self.var_name}, {self.value})"
 
 class BinaryOpNode:
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -18,6 +24,8 @@ class BinaryOpNode:
         return f"BinaryOpNode({self.left}, {self.op}, {self.right})"
 
 class ArrayNode:
+    __slots__ = ('elements',)
+
     def __init__(self, elements):
         self.elements = elements
 
@@ -25,6 +33,8 @@ class ArrayNode:
         return f"ArrayNode({self.elements})"
 
 class ArrayIndexNode:
+    __slots__ = ('array_identifier', 'index')
+
     def __init__(self, array_identifier, index):
         self.array_identifier = array_identifier
         self.index = index
@@ -33,6 +43,8 @@ class ArrayIndexNode:
         return f"ArrayIndexNode({self.array_identifier}, {self.index})"
 
 class PrintNode:
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -40,6 +52,8 @@ class PrintNode:
         return f"PrintNode({self.value})"
 
 class ForNode:
+    __slots__ = ('variable', 'start', 'end', 'body')
+
     def __init__(self, variable, start, end, body):
         self.variable = variable
         self.start = start
@@ -50,15 +64,23 @@ class ForNode:
         return f"ForNode({self.variable}, {self.start}, {self.end}, {self.body})"
 
 class FunctionNode:
-    def __init__(self, name, parameters, body):
+    __slots__ = ('name', 'parameters', 'body', 'memo')
+
+    def __init__(self, name, parameters, body, memo=None):
         self.name = name
         self.parameters = parameters
         self.body = body
+        # From a `memo`/`nomemo` annotation: force (True) or forbid (False) memoization.
+        self.memo = memo
 
     def __repr__(self):
+        if self.memo is not None:
+            return f"FunctionNode({self.name}, {self.parameters}, {self.body}, memo={self.memo})"
         return f"FunctionNode({self.name}, {self.parameters}, {self.body})"
 
 class ReturnNode:
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     
@@ -66,6 +88,8 @@ class ReturnNode:
         return f"ReturnNode({self.value})"
     
 class FunctionCallNode:
+    __slots__ = ('name', 'arguments')
+
     def __init__(self, name, arguments):
         self.name = name
         self.arguments = arguments
@@ -74,6 +98,8 @@ class FunctionCallNode:
         return f"FunctionCallNode({self.name}, {self.arguments})"
 
 class IfNode:
+    __slots__ = ('condition', 'body', 'else_node')
+
     def __init__(self, condition, body, else_node=None):
         self.condition = condition
         self.body = body
@@ -83,6 +109,8 @@ class IfNode:
         return f"IfNode({self.condition}, {self.body} {self.else_node})"
 
 class WhileNode:
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -91,37 +119,47 @@ class WhileNode:
         return f"WhileNode({self.condition}, {self.body})"
 
 class ElseNode:
+    __slots__ = ('body',)
+
     def __init__(self, body):
         self.body = body
     
     def __repr__(self):
         return f"ElseNode({self.body})"
 
+# Words that may precede `def`; they stay ordinary identifiers everywhere else.
+ANNOTATIONS = {'memo': True, 'nomemo': False}
+
 # Parser
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        """ `tokens` may be any iterable of tokens, such as a list or a `Lexer`; it is consumed lazily. """
+        self.tokens = iter(tokens)
+        self.lookahead = deque()
         self.current_token = None
         self.pos = -1
         self.advance()
 
     def advance(self):
         self.pos += 1
-        self.current_token = self.tokens[self.pos] if self.pos < len(self.tokens) else None
+        self.current_token = self.lookahead.popleft() if self.lookahead else next(self.tokens, None)
 
     def peek(self):
-        peek_pos = self.pos + 1
-        return self.tokens[peek_pos] if peek_pos < len(self.tokens) else None
+        if not self.lookahead:
+            self.lookahead.append(next(self.tokens, None))
+        return self.lookahead[0]
     
     def parse(self):
         """ Parse the entire program and return a list of nodes. """
-        nodes = []
+        return list(self.statements())
+
+    def statements(self):
+        """ Yield top-level statements one at a time, as soon as each has been parsed. """
         while self.current_token is not None and self.current_token.type != TokenType.EOF:
             if self.current_token.type == TokenType.SEMICOLON:
                 self.advance()
             else:
-                nodes.append(self.parse_statement())
-        return nodes
+                yield self.parse_statement()
     
     def parse_function_call(self):
         name = self.current_token.value
@@ -167,6 +205,13 @@ class Parser:
             return self.parse_for()
         elif self.current_token.type == TokenType.DEF:
             return self.parse_def()
+        elif (self.current_token.type == TokenType.IDENTIFIER and self.current_token.value in ANNOTATIONS
+              and self.peek().type == TokenType.DEF):
+            memo = ANNOTATIONS[self.current_token.value]
+            self.advance()
+            node = self.parse_def()
+            node.memo = memo
+            return node
         elif self.current_token.type == TokenType.RETURN:
             return self.parse_return()
         else:
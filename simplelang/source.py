@@ -0,0 +1,49 @@
+import codecs
+import mmap
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+def ascii_compatible(encoding):
+    """ True if every ASCII byte means its ASCII character and can never be part of a multi-byte sequence. """
+    name = codecs.lookup(encoding).name
+    if name == 'utf-8':
+        return True
+    try:
+        decoded = bytes(range(256)).decode(name)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return len(decoded) == 256 and decoded[:128] == bytes(range(128)).decode('ascii')
+
+def open_source(path, encoding=None):
+    """
+    Load a source file for the `Lexer`, returning (text, encoding).
+
+    Files in an ASCII-compatible encoding (UTF-8 by default) are memory-mapped and
+    returned as a memoryview, so the lexer works on the mapped bytes and decodes only
+    identifiers and strings; the mapping is released once nothing references it.
+    Other encodings, e.g. UTF-16, are read and decoded into a str. A byte order
+    mark selects the encoding when none is given and is skipped.
+    """
+    with open(path, 'rb') as file:
+        head = file.read(4)
+        bom = b''
+        for mark, marked_encoding in BOMS:
+            if head.startswith(mark):
+                bom, encoding = mark, encoding or marked_encoding
+                break
+        encoding = encoding or 'utf-8'
+        if not ascii_compatible(encoding):
+            file.seek(0)
+            return file.read().decode(encoding), encoding
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return '', encoding
+    return memoryview(mapped)[len(bom):], encoding
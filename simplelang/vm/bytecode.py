@@ -0,0 +1,56 @@
+from array import array
+
+LOAD_CONST = 1
+LOAD_LOCAL = 2
+STORE_LOCAL = 3
+POP_TOP = 4
+BINARY_ADD = 5
+BINARY_SUB = 6
+BINARY_MUL = 7
+BINARY_DIV = 8
+COMPARE_GT = 9
+COMPARE_LT = 10
+COMPARE_EQ = 11
+COMPARE_NE = 12
+COMPARE_GE = 13
+COMPARE_LE = 14
+JUMP = 15
+POP_JUMP_IF_FALSE = 16
+JUMP_IF_FALSE_OR_POP = 17
+JUMP_IF_TRUE_OR_POP = 18
+BUILD_ARRAY = 19
+LOAD_INDEX = 20
+PRINT = 21
+CALL = 22
+RETURN_VALUE = 23
+DEF_FUNCTION = 24
+INCREMENT_LOCAL = 25
+HALT = 26
+
+OPCODE_NAMES = {value: name for name, value in globals().items() if name.isupper() and isinstance(value, int)}
+
+class CodeObject:
+    """
+    Bytecode for one function (or the top-level program).
+
+    `code` holds (opcode, operand) pairs in a flat `array('i')`; operands index
+    into `consts`, into `names` (one local slot per name) or into `callees`,
+    the (function name, argument count) pairs used by CALL.
+    """
+    def __init__(self, name, parameters=()):
+        self.name = name
+        self.parameters = list(parameters)
+        self.code = array('i')
+        self.consts = []
+        self.names = list(parameters)
+        self.callees = []
+
+    def __repr__(self):
+        return f"CodeObject({self.name}, {self.parameters})"
+
+    def disassemble(self):
+        lines = []
+        for offset in range(0, len(self.code), 2):
+            op, arg = self.code[offset], self.code[offset + 1]
+            lines.append(f"{offset:4} {OPCODE_NAMES[op]:<20} {arg}")
+        return "\n".join(lines)
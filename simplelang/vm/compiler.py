@@ -0,0 +1,173 @@
+from simplelang.tokens import TokenType
+from simplelang.sl_parser import (VarDeclNode, BinaryOpNode, ArrayNode, ArrayIndexNode, PrintNode, ForNode,
+                                  FunctionNode, ReturnNode, FunctionCallNode, IfNode, WhileNode, ElseNode)
+from simplelang.vm.bytecode import *
+
+BINARY_OPCODES = {
+    TokenType.PLUS: BINARY_ADD,
+    TokenType.MINUS: BINARY_SUB,
+    TokenType.MUL: BINARY_MUL,
+    TokenType.DIV: BINARY_DIV,
+    TokenType.GREATER: COMPARE_GT,
+    TokenType.LESS: COMPARE_LT,
+    TokenType.EQUAL_EQUAL: COMPARE_EQ,
+    TokenType.NOT_EQUAL: COMPARE_NE,
+    TokenType.GREATER_EQUAL: COMPARE_GE,
+    TokenType.LESS_EQUAL: COMPARE_LE,
+}
+
+class BytecodeCompiler:
+    def __init__(self):
+        self.code = None
+        self.const_slots = {}
+        self.local_slots = {}
+        self.statement_end = None
+        self.hidden_counter = 0
+
+    def compile_program(self, nodes):
+        self.code = CodeObject('<program>')
+        self.const_slots, self.local_slots = {}, {}
+        for node in nodes:
+            # A `return` outside of a function only leaves the top-level statement it is in.
+            self.statement_end = []
+            self.compile_statement(node)
+            self.patch(self.statement_end, self.offset())
+        self.statement_end = None
+        self.emit(HALT)
+        return self.code
+
+    def compile_function(self, node):
+        enclosing = (self.code, self.const_slots, self.local_slots, self.statement_end)
+        self.code, self.statement_end = CodeObject(node.name, node.parameters), None
+        self.const_slots = {}
+        self.local_slots = {name: slot for slot, name in enumerate(self.code.names)}
+        for statement in node.body:
+            self.compile_statement(statement)
+        self.emit(LOAD_CONST, self.const(None))
+        self.emit(RETURN_VALUE)
+        function = self.code
+        self.code, self.const_slots, self.local_slots, self.statement_end = enclosing
+        return function
+
+    def offset(self):
+        return len(self.code.code)
+
+    def emit(self, op, arg=0):
+        self.code.code.append(op)
+        self.code.code.append(arg)
+        return len(self.code.code) - 1
+
+    def patch(self, operand_offsets, target):
+        for operand_offset in operand_offsets:
+            self.code.code[operand_offset] = target
+
+    def const(self, value):
+        key = (type(value), value)
+        if key not in self.const_slots:
+            self.const_slots[key] = len(self.code.consts)
+            self.code.consts.append(value)
+        return self.const_slots[key]
+
+    def local(self, name):
+        if name not in self.local_slots:
+            self.local_slots[name] = len(self.code.names)
+            self.code.names.append(name)
+        return self.local_slots[name]
+
+    def hidden_local(self):
+        # '$' cannot appear in an identifier, so these never clash with user variables.
+        self.hidden_counter += 1
+        return self.local(f"$tmp{self.hidden_counter}")
+
+    def callee(self, name, argc):
+        if (name, argc) not in self.code.callees:
+            self.code.callees.append((name, argc))
+        return self.code.callees.index((name, argc))
+
+    def compile_statement(self, node):
+        if isinstance(node, VarDeclNode):
+            self.compile_expression(node.value)
+            self.emit(STORE_LOCAL, self.local(node.var_name))
+        elif isinstance(node, PrintNode):
+            self.compile_expression(node.value)
+            self.emit(PRINT)
+        elif isinstance(node, ReturnNode):
+            self.compile_expression(node.value)
+            if self.statement_end is None:
+                self.emit(RETURN_VALUE)
+            else:
+                self.emit(POP_TOP)
+                self.statement_end.append(self.emit(JUMP))
+        elif isinstance(node, FunctionNode):
+            self.emit(DEF_FUNCTION, self.const(self.compile_function(node)))
+        elif isinstance(node, IfNode):
+            self.compile_expression(node.condition)
+            jump_to_else = self.emit(POP_JUMP_IF_FALSE)
+            self.compile_block(node.body)
+            if node.else_node is None:
+                self.patch([jump_to_else], self.offset())
+            else:
+                jump_to_end = self.emit(JUMP)
+                self.patch([jump_to_else], self.offset())
+                self.compile_block(node.else_node.body)
+                self.patch([jump_to_end], self.offset())
+        elif isinstance(node, ElseNode):
+            self.compile_block(node.body)
+        elif isinstance(node, WhileNode):
+            loop_start = self.offset()
+            self.compile_expression(node.condition)
+            jump_to_exit = self.emit(POP_JUMP_IF_FALSE)
+            self.compile_block(node.body)
+            self.emit(JUMP, loop_start)
+            self.patch([jump_to_exit], self.offset())
+        elif isinstance(node, ForNode):
+            variable = self.local(node.variable)
+            self.compile_expression(node.start)
+            self.emit(STORE_LOCAL, variable)
+            end = self.hidden_local()
+            self.compile_expression(node.end)
+            self.emit(STORE_LOCAL, end)
+            loop_start = self.offset()
+            self.emit(LOAD_LOCAL, variable)
+            self.emit(LOAD_LOCAL, end)
+            self.emit(COMPARE_LT)
+            jump_to_exit = self.emit(POP_JUMP_IF_FALSE)
+            self.compile_block(node.body)
+            self.emit(INCREMENT_LOCAL, variable)
+            self.emit(JUMP, loop_start)
+            self.patch([jump_to_exit], self.offset())
+        else:
+            self.compile_expression(node)
+            self.emit(POP_TOP)
+
+    def compile_block(self, nodes):
+        for node in nodes:
+            self.compile_statement(node)
+
+    def compile_expression(self, node):
+        if isinstance(node, int):
+            self.emit(LOAD_CONST, self.const(node))
+        elif isinstance(node, str):
+            self.emit(LOAD_LOCAL, self.local(node))
+        elif isinstance(node, BinaryOpNode):
+            self.compile_expression(node.left)
+            if node.op.type == TokenType.AND or node.op.type == TokenType.OR:
+                short_circuit = self.emit(JUMP_IF_FALSE_OR_POP if node.op.type == TokenType.AND else JUMP_IF_TRUE_OR_POP)
+                self.compile_expression(node.right)
+                self.patch([short_circuit], self.offset())
+            else:
+                self.compile_expression(node.right)
+                self.emit(BINARY_OPCODES[node.op.type])
+        elif isinstance(node, FunctionCallNode):
+            for argument in node.arguments:
+                self.compile_expression(argument)
+            self.emit(CALL, self.callee(node.name, len(node.arguments)))
+        elif isinstance(node, ArrayIndexNode):
+            self.compile_expression(node.index)
+            self.emit(LOAD_INDEX, self.local(node.array_identifier))
+        elif isinstance(node, ArrayNode):
+            for element in node.elements:
+                self.compile_expression(element)
+            self.emit(BUILD_ARRAY, len(node.elements))
+        else:
+            raise Exception(f"Cannot compile {type(node).__name__}")
@@ -0,0 +1,164 @@
+from simplelang.vm.bytecode import *
+from simplelang.vm.compiler import BytecodeCompiler
+from simplelang.errors import MAX_DEPTH, StackOverflowError
+
+class VirtualMachine:
+    """
+    Stack machine for the bytecode produced by `BytecodeCompiler`.
+
+    SimpleLang calls never recurse in Python: the caller's state is saved on
+    `frames` and the dispatch loop simply switches to the callee's code, so
+    recursion depth is bounded by `max_depth` (then `StackOverflowError`) rather
+    than by Python's recursion limit.
+    """
+    def __init__(self, parser, max_depth=MAX_DEPTH):
+        self.parser = parser
+        self.max_depth = max_depth
+        self.functions = {}
+        self.program = None
+        self.globals = []
+
+    def __repr__(self):
+        return f"VirtualMachine({repr(self.parser)}, {repr(self.variables)}, {repr(self.functions)})"
+
+    @property
+    def variables(self):
+        if self.program is None:
+            return {}
+        return {name: value for name, value in zip(self.program.names, self.globals)
+                if value is not None and not name.startswith('$')}
+
+    def interpret(self):
+        self.run(self.compile())
+
+    def compile(self):
+        return BytecodeCompiler().compile_program(self.parser.parse())
+
+    def run(self, program):
+        self.program = program
+        # Opcodes as locals: comparing against a fast local beats a module global lookup.
+        (LOAD_CONST_, LOAD_LOCAL_, STORE_LOCAL_, POP_TOP_, BINARY_ADD_, BINARY_SUB_, BINARY_MUL_, BINARY_DIV_,
+         COMPARE_GT_, COMPARE_LT_, COMPARE_EQ_, COMPARE_NE_, COMPARE_GE_, COMPARE_LE_, JUMP_, POP_JUMP_IF_FALSE_,
+         JUMP_IF_FALSE_OR_POP_, JUMP_IF_TRUE_OR_POP_, BUILD_ARRAY_, LOAD_INDEX_, PRINT_, CALL_, RETURN_VALUE_,
+         DEF_FUNCTION_, INCREMENT_LOCAL_, HALT_) = (
+            LOAD_CONST, LOAD_LOCAL, STORE_LOCAL, POP_TOP, BINARY_ADD, BINARY_SUB, BINARY_MUL, BINARY_DIV,
+            COMPARE_GT, COMPARE_LT, COMPARE_EQ, COMPARE_NE, COMPARE_GE, COMPARE_LE, JUMP, POP_JUMP_IF_FALSE,
+            JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, BUILD_ARRAY, LOAD_INDEX, PRINT, CALL, RETURN_VALUE,
+            DEF_FUNCTION, INCREMENT_LOCAL, HALT)
+        functions = self.functions
+        max_depth = self.max_depth
+        frames = []
+        stack = []
+        push = stack.append
+        pop = stack.pop
+
+        code = program
+        instructions, consts, callees = code.code, code.consts, code.callees
+        local_vars = self.globals = [None] * len(code.names)
+        ip = 0
+
+        while True:
+            op = instructions[ip]
+            arg = instructions[ip + 1]
+            ip += 2
+            if op == LOAD_LOCAL_:
+                push(local_vars[arg])
+            elif op == LOAD_CONST_:
+                push(consts[arg])
+            elif op == STORE_LOCAL_:
+                local_vars[arg] = pop()
+            elif op == BINARY_ADD_:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == BINARY_SUB_:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == COMPARE_LT_:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif op == POP_JUMP_IF_FALSE_:
+                if not pop():
+                    ip = arg
+            elif op == JUMP_:
+                ip = arg
+            elif op == INCREMENT_LOCAL_:
+                local_vars[arg] += 1
+            elif op == COMPARE_EQ_:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif op == BINARY_MUL_:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == CALL_:
+                name, argc = callees[arg]
+                function = functions.get(name)
+                if function is None:
+                    raise Exception(f"Undefined function: {name}")
+                if argc != len(function.parameters):
+                    raise Exception(f"Argument mismatch for function: {name}")
+                if len(frames) >= max_depth:
+                    raise StackOverflowError(name, max_depth)
+                frames.append((code, local_vars, ip))
+                code = function
+                instructions, consts, callees = code.code, code.consts, code.callees
+                local_vars = [None] * len(code.names)
+                if argc:
+                    local_vars[:argc] = stack[-argc:]
+                    del stack[-argc:]
+                ip = 0
+            elif op == RETURN_VALUE_:
+                code, local_vars, ip = frames.pop()
+                instructions, consts, callees = code.code, code.consts, code.callees
+            elif op == COMPARE_GT_:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif op == COMPARE_LE_:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif op == COMPARE_GE_:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif op == COMPARE_NE_:
+                right = pop()
+                stack[-1] = stack[-1] != right
+            elif op == BINARY_DIV_:
+                right = pop()
+                if right == 0:
+                    raise Exception("Division by zero")
+                stack[-1] = stack[-1] / right
+            elif op == LOAD_INDEX_:
+                array = local_vars[arg]
+                if array is None:
+                    raise Exception(f"Undefined array: {code.names[arg]}")
+                index = stack[-1]
+                if index < 0 or index >= len(array):
+                    raise Exception(f"Index out of bounds: {index}")
+                stack[-1] = array[index]
+            elif op == JUMP_IF_FALSE_OR_POP_:
+                if not stack[-1]:
+                    ip = arg
+                else:
+                    pop()
+            elif op == JUMP_IF_TRUE_OR_POP_:
+                if stack[-1]:
+                    ip = arg
+                else:
+                    pop()
+            elif op == POP_TOP_:
+                pop()
+            elif op == PRINT_:
+                print(pop())
+            elif op == BUILD_ARRAY_:
+                if arg:
+                    array = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    array = []
+                push(array)
+            elif op == DEF_FUNCTION_:
+                function = consts[arg]
+                functions[function.name] = function
+            elif op == HALT_:
+                return
+            else:
+                raise Exception(f"Unknown opcode: {op}")
@@ -0,0 +1,105 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.code_generator import ARMGenerator
+from simplelang.compiler.arm_simulator import ARMSimulator, CYCLES
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.tac_optimizer import TACOptimizer
+from tests.test_tac_optimizer import PROGRAMS
+
+def simulate(assembly, **options):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        simulator = ARMSimulator(assembly, **options).run()
+    return simulator, output.getvalue()
+
+def interpret(text):
+    tac = TAC()
+    for node in Parser(Lexer(text)).parse():
+        tac.generate_tac(node)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        TACInterpreter(None).run(tac)
+    return output.getvalue()
+
+class TestARMSimulator(unittest.TestCase):
+    def test_arithmetic_wraps_to_32_bits(self):
+        simulator, _ = simulate([
+            'LDR R1, =2147483647', 'MOV R2, #1', 'ADD R3, R1, R2',
+            'MOV R4, #7', 'MOV R5, #2', 'SUB R6, R5, R4', 'SDIV R7, R6, R5', 'MUL R8, R4, R5',
+            'MLA R9, R4, R5, R2', 'LSL R10, R4, #3', 'ASR R11, R6, #1', 'SDIV R12, R4, R0',
+        ])
+        self.assertEqual(simulator.registers[3], -2147483648)
+        # SDIV truncates toward zero (-5 / 2 is -2), an arithmetic shift rounds down (-5 >> 1 is -3).
+        self.assertEqual(simulator.registers[6:13], [-5, -2, 14, 15, 56, -3, 0])
+
+    def test_flags_drive_conditional_execution(self):
+        simulator, _ = simulate([
+            'MOV R1, #3', 'MOV R2, #5',
+            'CMP R1, R2', 'MOVLT R3, #1', 'MOVGE R3, #0', 'MOVEQ R4, #9',
+            'LDR R5, =-2147483648', 'CMP R5, R2', 'MOVLT R6, #1',
+        ])
+        self.assertEqual(simulator.registers[3:5], [1, 0])
+        # The subtraction overflows, yet LT (N != V) still holds.
+        self.assertEqual(simulator.registers[6], 1)
+
+    def test_calls_and_the_stack(self):
+        simulator, output = simulate([
+            'MOV R0, #20', 'BL double', 'BL print', 'B .Lend',
+            'double:', 'PUSH {R4, LR}', 'SUB SP, SP, #4', 'STR R0, [SP, #0]', 'LDR R4, [SP, #0]',
+            'ADD R0, R4, R4', 'ADD SP, SP, #4', 'POP {R4, PC}',
+            '.Lend:',
+        ])
+        self.assertEqual(output, '40\n')
+        report = simulator.report()
+        self.assertEqual(report['instructions'], 11)
+        self.assertEqual(report['counts']['BL'], 2)
+        self.assertEqual(report['stack_bytes'], 12)
+        self.assertEqual(report['register_pressure'], {'<program>': 1, 'double': 2})
+
+    def test_cycle_table_is_configurable(self):
+        assembly = ['MOV R1, #6', 'MOV R2, #3', 'SDIV R3, R1, R2', 'B done', 'MOV R3, #0', 'done:']
+        default, _ = simulate(assembly)
+        self.assertEqual(default.cycles, 2 * CYCLES['MOV'] + CYCLES['SDIV'] + CYCLES['B'] + CYCLES['taken'])
+        cheap, _ = simulate(assembly, cycles={'SDIV': 1, 'taken': 0})
+        self.assertEqual(cheap.cycles, default.cycles - CYCLES['SDIV'] + 1 - CYCLES['taken'])
+
+    def test_step_limit(self):
+        with self.assertRaises(Exception):
+            simulate(['spin:', 'B spin'], max_steps=100)
+
+    def test_unknown_instruction(self):
+        with self.assertRaises(Exception):
+            ARMSimulator(['FROB R1, R2'])
+
+    def test_generated_code_agrees_with_the_tac_interpreter(self):
+        for text in PROGRAMS:
+            expected = interpret(text)
+            if any(not line.lstrip('-').isdigit() for line in expected.split()):
+                continue  # True/False and true division have no 32-bit integer counterpart.
+            for optimizer in (None, TACOptimizer()):
+                with self.subTest(text=text, optimized=optimizer is not None):
+                    assembly = ARMGenerator(Parser(Lexer(text)).parse(), optimizer).generate_arm()
+                    _, output = simulate(assembly)
+                    self.assertEqual(output, expected)
+
+    def test_optimized_code_executes_fewer_instructions(self):
+        text = '''
+        let total = 0;
+        let k = 3;
+        for i = 0, 50 {
+            let total = total + i * (k + 1);
+        }
+        print(total);
+        '''
+        nodes = Parser(Lexer(text)).parse()
+        plain, output = simulate(ARMGenerator(nodes).generate_arm())
+        optimized, optimized_output = simulate(ARMGenerator(nodes, TACOptimizer()).generate_arm())
+        self.assertEqual(output, optimized_output)
+        self.assertLess(optimized.report()['cycles'], plain.report()['cycles'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import io
+import pickle
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser, VarDeclNode, IfNode
+from simplelang.ast_arena import ASTArena
+from simplelang.interpreter import Interpreter
+from simplelang.closure_interpreter import ClosureInterpreter
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.code_generator import ARMGenerator
+
+PROGRAM = '''
+def fact(n) {
+    if (n == 0) {
+        return 1;
+    }
+    return n * fact(n - 1);
+}
+let numbers = [1, 2, 3];
+let total = 0;
+for i = 0, 3 {
+    let total = total + numbers[i];
+}
+if (total > 5) { print(fact(total)); } else { print(0); }
+let x = 15;
+while (x > 10) { let x = x - 1; }
+'''
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+def run(engine, source):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        interpreter = engine(source)
+        interpreter.interpret()
+    return interpreter.variables, output.getvalue()
+
+class TestASTArena(unittest.TestCase):
+    def setUp(self):
+        self.arena = ASTArena.from_nodes(Parser(Lexer(PROGRAM)).statements())
+
+    def test_round_trip(self):
+        self.assertEqual(repr(self.arena.to_nodes()), repr(parse(PROGRAM)))
+        self.assertEqual(repr(self.arena.parse()), repr(parse(PROGRAM)))
+
+    def test_views_are_nodes(self):
+        statements = self.arena.parse()
+        self.assertIsInstance(statements[1], VarDeclNode)
+        self.assertEqual(statements[1].var_name, 'numbers')
+        self.assertIsInstance(statements[4], IfNode)
+        self.assertFalse(hasattr(statements[1], '__dict__'))
+
+    def test_views_are_read_once(self):
+        statement = self.arena.parse()[4]
+        body = statement.body
+        self.assertIs(statement.body, body)
+        self.assertIs(body[0], statement.body[0])
+        self.assertIsInstance(statement, IfNode)
+        self.assertEqual(type(statement).__name__, 'IfNode')
+        self.assertEqual(repr(statement), repr(parse(PROGRAM)[4]))
+
+    def test_constants_are_pooled(self):
+        self.assertEqual(len(self.arena.pool), len(set(map(self.arena.pool_key, self.arena.pool))))
+        self.assertEqual(self.arena.pool.count('total'), 1)
+
+    def test_interpreters(self):
+        for engine in (Interpreter, ClosureInterpreter):
+            self.assertEqual(run(engine, self.arena), run(engine, Parser(Lexer(PROGRAM))))
+
+    def test_tac_and_arm(self):
+        tac, expected = TAC(), TAC()
+        for node in self.arena.statements():
+            tac.generate_tac(node)
+        for node in parse(PROGRAM):
+            expected.generate_tac(node)
+        self.assertEqual(tac.code, expected.code)
+        text = 'let result = 10 + (5 * 2);'
+        arena = ASTArena.from_nodes(parse(text))
+        self.assertEqual(ARMGenerator(arena.parse()).generate_arm(), ARMGenerator(parse(text)).generate_arm())
+
+    def test_pickle(self):
+        arena = pickle.loads(pickle.dumps(self.arena))
+        self.assertEqual(repr(arena.to_nodes()), repr(self.arena.to_nodes()))
+        self.assertEqual(run(Interpreter, arena), run(Interpreter, self.arena))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.errors import StackOverflowError
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.tac_optimizer import TACOptimizer
+from simplelang.compiler.c_backend import CGenerator, CInterpreter, Unsupported, build, find_compiler
+from tests.test_arm_simulator import interpret
+from tests.test_tac_optimizer import PROGRAMS
+
+def lower(text):
+    tac = TAC()
+    for node in Parser(Lexer(text)).parse():
+        tac.generate_tac(node)
+    return tac
+
+FIB = '''
+def fib(a) {
+    if (a < 2) {
+        return a;
+    }
+    return fib(a - 1) + fib(a - 2);
+}
+print(fib(20));
+'''
+
+class TestCGenerator(unittest.TestCase):
+    def test_functions_become_c_functions_typed_by_kind(self):
+        source = CGenerator(lower(FIB + 'let half = 7 / 2; let xs = [1, 2]; print(xs[1]);')).source()
+        self.assertIn('static int64_t f_fib(int64_t v_a) {', source)
+        self.assertIn('double v_half = 0;', source)
+        self.assertIn('sl_array * v_xs = 0;', source)
+        self.assertIn('v_xs = sl_alloc(2);', source)
+
+    def test_self_tail_calls_jump_back(self):
+        source = CGenerator(lower('''
+        def count(n, total) {
+            if (n == 0) {
+                return total;
+            }
+            return count(n - 1, total + n);
+        }
+        ''')).source()
+        self.assertIn('goto sl_entry;', source)
+        self.assertNotIn('SL_RETURN(f_count(', source)
+
+    def test_unsupported_programs(self):
+        for text in ('let x = 1; let x = x / 2;', 'let xs = [1]; print(xs);', 'print(1 < 2); let b = 1 < 2; let b = 3;'):
+            with self.subTest(text=text):
+                with self.assertRaises(Unsupported):
+                    CGenerator(lower(text)).source()
+
+@unittest.skipUnless(find_compiler(), "no C compiler")
+class TestCInterpreter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_program(self, text, **options):
+        options.setdefault('cache_dir', self.directory.name)
+        interpreter = CInterpreter(Parser(Lexer(text)), **options)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter.interpret()
+        return interpreter, output.getvalue()
+
+    def test_matches_the_tac_interpreter(self):
+        for text in PROGRAMS:
+            expected = interpret(text)
+            for optimizer in (None, TACOptimizer()):
+                with self.subTest(text=text, optimized=optimizer is not None):
+                    interpreter, output = self.run_program(text, optimizer=optimizer)
+                    self.assertEqual(output, expected)
+
+    def test_floats_booleans_and_arrays(self):
+        interpreter, output = self.run_program('''
+        def total(xs, n) {
+            let sum = 0;
+            for i = 0, n {
+                let sum = sum + xs[i];
+            }
+            return sum;
+        }
+        let xs = [3, 4, 8];
+        let rows = [xs, [1]];
+        let first = rows[0];
+        print(total(first, 3) / 2);
+        print(total(xs, 3) > 10);
+        print(9223372036854775807 + 1);
+        ''')
+        self.assertIsNone(interpreter.fallback)
+        # Integers wrap at 64 bits.
+        self.assertEqual(output, '7.5\nTrue\n-9223372036854775808\n')
+
+    def test_errors_match_the_interpreter(self):
+        for text, message in (('let xs = [1]; print(xs[3]);', 'Index out of bounds: 3'),
+                              ('let zero = 0; print(1 / zero);', 'Division by zero'),
+                              ('def f(a) { return a; } print(f(1, 2));', 'Argument mismatch for function: f'),
+                              ('print(g(1));', 'Undefined function: g')):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(Exception, message):
+                    self.run_program(text)
+
+    def test_stack_overflow(self):
+        with self.assertRaises(StackOverflowError):
+            self.run_program('def down(n) { return 1 + down(n - 1); } print(down(10));', max_depth=1000)
+        # A function calling itself last reuses its frame.
+        _, output = self.run_program('''
+        def count(n, total) {
+            if (n == 0) {
+                return total;
+            }
+            return count(n - 1, total + n);
+        }
+        print(count(100000, 0));
+        ''', max_depth=10)
+        self.assertEqual(output, '5000050000\n')
+
+    def test_shared_objects_are_cached_by_source(self):
+        source = CGenerator(lower(FIB)).source()
+        path = build(source, self.directory.name, find_compiler())
+        modified = os.stat(path).st_mtime_ns
+        self.assertEqual(build(source, self.directory.name, find_compiler()), path)
+        self.assertEqual(os.stat(path).st_mtime_ns, modified)
+        self.assertEqual(os.listdir(self.directory.name), [os.path.basename(path)])
+
+    def test_falls_back_where_the_interpreter_sees_none(self):
+        for text, reason in (('def f(x) { let z = x; } let y = f(3); print(y);', 'f may end without return'),
+                             ('let g = 5; def f() { return g + 1; } print(f());', 'g may be read before it is set in f'),
+                             ('print(n + 1); let n = 2;', 'n may be read before it is set'),
+                             ('def f() { return 1; } print(f()); def f() { return 2; } print(f());',
+                              'f is defined more than once'),
+                             ('print(g(1)); def g(a) { return a; }', 'g may be defined after g is called')):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(Unsupported, reason):
+                    CGenerator(lower(text)).source()
+                try:
+                    expected = interpret(text)
+                except Exception as error:
+                    with self.assertRaisesRegex(type(error), re.escape(str(error))):
+                        self.run_program(text)
+                else:
+                    interpreter, output = self.run_program(text)
+                    self.assertIn(reason, interpreter.fallback)
+                    self.assertEqual(output, expected)
+        # A result nobody reads may be missing.
+        interpreter, output = self.run_program('def f(x) { print(x); } f(3);')
+        self.assertIsNone(interpreter.fallback)
+        self.assertEqual(output, '3\n')
+
+    def test_logical_operators_short_circuit(self):
+        text = 'def f(x) { print(x + 100); return x; } let a = 5; print(a || f(1)); print(0 || f(3)); print(a && f(4));'
+        for optimizer in (None, TACOptimizer()):
+            with self.subTest(optimized=optimizer is not None):
+                interpreter, output = self.run_program(text, optimizer=optimizer)
+                self.assertIsNone(interpreter.fallback)
+                self.assertEqual(output, '5\n103\n3\n104\n4\n')
+
+    def test_falls_back_without_a_compiler(self):
+        interpreter, output = self.run_program(FIB, compiler=os.path.join(self.directory.name, 'missing-cc'))
+        self.assertIsNotNone(interpreter.fallback)
+        self.assertEqual(output, '6765\n')
+        interpreter, output = self.run_program('let x = 1; let x = x / 2; print(x);')
+        self.assertIn('x holds both', interpreter.fallback)
+        self.assertEqual(output, '0.5\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import functools
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from simplelang import cache as cache_module
+from simplelang.cache import CompilationCache, run_cached
+from simplelang.compiler.optimizer import Optimizer
+from simplelang.compiler.tac_optimizer import TACOptimizer
+from simplelang.interpreter import Interpreter
+from simplelang.closure_interpreter import ClosureInterpreter
+from simplelang.vm.machine import VirtualMachine
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.python_backend import PythonInterpreter
+
+PROGRAM = '''
+def square(x) {
+    return x * x;
+}
+let total = 0;
+for i = 0, 4 {
+    let total = total + square(i);
+}
+print(total);
+'''
+
+class TestCompilationCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = CompilationCache(self.directory)
+
+    def run_program(self, engine, text=PROGRAM):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter = run_cached(engine, text, 'utf-8', self.cache)
+        return interpreter.variables, output.getvalue()
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_engines_hit_on_second_run(self):
+        for engine in (Interpreter, ClosureInterpreter, VirtualMachine, TACInterpreter, PythonInterpreter):
+            first = self.run_program(engine)
+            hits = self.cache.hits
+            self.assertEqual(self.run_program(engine), first)
+            self.assertEqual(self.cache.hits, hits + 1)
+            self.assertEqual(first[1], '14\n')
+
+    def test_configured_engines_cache_their_lowering(self):
+        engine = functools.partial(TACInterpreter, max_depth=10)
+        self.run_program(engine)
+        self.assertEqual(self.run_program(engine)[1], '14\n')
+        self.assertEqual(len(self.files()), 1)
+        self.assertEqual(self.cache.hits, 1)
+        # Options that change the lowering get their own entry.
+        self.run_program(functools.partial(TACInterpreter, max_depth=10, optimizer=TACOptimizer()))
+        self.assertEqual(len(self.files()), 2)
+
+    def test_optimized_programs_have_their_own_entries(self):
+        for engine in (ClosureInterpreter, VirtualMachine):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                run_cached(engine, PROGRAM, 'utf-8', self.cache, Optimizer())
+                run_cached(engine, PROGRAM, 'utf-8', self.cache, Optimizer(simplify=False))
+            self.assertEqual(output.getvalue(), '14\n14\n')
+        self.assertEqual(len(self.files()), 4)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_bytes_and_text_sources(self):
+        self.run_program(VirtualMachine, PROGRAM.encode('utf-8'))
+        self.run_program(VirtualMachine, PROGRAM.encode('utf-8'))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_changed_source_misses(self):
+        self.run_program(Interpreter)
+        self.run_program(Interpreter, PROGRAM + 'print(1);')
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertEqual(len(self.files()), 2)
+
+    def test_corrupt_entry_is_discarded(self):
+        self.run_program(TACInterpreter)
+        [name] = self.files()
+        path = os.path.join(self.directory, name)
+        with open(path, 'r+b') as file:
+            file.seek(-1, os.SEEK_END)
+            last = file.read(1)
+            file.seek(-1, os.SEEK_END)
+            file.write(bytes([last[0] ^ 0xff]))
+        self.assertEqual(self.run_program(TACInterpreter)[1], '14\n')
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.run_program(TACInterpreter)[1], '14\n')
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_compiler_version_is_checked(self):
+        self.run_program(VirtualMachine)
+        [name] = self.files()
+        with open(os.path.join(self.directory, name), 'rb') as file:
+            data = file.read()
+        key = bytes.fromhex(name[:-len('.slc')])
+        self.assertIsNotNone(self.cache.decode(key, data))
+        original = cache_module.COMPILER_VERSION
+        cache_module.COMPILER_VERSION = original + 1
+        try:
+            self.assertIsNone(self.cache.decode(key, data))
+        finally:
+            cache_module.COMPILER_VERSION = original
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_entries = 2
+        programs = [f'print({i});' for i in range(3)]
+        for age, program in enumerate(programs):
+            self.run_program(Interpreter, program)
+            for name in self.files():
+                path = os.path.join(self.directory, name)
+                os.utime(path, (os.stat(path).st_mtime - 10, os.stat(path).st_mtime - 10))
+        self.assertEqual(len(self.files()), 2)
+        self.run_program(Interpreter, programs[0])
+        self.assertEqual(self.cache.hits, 0)
+        self.run_program(Interpreter, programs[2])
+        self.assertEqual(self.cache.hits, 1)
+        self.assertTrue(all(name.endswith('.slc') for name in self.files()))
+
+    def test_statements_run_while_parsing_on_a_miss(self):
+        output = io.StringIO()
+        with redirect_stdout(output), self.assertRaises(Exception):
+            run_cached(Interpreter, 'print(1); let = ;', 'utf-8', self.cache)
+        self.assertEqual(output.getvalue(), '1\n')
+        self.assertEqual(self.files(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.cfg import (CFG, Liveness, ReachingDefinitions, split_functions, join_functions, uses,
+                                     defines, positions)
+
+def generate(text):
+    tac = TAC()
+    for node in Parser(Lexer(text)).parse():
+        tac.generate_tac(node)
+    return tac
+
+PROGRAM = '''
+let x = 0;
+let y = 5;
+while (x < 10) {
+    if (x > y) {
+        let y = y + 1;
+    }
+    let x = x + 1;
+}
+print(y);
+'''
+
+class TestCFG(unittest.TestCase):
+    def test_blocks_and_edges(self):
+        cfg = CFG(generate(PROGRAM).code)
+        edges = {block.index: [successor.index for successor in block.successors] for block in cfg.blocks}
+        # entry, loop header, if header, then, join, loop exit
+        self.assertEqual(len(cfg.blocks), 7)
+        header = cfg.labels['l0']
+        self.assertEqual(edges[cfg.entry.index], [header.index])
+        self.assertEqual(sorted(edges[header.index]), sorted([cfg.labels['l1'].index, header.index + 1]))
+        self.assertEqual(cfg.exits, [cfg.labels['l1']])
+        for block in cfg.blocks:
+            for successor in block.successors:
+                self.assertIn(block, successor.predecessors)
+        self.assertIs(cfg.block_of(header.start + 1), header)
+
+    def test_dominators(self):
+        cfg = CFG(generate(PROGRAM).code)
+        header, exit_block = cfg.labels['l0'], cfg.labels['l1']
+        dominators = cfg.dominators()
+        for block in cfg.blocks:
+            self.assertTrue(dominators[block.index] >> cfg.entry.index & 1)
+        self.assertEqual(positions(dominators[exit_block.index]), [cfg.entry.index, header.index, exit_block.index])
+        idom = cfg.immediate_dominators()
+        self.assertIsNone(idom[cfg.entry.index])
+        self.assertEqual(idom[header.index], cfg.entry.index)
+        self.assertEqual(idom[exit_block.index], header.index)
+        # The block after the `if` is reached from both branches, so only the `if` test dominates it.
+        self.assertEqual(idom[cfg.labels['l4'].index], cfg.labels['l2'].index)
+
+    def test_natural_loops(self):
+        cfg = CFG(generate('for i = 0, 3 { for j = 0, 3 { print(j); } while (x) { let x = 0; } }').code)
+        loops = cfg.natural_loops()
+        self.assertEqual(len(loops), 3)
+        inner, other, outer = loops
+        self.assertEqual([inner.header, other.header, outer.header], [cfg.labels['l2'], cfg.labels['l4'], cfg.labels['l0']])
+        self.assertTrue(inner.blocks < outer.blocks and other.blocks < outer.blocks)
+        self.assertFalse(inner.blocks & other.blocks)
+        for loop in loops:
+            self.assertEqual(len(loop.latches), 1)
+            self.assertIn(loop.header, loop.latches[0].successors)
+        self.assertEqual(CFG(generate('if (x) { print(1); }').code).natural_loops(), [])
+        frontiers = cfg.dominance_frontiers()
+        # The inner loop's body leads back to its own header, which it does not dominate.
+        self.assertEqual(frontiers[inner.latches[0].index], {inner.header.index})
+
+    def test_unreachable_blocks(self):
+        main, functions = split_functions(generate('def f(a) { if (a) { return 1; } return 2; }').code)
+        cfg = CFG(functions[0][2])
+        dominators = cfg.dominators()
+        unreachable = [block for block in cfg.blocks if not dominators[block.index]]
+        self.assertEqual([cfg.quads(block) for block in unreachable], [[('goto', None, None, 'l2')]])
+        self.assertIsNone(cfg.immediate_dominators()[unreachable[0].index])
+
+    def test_liveness(self):
+        cfg = CFG(generate(PROGRAM).code)
+        liveness = Liveness(cfg)
+        self.assertEqual(liveness.names(liveness.live_in[cfg.labels['l0'].index]), {'x', 'y'})
+        self.assertEqual(liveness.names(liveness.live_in[cfg.labels['l1'].index]), {'y'})
+        self.assertEqual(liveness.names(liveness.live_out[cfg.labels['l1'].index]), set())
+        self.assertEqual(liveness.names(liveness.live_in[cfg.entry.index]), set())
+        liveness = Liveness(cfg, live_at_exit=['x'])
+        self.assertEqual(liveness.names(liveness.live_out[cfg.labels['l1'].index]), {'x'})
+        after = liveness.live_after(cfg.entry)
+        self.assertEqual([liveness.names(live) for live in after], [{'x'}, {'x', 'y'}])
+
+    def test_reaching_definitions(self):
+        cfg = CFG(generate(PROGRAM).code)
+        reaching = ReachingDefinitions(cfg)
+        code = cfg.code
+        print_position = next(position for position, quad in enumerate(code) if quad[0] == 'print')
+        definitions = reaching.reaching(print_position, 'y')
+        self.assertEqual([code[position] for position in definitions],
+                         [('=', 5, None, 'y'), ('=', 't2', None, 'y')])
+        header = cfg.labels['l0']
+        self.assertEqual([code[position][3] for position in reaching.positions(reaching.reach_in[header.index])
+                          if code[position][3] == 'x'], ['x', 'x'])
+
+    def test_uses_and_defines(self):
+        self.assertEqual(uses(('=', 'v', None, 'a[i]')), ('v', 'a', 'i'))
+        self.assertIsNone(defines(('=', 'v', None, 'a[i]')))
+        self.assertEqual(uses(('=', 'a[0]', None, 't1')), ('a',))
+        self.assertEqual(defines(('=', 'a[0]', None, 't1')), 't1')
+        self.assertEqual(uses(('call', 'f', 't2', 't3')), ('t2',))
+        self.assertEqual(defines(('call', 'f', 't2', 't3')), 't3')
+
+    def test_split_and_join_functions(self):
+        tac = generate('def f(a) { def g(b) { return b; } return g(a); } print(f(1));')
+        main, functions = split_functions(tac.code)
+        self.assertEqual([(name, count) for name, count, _ in functions], [('f', 1), ('g', 1)])
+        self.assertNotIn('beginFunc', [quad[0] for quad in main])
+        self.assertEqual(split_functions(join_functions(main, functions)), (main, functions))
+        # Anchored, each definition stays where it was.
+        main, functions = split_functions(tac.code, anchored=True)
+        self.assertEqual(main[0], ('def', 0, None, 'f'))
+        self.assertIn(('def', 1, None, 'g'), functions[0][2])
+        self.assertEqual(join_functions(main, functions, anchored=True), tac.code)
+
+    def test_large_programs(self):
+        text = ''.join(f'let v{i} = v{i - 1} + {i}; if (v{i} > 3) {{ let w = v{i} * 2; }} while (w < {i}) {{ let w = w + 1; }}\n'
+                       for i in range(1, 1200))
+        cfg = CFG(generate(text).code)
+        self.assertGreater(len(cfg.code), 20000)
+        liveness = Liveness(cfg)
+        reaching = ReachingDefinitions(cfg)
+        self.assertEqual(liveness.names(liveness.live_in[cfg.entry.index]), {'v0', 'w'})
+        self.assertEqual(len(reaching.definitions), sum(defines(quad) is not None for quad in cfg.code))
+        idom = cfg.immediate_dominators()
+        self.assertTrue(all(index == cfg.entry.index or idom[index] is not None for index in range(len(cfg.blocks))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer, TokenType
+from simplelang.sl_parser import Parser
+from simplelang.closure_interpreter import ClosureInterpreter
+
+class TestClosureInterpreter(unittest.TestCase):
+    def run_program(self, text, function_globals=False, **options):
+        lexer = Lexer(text)
+        tokens = []
+        while True:
+            token = lexer.get_next_token()
+            if token.type == TokenType.EOF:
+                break
+            tokens.append(token)
+        parser = Parser(tokens)
+        interpreter = ClosureInterpreter(parser, function_globals, **options)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter.interpret()
+        return interpreter, output.getvalue()
+
+    def test_if_else_statement(self):
+        interpreter, _ = self.run_program('let x = 8; if (x > 10) {let x = 9;} else {let x = 10;}')
+        self.assertEqual(interpreter.variables['x'], 10)
+
+    def test_function_call(self):
+        text = '''
+        def add(x, y) {
+            let a = x + y;
+            return a;
+        }
+
+        let result = add(10, 20);
+        print(result);
+        '''
+        interpreter, output = self.run_program(text)
+        self.assertEqual(interpreter.variables['result'], 30)
+        self.assertEqual(output, '30\n')
+
+    def test_recursive_function(self):
+        text = '''
+        def fib(a) {
+            if (a == 0) {
+                return 0;
+            }
+            if (a == 1) {
+                return 1;
+            }
+            return fib(a - 1) + fib(a - 2);
+        }
+        let result = fib(10);
+        '''
+        interpreter, _ = self.run_program(text)
+        self.assertEqual(interpreter.variables['result'], 55)
+
+    def test_return_from_nested_block(self):
+        text = '''
+        def first_over(limit) {
+            for i = 0, 100 {
+                if (i * i > limit) {
+                    return i;
+                }
+            }
+            return 0 - 1;
+        }
+        let result = first_over(50);
+        '''
+        interpreter, _ = self.run_program(text)
+        self.assertEqual(interpreter.variables['result'], 8)
+
+    def test_function_does_not_see_globals(self):
+        text = '''
+        let g = 5;
+        def read() {
+            return g;
+        }
+        let result = read();
+        '''
+        interpreter, _ = self.run_program(text)
+        self.assertIsNone(interpreter.variables['result'])
+
+    def test_while_and_arrays(self):
+        text = '''
+        let arr = [1, 2, 3, 4, 5];
+        let i = 0;
+        let total = 0;
+        while (i < 5) {
+            let total = total + arr[i];
+            let i = i + 1;
+        }
+        print(total / 5);
+        '''
+        interpreter, output = self.run_program(text)
+        self.assertEqual(interpreter.variables['total'], 15)
+        self.assertEqual(output, '3.0\n')
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            self.run_program('let x = 1 / 0;')
+        with self.assertRaisesRegex(Exception, "Undefined function: nope"):
+            self.run_program('nope(1);')
+        with self.assertRaisesRegex(Exception, "Index out of bounds: 3"):
+            self.run_program('let a = [1, 2, 3]; print(a[3]);')
+
+    def test_function_globals(self):
+        text = '''
+        def scale(x) {
+            let factor = 2;
+            return x * factor + offset;
+        }
+        let offset = 1;
+        let factor = 10;
+        let result = scale(3);
+        '''
+        interpreter, _ = self.run_program(text, function_globals=True)
+        self.assertEqual(interpreter.variables['result'], 7)
+        self.assertEqual(interpreter.variables['factor'], 10)
+        text = '''
+        let offset = 1;
+        def shift(x) { return x + offset; }
+        let result = shift(3);
+        let offset = 5;
+        let later = shift(3);
+        '''
+        interpreter, _ = self.run_program(text, function_globals=True)
+        self.assertEqual((interpreter.variables['result'], interpreter.variables['later']), (4, 8))
+
+    def test_call_sites_follow_redefinition(self):
+        text = '''
+        def f(a) { return a + 1; }
+        def g(x) { return f(x); }
+        let first = g(1);
+        def f(a) { return a * 10; }
+        let second = g(1);
+        def f(a, b) { return a; }
+        let third = g(1);
+        '''
+        with self.assertRaisesRegex(Exception, "Argument mismatch for function: f"):
+            self.run_program(text)
+        interpreter, _ = self.run_program(text.split('def f(a, b)')[0])
+        self.assertEqual((interpreter.variables['first'], interpreter.variables['second']), (2, 10))
+
+    def test_call_frames_start_empty(self):
+        text = '''
+        def sum4(a, b, c, d) {
+            let seen = seen;
+            let total = a + b + c + d;
+            if (seen) {
+                return 0;
+            }
+            return total;
+        }
+        def walk(n) {
+            if (n > 0) {
+                let inner = walk(n - 1);
+            }
+            let local = local;
+            return local;
+        }
+        let result = sum4(1, 2, 3, 4) + sum4(4, 3, 2, 1);
+        let none = walk(5);
+        '''
+        interpreter, _ = self.run_program(text)
+        self.assertEqual(interpreter.variables['result'], 20)
+        self.assertIsNone(interpreter.variables['none'])
+
+    def test_memoize_pure_functions(self):
+        text = '''
+        def fib(a) { if (a < 2) { return a; } return fib(a - 1) + fib(a - 2); }
+        def show(x) { print(x); return x; }
+        let result = fib(60);
+        let shown = show(1) + show(1);
+        '''
+        interpreter, output = self.run_program(text, memoize=True)
+        self.assertEqual(interpreter.variables['result'], 1548008755920)
+        self.assertEqual(output, '1\n1\n')
+        stats = interpreter.memo_stats()
+        self.assertEqual(list(stats), ['fib'])
+        self.assertEqual((stats['fib'].hits, stats['fib'].misses), (58, 61))
+
+    def test_memoize_keeps_ints_and_floats_apart(self):
+        text = '''
+        memo def add(a, b) { return a + b; }
+        print(add(4 / 2, 1));
+        print(add(2, 1));
+        '''
+        interpreter, output = self.run_program(text, memoize=True)
+        self.assertEqual(output, '3.0\n3\n')
+        self.assertEqual(interpreter.memo_stats()['add'].misses, 2)
+
+    def test_memoize_runs_failing_bodies_once(self):
+        text = 'memo def bad(xs) { print(xs); return xs + 1; } let a = bad([1]);'
+        interpreter = ClosureInterpreter(Parser(Lexer(text)), memoize=True)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with self.assertRaises(TypeError):
+                interpreter.interpret()
+        self.assertEqual(output.getvalue(), '[1]\n')
+
+    def test_memoize_annotations_and_size(self):
+        text = '''
+        memo def show(x) { print(x); return x; }
+        nomemo def square(x) { return x * x; }
+        def sum(values) { return values[0] + values[1]; }
+        let a = show(1) + show(1) + square(3) + sum([1, 2]) + sum([1, 2]);
+        let b = sum(1);
+        '''
+        with self.assertRaisesRegex(TypeError, "has no len"):
+            self.run_program(text, memoize=True)
+        interpreter, output = self.run_program(text.split('let b')[0], memoize=True, memo_size=1)
+        self.assertEqual(interpreter.variables['a'], 17)
+        self.assertEqual(output, '1\n')
+        self.assertEqual(sorted(interpreter.memo_stats()), ['show', 'sum'])
+        self.assertEqual(interpreter.memo_stats()['show'].maxsize, 1)
+        interpreter, output = self.run_program(text.split('let b')[0])
+        self.assertEqual(output, '1\n1\n')
+
+    def test_tail_calls_do_not_nest(self):
+        text = '''
+        def loop(i, acc) { if (i == 0) { return acc; } return loop(i - 1, acc + i); }
+        def even(n) { if (n == 0) { return 1; } return odd(n - 1); }
+        def odd(n) { if (n == 0) { return 0; } return even(n - 1); }
+        def first(values) { return values[0]; }
+        def tail_first(values) { return first(values); }
+        let total = loop(100000, 0);
+        let parity = even(100001);
+        let head = tail_first([7, 8]);
+        return loop(3, 0);
+        '''
+        interpreter, _ = self.run_program(text)
+        self.assertEqual(interpreter.variables, {'total': 5000050000, 'parity': 0, 'head': 7})
+        interpreter, _ = self.run_program(text.replace('100000', '100').replace('100001', '101'), memoize=True)
+        self.assertEqual(interpreter.variables, {'total': 5050, 'parity': 0, 'head': 7})
+
+    def test_unassigned_names_are_not_variables(self):
+        interpreter, output = self.run_program('print(missing); let x = missing;')
+        self.assertEqual(interpreter.variables, {'x': None})
+        self.assertEqual(output, 'None\n')
+
+if __name__ == '__main__':
+    unittest.main()
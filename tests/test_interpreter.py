@@ -1,4 +1,6 @@
+import io
 import unittest
+from contextlib import redirect_stdout
 from simplelang.lexer import Lexer, TokenType
 from simplelang.sl_parser import Parser
 from simplelang.interpreter import Interpreter
@@ -99,4 +101,13 @@ class TestInterpreter(unittest.TestCase):
         parser = Parser(tokens)
         interpreter = Interpreter(parser)
         interpreter.interpret()
-        self.assertEqual(interpreter.variables['result'], 120)
\ No newline at end of file
+        self.assertEqual(interpreter.variables['result'], 120)
+
+    def test_executes_while_parsing(self):
+        parser = Parser(Lexer('print(1); print(2); let = ;'))
+        interpreter = Interpreter(parser)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with self.assertRaises(Exception):
+                interpreter.interpret()
+        self.assertEqual(output.getvalue(), '1\n2\n')
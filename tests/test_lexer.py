@@ -108,5 +108,78 @@ class TestLexer(unittest.TestCase):
 
         self.assertEqual([t.type for t in tokens], expected_tokens)
 
+    def test_operators_and_invalid_characters(self):
+        text = 'a==b!=c<=d>=e&&f||g & | @=$'
+        lexer = Lexer(text)
+        tokens = []
+        while True:
+            token = lexer.get_next_token()
+            tokens.append(token)
+            if token.type == TokenType.EOF:
+                break
+        self.assertEqual([t.type for t in tokens], [
+            TokenType.IDENTIFIER, TokenType.EQUAL_EQUAL, TokenType.IDENTIFIER, TokenType.NOT_EQUAL,
+            TokenType.IDENTIFIER, TokenType.LESS_EQUAL, TokenType.IDENTIFIER, TokenType.GREATER_EQUAL,
+            TokenType.IDENTIFIER, TokenType.AND, TokenType.IDENTIFIER, TokenType.OR, TokenType.IDENTIFIER,
+            TokenType.INVALID, TokenType.INVALID, TokenType.INVALID, TokenType.EQUAL, TokenType.INVALID,
+            TokenType.EOF
+        ])
+
+    def test_token_values(self):
+        text = 'let _x1 = 042; print("hi there"); "open'
+        lexer = Lexer(text)
+        tokens = []
+        while True:
+            token = lexer.get_next_token()
+            tokens.append(token)
+            if token.type == TokenType.EOF:
+                break
+        self.assertEqual([(t.type, t.value) for t in tokens], [
+            (TokenType.LET, None), (TokenType.IDENTIFIER, '_x1'), (TokenType.EQUAL, None), (TokenType.NUMBER, 42),
+            (TokenType.SEMICOLON, None), (TokenType.PRINT, None), (TokenType.LPAREN, None),
+            (TokenType.STRING, 'hi there'), (TokenType.RPAREN, None), (TokenType.SEMICOLON, None),
+            (TokenType.STRING, 'open'), (TokenType.EOF, None)
+        ])
+
+    def test_position_tracking(self):
+        lexer = Lexer('let  x')
+        lexer.get_next_token()
+        self.assertEqual(lexer.pos, 3)
+        self.assertEqual(lexer.current_char, ' ')
+        lexer.get_next_token()
+        self.assertIsNone(lexer.current_char)
+
+    def test_bytes_input_matches_text(self):
+        text = 'let café = [1, 22]; if (café != "naïve" && x) { print(café[0]); } € @'
+        expected = [(t.type, t.value) for t in Lexer(text)]
+        self.assertEqual([(t.type, t.value) for t in Lexer(text.encode('utf-8'))], expected)
+        self.assertEqual([(t.type, t.value) for t in Lexer(memoryview(text.encode('utf-8')))], expected)
+
+    def test_bytes_input_skips_the_same_whitespace(self):
+        text = 'let\x1ca\x1d=\x1e1\x1f;\x0b\x0c\t\r\n print(a);'
+        expected = [(t.type, t.value) for t in Lexer(text)]
+        self.assertEqual(len(expected), 10)
+        self.assertEqual([(t.type, t.value) for t in Lexer(text.encode('ascii'))], expected)
+
+    def test_bytes_input_single_byte_encoding(self):
+        text = 'let señal = "año";'
+        tokens = list(Lexer(text.encode('latin-1'), 'latin-1'))
+        self.assertEqual(tokens[1].value, 'señal')
+        self.assertEqual(tokens[3].value, 'año')
+
+    def test_valueless_tokens_are_shared(self):
+        first, second = list(Lexer('let a = b; let c = d;')), list(Lexer('let'))
+        self.assertIs(first[0], first[5])
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[2], first[7])
+        self.assertIs(Lexer('').get_next_token(), Lexer('').get_next_token())
+
+    def test_identifiers_are_interned(self):
+        name = ''.join(['vari', 'able'])
+        tokens = list(Lexer(f'{name} + {name}')) + list(Lexer(f'{name}'.encode('utf-8')))
+        self.assertIs(tokens[0].value, tokens[2].value)
+        self.assertIs(tokens[0].value, tokens[3].value)
+        self.assertFalse(hasattr(tokens[0], '__dict__'))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,213 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser, VarDeclNode, BinaryOpNode, IfNode, PrintNode, WhileNode
+from simplelang.ast_arena import ASTArena
+from simplelang.interpreter import Interpreter
+from simplelang.closure_interpreter import ClosureInterpreter
+from simplelang.vm.machine import VirtualMachine
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.python_backend import PythonInterpreter
+from simplelang.compiler.code_generator import ARMGenerator
+from simplelang.compiler.optimizer import Optimizer, OptimizingParser, count_nodes
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+def optimize(text, **passes):
+    optimizer = Optimizer(**passes)
+    return optimizer.optimize(parse(text)), optimizer
+
+PROGRAM = '''
+let a = 2 + (3 * 2);
+let b = a * 1 + 0;
+let c = (a < 5) + 0;
+def f(x) {
+    if (1 < 2) {
+        let y = x * 0;
+    } else {
+        let y = 1;
+    }
+    if (x > 0) {
+        let y = y + x + 0 * x;
+    } else {
+    }
+    return y - 0;
+}
+print(f(a));
+if (0) { print(99); }
+print(b);
+'''
+
+LOOPS = '''
+let grid = [1, 2, 3, 4, 5, 6];
+let w = 3;
+let total = 0;
+let row = 0;
+while (row < 2) {
+    for col = 0, w {
+        let total = total + grid[row * w + col] * (w * 2) + (w + 1);
+    }
+    let row = row + 1;
+}
+def f(a) {
+    let s = 0;
+    for k = 0, a {
+        let s = s + a * 2 + k;
+    }
+    return s;
+}
+print(total);
+print(f(4));
+'''
+
+class TestOptimizer(unittest.TestCase):
+    def test_constant_folding(self):
+        nodes, optimizer = optimize('let a = 2 + (3 * 2); let b = (1 < 2); let c = 7 / 7; let d = 2 - 3;')
+        self.assertEqual([node.value for node in nodes[:2]], [8, True])
+        self.assertIsInstance(nodes[2].value, BinaryOpNode)
+        self.assertEqual(nodes[3].value, -1)
+        self.assertEqual(optimizer.stats['fold_constants'], {'applied': 4, 'nodes_eliminated': 8})
+
+    def test_identities(self):
+        nodes, optimizer = optimize('let a = 7 + 0; let b = 1 * (4 - 0); let c = (2 - 3) * 0; let d = x + 0; '
+                                    'let e = f(x) * 0; let g = (x < y) + 0; let h = [1] * 1; let i = (x + y) * 0;',
+                                    fold_constants=False)
+        self.assertEqual([node.value for node in nodes[:3]], [7, 4, 0])
+        for node in nodes[3:]:
+            self.assertIsInstance(node.value, BinaryOpNode)
+        self.assertEqual(optimizer.stats['simplify']['applied'], 4)
+
+    def test_names_holding_comparisons_are_kept(self):
+        text = 'let a = 1; let c = (a < 2); print(c + 0); print(0 + c); print(c - 0); print(c * 1); print(1 * c);'
+        nodes, optimizer = optimize(text)
+        self.assertEqual(optimizer.stats['simplify']['applied'], 0)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            Interpreter(OptimizingParser(Parser(Lexer(text)), Optimizer())).interpret()
+        self.assertEqual(output.getvalue(), '1\n1\n1\n1\n1\n')
+
+    def test_multiplying_an_array_by_zero_is_kept(self):
+        text = 'let a = [1, 2]; print(a * 0); print(0 * a);'
+        nodes, optimizer = optimize(text)
+        self.assertIsInstance(nodes[1].value, BinaryOpNode)
+        self.assertEqual(optimizer.stats['simplify']['applied'], 0)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            Interpreter(OptimizingParser(Parser(Lexer(text)), Optimizer())).interpret()
+        self.assertEqual(output.getvalue(), '[]\n[]\n')
+
+    def test_if_folding_and_dead_else(self):
+        nodes, optimizer = optimize('if (1 < 2) { let a = 1; let b = 2; } else { let a = 3; } '
+                                    'if (0) { print(1); } if (x) { print(x); } else { }')
+        self.assertEqual([type(node) for node in nodes], [VarDeclNode, VarDeclNode, IfNode])
+        self.assertIsNone(nodes[2].else_node)
+        self.assertEqual(optimizer.stats['fold_ifs']['applied'], 2)
+        self.assertEqual(optimizer.stats['remove_dead_else'], {'applied': 1, 'nodes_eliminated': 1})
+
+    def test_branches_holding_a_return_are_not_folded(self):
+        text = 'let i = 0; while (i < 3) { if (1) { return 0; } let i = i + 1; } print(i);'
+        nodes, optimizer = optimize(text)
+        self.assertIsInstance(nodes[1].body[0], IfNode)
+        self.assertEqual(optimizer.stats['fold_ifs']['applied'], 0)
+        for parser in (Parser(Lexer(text)), OptimizingParser(Parser(Lexer(text)), Optimizer())):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                Interpreter(parser).interpret()
+            self.assertEqual(output.getvalue(), '3\n')
+
+    def test_passes_can_be_disabled(self):
+        text = 'if (1) { print(2 + 3); } else { print(7 * 1); }'
+        nodes, optimizer = optimize(text, fold_ifs=False)
+        self.assertIsInstance(nodes[0], IfNode)
+        self.assertIsNone(nodes[0].else_node)
+        self.assertEqual(nodes[0].body[0].value, 5)
+        nodes, optimizer = optimize(text, fold_constants=False, remove_dead_else=False, fold_ifs=False,
+                                    hoist_invariants=False)
+        self.assertIsInstance(nodes[0].body[0].value, BinaryOpNode)
+        self.assertEqual(nodes[0].else_node.body[0].value, 7)
+        self.assertEqual(optimizer.key(), 'simplify')
+        nodes, optimizer = optimize(text, fold_constants=False, simplify=False, fold_ifs=False, remove_dead_else=False,
+                                    hoist_invariants=False)
+        self.assertEqual(repr(nodes), repr(parse(text)))
+        self.assertEqual(optimizer.nodes_eliminated(), 0)
+
+    def test_stats_match_tree_sizes(self):
+        nodes = parse(PROGRAM)
+        optimizer = Optimizer()
+        optimized = optimizer.optimize(nodes)
+        self.assertEqual(count_nodes(nodes) - count_nodes(optimized), optimizer.nodes_eliminated())
+        self.assertGreater(optimizer.nodes_eliminated(), 0)
+        self.assertEqual(repr(nodes), repr(parse(PROGRAM)))
+
+    def test_arena_views(self):
+        arena = ASTArena.from_nodes(parse(PROGRAM))
+        self.assertEqual(repr(Optimizer().optimize(arena.parse())), repr(Optimizer().optimize(parse(PROGRAM))))
+
+    def test_engines_agree(self):
+        for engine in (Interpreter, ClosureInterpreter, VirtualMachine, TACInterpreter, PythonInterpreter):
+            outputs = []
+            for parser in (Parser(Lexer(PROGRAM)), OptimizingParser(Parser(Lexer(PROGRAM)), Optimizer())):
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    engine(parser).interpret()
+                outputs.append(output.getvalue())
+            with self.subTest(engine=engine.__name__):
+                self.assertEqual(outputs[0], outputs[1])
+                self.assertEqual(outputs[1], '8\n8\n')
+
+    def test_loop_invariants_are_hoisted(self):
+        nodes, optimizer = optimize(LOOPS)
+        # `w * 2` and `w + 1` move out of both loops; `row * w` only out of the inner one.
+        # Each goes behind an `if` repeating the test of the loop it left.
+        guard = nodes[4]
+        self.assertIsInstance(guard, IfNode)
+        self.assertEqual(repr(guard.condition), repr(parse('row < 2;')[0]))
+        inner = guard.body[0]
+        self.assertEqual(repr(inner.condition), repr(parse('0 < w;')[0]))
+        self.assertEqual([node.var_name for node in inner.body], ['$1', '$2'])
+        self.assertEqual(repr(inner.body[0].value), repr(parse('let a = w * 2;')[0].value))
+        loop = nodes[5]
+        self.assertIsInstance(loop, WhileNode)
+        self.assertEqual(loop.body[0].body[0].var_name, '$0')
+        self.assertEqual(repr(loop.body[0].body[0].value), repr(parse('let a = row * w;')[0].value))
+        self.assertNotIn('BinaryOpNode(w', repr(loop.body[1]))
+        body = nodes[6].body
+        self.assertEqual(body[1].body[0].var_name, '$3')
+        self.assertEqual(optimizer.stats['hoist_invariants']['applied'], 6)
+        nodes, _ = optimize(LOOPS, hoist_invariants=False)
+        self.assertNotIn('$', repr(nodes))
+
+    def test_loops_never_entered_compute_nothing(self):
+        for text in ('let n = 0; for i = 0, n { print(zz + 1); } print(5);',
+                     'let a = [1]; let k = 0; while (k > 0) { let b = a - 1; let k = k - 1; } print(5);',
+                     'let a = [1]; for i = 0, 2 { if (i > 5) { print(a - 1); } } print(5);'):
+            nodes, optimizer = optimize(text)
+            self.assertEqual(count_nodes(parse(text)) - count_nodes(nodes), optimizer.nodes_eliminated())
+            for engine in (Interpreter, ClosureInterpreter, VirtualMachine, TACInterpreter, PythonInterpreter):
+                with self.subTest(text=text, engine=engine.__name__):
+                    output = io.StringIO()
+                    with redirect_stdout(output):
+                        engine(OptimizingParser(Parser(Lexer(text)), Optimizer())).interpret()
+                    self.assertEqual(output.getvalue(), '5\n')
+        # A test with a call in it is not repeated, so nothing is hoisted.
+        nodes, _ = optimize('def f() { return 1; } while (f() < w) { print(w * 2); }')
+        self.assertNotIn('$', repr(nodes))
+
+    def test_loop_engines_agree(self):
+        for engine in (Interpreter, ClosureInterpreter, VirtualMachine, TACInterpreter, PythonInterpreter):
+            with self.subTest(engine=engine.__name__):
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    engine(OptimizingParser(Parser(Lexer(LOOPS)), Optimizer())).interpret()
+                self.assertEqual(output.getvalue(), '150\n38\n')
+
+    def test_folded_addition_never_reaches_the_backend(self):
+        nodes = Optimizer().optimize(parse('let a = 2 + (3 * 2); print(a);'))
+        self.assertEqual(nodes[0].value, 8)
+        self.assertIsInstance(nodes[1], PrintNode)
+        self.assertEqual(ARMGenerator(nodes[:1]).generate_arm(), ['MOV R1, #8'])
+
+if __name__ == '__main__':
+    unittest.main()
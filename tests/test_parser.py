@@ -293,5 +293,28 @@ class TestParser(unittest.TestCase):
         self.assertEqual(node[1].var_name, 'y')
         self.assertEqual(node[1].value, 20)
 
+    def test_parse_from_lexer(self):
+        parser = Parser(Lexer('let x = 10; print(x);'))
+        nodes = parser.parse()
+        self.assertIsInstance(nodes[0], VarDeclNode)
+        self.assertIsInstance(nodes[1], PrintNode)
+
+    def test_statements_are_streamed(self):
+        consumed = []
+        def tokens():
+            for token in Lexer('let x = 10; let y = 20; let z = 30;'):
+                consumed.append(token)
+                yield token
+        statements = Parser(tokens()).statements()
+        first = next(statements)
+        self.assertEqual(first.var_name, 'x')
+        self.assertLess(len(consumed), 8)
+        self.assertEqual([node.var_name for node in statements], ['y', 'z'])
+
+    def test_memo_annotations(self):
+        nodes = Parser(Lexer('memo def f(a) { return a; } nomemo def g() { } def h() { } let memo = 1;')).parse()
+        self.assertEqual([node.memo for node in nodes[:3]], [True, False, None])
+        self.assertIsInstance(nodes[3], VarDeclNode)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.code_generator import ARMGenerator, is_label
+from simplelang.compiler.tac_optimizer import TACOptimizer
+from simplelang.compiler.peephole import PeepholeOptimizer, PEEPHOLE_RULES
+from tests.test_arm_simulator import simulate, interpret
+from tests.test_tac_optimizer import PROGRAMS
+
+def optimize(assembly, **rules):
+    optimizer = PeepholeOptimizer(**rules)
+    return optimizer.optimize(assembly), optimizer.stats
+
+class TestPeepholeOptimizer(unittest.TestCase):
+    def test_folds_constants_into_immediates(self):
+        code, stats = optimize(['LDR R1, [SP, #0]', 'MOV R2, #3', 'ADD R0, R1, R2', 'BL print',
+                                'MOV R2, #100', 'SUB R0, R2, R1', 'BL print',
+                                'MOV R2, #10', 'CMP R1, R2', 'MOVLT R0, #1', 'BL print'])
+        self.assertEqual(code, ['LDR R1, [SP, #0]', 'ADD R0, R1, #3', 'BL print',
+                                'RSB R0, R1, #100', 'BL print',
+                                'CMP R1, #10', 'MOVLT R0, #1', 'BL print'])
+        self.assertEqual(stats['fold_immediates'], 3)
+        self.assertEqual(stats['remove_dead_instructions'], 3)
+
+    def test_folds_two_constants_into_one(self):
+        code, _ = optimize(['MOV R1, #0', 'MOV R2, #7', 'SUB R0, R1, R2', 'BL print'])
+        self.assertEqual(code, ['LDR R0, =-7', 'BL print'])
+
+    def test_removes_moves_of_known_values(self):
+        code, stats = optimize(['LDR R4, [SP, #0]', 'MOV R5, R4', 'MOV R4, R5', 'MOV R3, #4', 'MOV R3, #4',
+                                'ADD R0, R5, R3', 'BL print', 'MOV R0, R4', 'BL print'])
+        self.assertEqual(code, ['LDR R4, [SP, #0]', 'ADD R0, R4, #4', 'BL print', 'MOV R0, R4', 'BL print'])
+        self.assertGreaterEqual(stats['remove_redundant_moves'], 2)
+
+    def test_known_values_end_at_labels_and_calls(self):
+        assembly = ['MOV R1, #4', 'loop:', 'MOV R1, #4', 'ADD R0, R0, R1', 'BL print', 'MOV R1, #4',
+                    'CMP R0, R1', 'BLT loop']
+        code, _ = optimize(assembly, fold_immediates=False)
+        # The first MOV is dead: the loop sets R1 again before reading it.
+        self.assertEqual(code, assembly[1:])
+        # R4 outlives the call, the R1 it copies does not.
+        code, _ = optimize(['LDR R1, [SP, #0]', 'MOV R4, R1', 'BL print', 'MOV R0, R4', 'BL print'])
+        self.assertEqual(code, ['LDR R4, [SP, #0]', 'BL print', 'MOV R0, R4', 'BL print'])
+
+    def test_forwards_results_past_copies(self):
+        code, _ = optimize(['LDR R1, [SP, #0]', 'LDR R2, [SP, #4]', 'MUL R3, R1, R2', 'MOV R0, R3', 'BL print'])
+        self.assertEqual(code, ['LDR R1, [SP, #0]', 'LDR R2, [SP, #4]', 'MUL R0, R1, R2', 'BL print'])
+
+    def test_combines_multiply_add(self):
+        code, stats = optimize(['LDR R1, [SP, #0]', 'LDR R2, [SP, #4]', 'MUL R3, R1, R2', 'ADD R0, R1, R3',
+                                'BL print'])
+        self.assertEqual(code, ['LDR R1, [SP, #0]', 'LDR R2, [SP, #4]', 'MLA R0, R1, R2, R1', 'BL print'])
+        self.assertEqual(stats['combine_multiply_add'], 1)
+        # Not while the product is still read.
+        assembly = ['LDR R1, [SP, #0]', 'MUL R4, R1, R1', 'ADD R0, R1, R4', 'BL print', 'MOV R0, R4', 'BL print']
+        self.assertEqual(optimize(assembly)[0], assembly)
+
+    def test_multiplies_and_divides_by_powers_of_two_with_shifts(self):
+        assembly = ['LDR R4, [SP, #0]', 'MOV R1, #8', 'MUL R0, R4, R1', 'BL print',
+                    'MOV R1, #4', 'SDIV R4, R4, R1', 'MOV R0, R4', 'BL print']
+        code, stats = optimize(assembly)
+        self.assertNotIn('MUL', ' '.join(code))
+        self.assertNotIn('SDIV', ' '.join(code))
+        self.assertEqual(stats['reduce_to_shifts'], 2)
+        for value in (-9, -8, -1, 0, 1, 7, 9, -2147483648):
+            with self.subTest(value=value):
+                setup = ['SUB SP, SP, #4', f'LDR R1, ={value}', 'STR R1, [SP, #0]']
+                self.assertEqual(simulate(setup + code)[0].output, simulate(setup + assembly)[0].output)
+
+    def test_calls_read_only_the_arguments_the_callee_reads(self):
+        code, _ = optimize(['MOV R0, #1', 'MOV R1, #2', 'MOV R2, #3', 'BL f', 'BL print', 'B .Lend',
+                            'f:', 'PUSH {LR}', 'ADD R0, R0, R1', 'POP {PC}', '.Lend:'])
+        self.assertEqual(code[:4], ['MOV R0, #1', 'MOV R1, #2', 'BL f', 'BL print'])
+
+    def test_rules_can_be_disabled(self):
+        assembly = ['LDR R1, [SP, #0]', 'MOV R2, #2', 'MUL R0, R1, R2', 'BL print']
+        code, stats = optimize(assembly, **{name: False for name in PEEPHOLE_RULES})
+        self.assertEqual(code, assembly)
+        self.assertEqual(stats['instructions_before'], stats['instructions_after'])
+        self.assertEqual(repr(PeepholeOptimizer(fold_immediates=False, reduce_to_shifts=False)),
+                         'PeepholeOptimizer(remove_redundant_moves,combine_multiply_add,remove_dead_instructions)')
+
+    def test_generated_code_keeps_its_output(self):
+        for text in PROGRAMS:
+            expected = interpret(text)
+            if any(not line.lstrip('-').isdigit() for line in expected.split()):
+                continue  # True/False and true division have no 32-bit integer counterpart.
+            for optimizer in (None, TACOptimizer()):
+                with self.subTest(text=text, optimized=optimizer is not None):
+                    peephole = PeepholeOptimizer()
+                    generator = ARMGenerator(Parser(Lexer(text)).parse(), optimizer, peephole)
+                    assembly = generator.generate_arm()
+                    _, output = simulate(assembly)
+                    self.assertEqual(output, expected)
+                    instructions = sum(not is_label(line) for line in assembly)
+                    self.assertEqual(peephole.stats['instructions_after'], instructions)
+                    self.assertLess(instructions, peephole.stats['instructions_before'])
+                    self.assertEqual(sum(report['instructions'] for report in generator.report.values()),
+                                     instructions)
+
+    def test_rewritten_code_runs_in_fewer_cycles(self):
+        text = '''
+        let total = 0;
+        for i = 0, 50 {
+            let total = total + i * 4 + i / 2;
+        }
+        print(total);
+        '''
+        nodes = Parser(Lexer(text)).parse()
+        plain, output = simulate(ARMGenerator(nodes, TACOptimizer()).generate_arm())
+        rewritten, rewritten_output = simulate(ARMGenerator(nodes, TACOptimizer(), PeepholeOptimizer()).generate_arm())
+        self.assertEqual(output, rewritten_output)
+        self.assertLess(rewritten.cycles, plain.cycles)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.purity import pure_functions, function_definitions
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+PROGRAM = '''
+def fib(a) { if (a < 2) { return a; } return fib(a - 1) + fib(a - 2); }
+def even(n) { if (n == 0) { return 1; } return odd(n - 1); }
+def odd(n) { if (n == 0) { return 0; } return even(n - 1); }
+def loud(x) { print(x); return x; }
+def calls_loud(x) { return loud(x) + 1; }
+def defines(x) { def helper(y) { return y; } return x; }
+def calls_missing(x) { return missing(x); }
+def reads_global(x) { return x + offset; }
+def sum(values) { let total = 0; for i = 0, 3 { let total = total + values[i]; } return total; }
+'''
+
+class TestPurity(unittest.TestCase):
+    def test_pure_functions(self):
+        self.assertEqual(pure_functions(parse(PROGRAM)), {'fib', 'even', 'odd', 'helper', 'reads_global', 'sum'})
+
+    def test_global_reads_with_function_globals(self):
+        pure = pure_functions(parse(PROGRAM), function_globals=True)
+        self.assertNotIn('reads_global', pure)
+        self.assertIn('sum', pure)
+
+    def test_every_definition_must_be_pure(self):
+        nodes = parse('def f(x) { return x; } if (1) { def f(x) { print(x); } }')
+        self.assertEqual(len(function_definitions(nodes)['f']), 2)
+        self.assertEqual(pure_functions(nodes), set())
+
+if __name__ == '__main__':
+    unittest.main()
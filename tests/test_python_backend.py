@@ -0,0 +1,93 @@
+import ast
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer, TokenType
+from simplelang.sl_parser import Parser
+from simplelang.interpreter import Interpreter
+from simplelang.compiler.python_backend import PythonGenerator
+
+class TestPythonBackend(unittest.TestCase):
+    def parse(self, text):
+        lexer = Lexer(text)
+        tokens = []
+        while True:
+            token = lexer.get_next_token()
+            if token.type == TokenType.EOF:
+                break
+            tokens.append(token)
+        return Parser(tokens)
+
+    def run_program(self, text):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            variables = PythonGenerator(self.parse(text).parse()).run()
+        return variables, output.getvalue()
+
+    def test_generates_native_constructs(self):
+        text = '''
+        def count(n) {
+            let total = 0;
+            for i = 0, n {
+                let total = total + i;
+            }
+            return total;
+        }
+        '''
+        module = PythonGenerator(self.parse(text).parse()).generate()
+        nodes = list(ast.walk(module))
+        self.assertTrue(any(isinstance(node, ast.FunctionDef) and node.name == 'f_count' for node in nodes))
+        self.assertTrue(any(isinstance(node, ast.For) for node in nodes))
+        self.assertFalse(any(isinstance(node, ast.While) for node in nodes))
+
+    def test_matches_interpreter(self):
+        text = '''
+        def factorial(x) {
+            if (x == 0) {
+                return 1;
+            }
+            return x * factorial(x - 1);
+        }
+        let result = factorial(5);
+        let x = 15;
+        while (x < 100) {
+            let x = x * 2;
+        }
+        let arr = [1, 2, 3, 4, 5];
+        print(arr[2]);
+        print(result / 7);
+        '''
+        parser = self.parse(text)
+        interpreter = Interpreter(parser)
+        expected = io.StringIO()
+        with redirect_stdout(expected):
+            interpreter.interpret()
+        variables, output = self.run_program(text)
+        self.assertEqual(variables, interpreter.variables)
+        self.assertEqual(output, expected.getvalue())
+
+    def test_for_loop_final_value(self):
+        variables, _ = self.run_program('for i = 0, 3 { print(i); } for j = 5, 2 { print(j); }')
+        self.assertEqual(variables, {'i': 3, 'j': 5})
+
+    def test_for_loop_assigning_its_variable(self):
+        variables, output = self.run_program('for i = 0, 10 { let i = i + 4; print(i); }')
+        self.assertEqual(output, '4\n9\n')
+        self.assertEqual(variables['i'], 10)
+
+    def test_functions_do_not_see_globals(self):
+        variables, _ = self.run_program('let g = 5; def read() { return g; } let result = read();')
+        self.assertNotIn('result', variables)
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            self.run_program('let x = 1 / 0;')
+        with self.assertRaisesRegex(Exception, "Undefined function: nope"):
+            self.run_program('nope(1);')
+        with self.assertRaisesRegex(Exception, "Argument mismatch for function: f"):
+            self.run_program('def f(a) { return a; } f(1, 2);')
+        with self.assertRaisesRegex(Exception, "Index out of bounds: -1"):
+            self.run_program('let a = [1, 2]; print(a[0 - 1]);')
+
+if __name__ == '__main__':
+    unittest.main()
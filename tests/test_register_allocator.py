@@ -0,0 +1,139 @@
+import re
+import unittest
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.cfg import split_functions
+from simplelang.compiler.code_generator import ARMGenerator, REGISTERS, encodable
+from simplelang.compiler.register_allocator import LinearScanAllocator, live_intervals
+
+REGISTER = re.compile(r'\b(R\d+|SP|LR|PC)\b')
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+def units(text):
+    tac = TAC()
+    for node in parse(text):
+        tac.generate_tac(node)
+    main, functions = split_functions(tac.code)
+    return [main] + [body for _, _, body in functions]
+
+# Twelve values live at once: two more than there are registers.
+PRESSURE = '''
+let v0 = 1; let v1 = 2; let v2 = 3; let v3 = 4; let v4 = 5; let v5 = 6;
+let v6 = 7; let v7 = 8; let v8 = 9; let v9 = 10; let v10 = 11; let v11 = 12;
+let s = v0 + v1 + v2 + v3 + v4 + v5 + v6 + v7 + v8 + v9 + v10 + v11;
+'''
+
+LOOP = '''
+let i = 0;
+let total = 0;
+while (i < 10) {
+    let total = total + i * 2;
+    let i = i + 1;
+}
+print(total);
+'''
+
+class TestRegisterAllocator(unittest.TestCase):
+    def assert_valid(self, allocation):
+        """ No two variables live at the same time share a register. """
+        assigned = [interval for interval in allocation.intervals.values() if interval.register is not None]
+        for interval in assigned:
+            self.assertIsNone(interval.slot)
+            for other in assigned:
+                if other is not interval and other.register == interval.register:
+                    self.assertTrue(other.end < interval.start or interval.end < other.start, (interval, other))
+
+    def test_loop_keeps_values_live_across_the_back_edge(self):
+        main = units(LOOP)[0]
+        intervals = live_intervals(main)
+        # `i` and `total` are read after the loop's last quad jumps back, so they span the whole loop.
+        goto = max(position for position, quad in enumerate(main) if quad[0] == 'goto')
+        self.assertGreaterEqual(intervals['i'].end, 2 * goto)
+        self.assertGreaterEqual(intervals['total'].end, 2 * goto)
+        self.assert_valid(LinearScanAllocator(REGISTERS).allocate(main))
+
+    def test_dying_operand_hands_its_register_to_the_result(self):
+        code = [('=', 1, None, 'a'), ('=', 2, None, 'b'), ('+', 'a', 'b', 'c'), ('print', 'c', None, None)]
+        allocation = LinearScanAllocator(['R1', 'R2']).allocate(code)
+        self.assertEqual(allocation.register('c'), 'R1')
+        self.assertEqual(allocation.slots, 0)
+
+    def test_spills_the_interval_ending_last(self):
+        code = [('=', 1, None, 'a'), ('=', 2, None, 'b'), ('=', 3, None, 'c'),
+                ('+', 'b', 'c', 'd'), ('+', 'd', 'a', 'e'), ('print', 'e', None, None)]
+        allocation = LinearScanAllocator(['R1', 'R2']).allocate(code)
+        self.assertEqual(allocation.spilled(), ['a'])
+        self.assertEqual(allocation.slots, 1)
+        self.assert_valid(allocation)
+
+    def test_every_unit_allocates_validly(self):
+        for text in (PRESSURE, LOOP):
+            for code in units(text):
+                self.assert_valid(LinearScanAllocator(REGISTERS).allocate(code))
+
+class TestARMGenerator(unittest.TestCase):
+    def generate(self, text):
+        generator = ARMGenerator(parse(text))
+        return generator, generator.generate_arm()
+
+    def assert_report_matches(self, generator, code):
+        """ The report counts every instruction under its unit, and only real registers appear. """
+        counted = {}
+        unit = '<program>'
+        for line in code:
+            if line.endswith(':'):
+                unit = line[:-1] if line[:-1] in generator.report else unit
+                continue
+            counted[unit] = counted.get(unit, 0) + 1
+        for unit, report in generator.report.items():
+            self.assertEqual(report['instructions'], counted[unit], unit)
+        for line in code:
+            for register in REGISTER.findall(line):
+                self.assertTrue(register in ('SP', 'LR', 'PC') or int(register[1:]) <= 12, line)
+
+    def test_spills_get_a_frame_and_a_report(self):
+        generator, code = self.generate(PRESSURE)
+        report = generator.report['<program>']
+        self.assertEqual(report['spills'], 2)
+        self.assertEqual(report['frame_size'], 8)
+        self.assertEqual(code[0], 'SUB SP, SP, #8')
+        self.assertEqual(code[-1], 'ADD SP, SP, #8')
+        self.assertEqual(report['spill_stores'], sum(line.startswith('STR') for line in code))
+        self.assertEqual(report['spill_loads'], sum(line.startswith('LDR') for line in code))
+        self.assert_report_matches(generator, code)
+
+    def test_functions_save_callee_saved_registers(self):
+        generator, code = self.generate('''
+        def f(a, b, c, d, e, g) {
+            return g + e * (b - a);
+        }
+        ''')
+        body = code[code.index('f:') + 1:code.index('.Lend:')]
+        self.assertEqual(body[0], 'PUSH {R4, LR}')
+        self.assertEqual(body[-1], 'POP {R4, PC}')
+        # Arguments five and six come from the caller's stack, above the saved registers.
+        self.assertIn('LDR R3, [SP, #8]', body)
+        self.assertIn('LDR R4, [SP, #12]', body)
+        self.assertEqual(generator.report['f']['instructions'], len(body))
+        self.assert_report_matches(generator, code)
+
+    def test_parameter_moves_do_not_clobber_each_other(self):
+        _, code = self.generate('''
+        def swap(a, b) {
+            return b - a;
+        }
+        ''')
+        # b arrives in R1 and must leave it before a moves in.
+        self.assertLess(code.index('MOV R2, R1'), code.index('MOV R1, R0'))
+
+    def test_large_constants_are_loaded_from_a_literal_pool(self):
+        _, code = self.generate('let x = 100000; let y = 255; let z = 1024;')
+        self.assertEqual(code, ['LDR R1, =100000', 'MOV R1, #255', 'MOV R1, #1024'])
+        self.assertTrue(encodable(0xFF000000))
+        self.assertFalse(encodable(0x101))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.resolver import Resolver, Scope, assigned_names
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+FUNCTION = '''
+def f(a, b) {
+    let c = a + g;
+    if (c > 0) {
+        for i = 0, b { let d = i; }
+    }
+    def inner(e) { let h = e; }
+    return c;
+}
+'''
+
+class TestResolver(unittest.TestCase):
+    def test_assigned_names_skip_nested_functions(self):
+        [function] = parse(FUNCTION)
+        self.assertEqual(assigned_names(function.body), {'c', 'i', 'd'})
+
+    def test_function_scope(self):
+        [function] = parse(FUNCTION)
+        scope = Resolver().function_scope(function)
+        self.assertEqual(scope.slots, {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'i': 4})
+        self.assertEqual(scope.size, 5)
+        self.assertEqual(scope.resolve('i'), (0, 4))
+        self.assertIsNone(scope.resolve('g'))
+
+    def test_function_globals(self):
+        [function] = parse(FUNCTION)
+        resolver = Resolver(function_globals=True)
+        resolver.globals.store('x')
+        scope = resolver.function_scope(function)
+        self.assertEqual(scope.resolve('g'), (1, 1))
+        self.assertEqual(scope.resolve('x'), (1, 0))
+        self.assertEqual(scope.resolve('a'), (0, 0))
+        self.assertEqual(resolver.globals.slots, {'x': 0, 'g': 1})
+
+    def test_global_scope_is_open(self):
+        scope = Scope(open=True)
+        self.assertEqual(scope.resolve('a'), (0, 0))
+        self.assertEqual(scope.store('b'), 1)
+        self.assertEqual(scope.store('a'), 0)
+        self.assertEqual(scope.assigned, {'a', 'b'})
+
+    def test_repeated_parameter_binds_last_argument(self):
+        scope = Scope(['a', 'a'])
+        self.assertEqual(scope.resolve('a'), (0, 1))
+        self.assertEqual(scope.size, 2)
+
+if __name__ == '__main__':
+    unittest.main()
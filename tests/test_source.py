@@ -0,0 +1,52 @@
+import codecs
+import os
+import tempfile
+import unittest
+from simplelang.lexer import Lexer
+from simplelang.source import open_source, ascii_compatible
+
+class TestSource(unittest.TestCase):
+    def write(self, data):
+        handle, path = tempfile.mkstemp(suffix='.sl')
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def lex(self, path, encoding=None):
+        text, encoding = open_source(path, encoding)
+        return [(t.type, t.value) for t in Lexer(text, encoding)]
+
+    def test_utf8_is_memory_mapped(self):
+        path = self.write('let é = 1;'.encode('utf-8'))
+        text, encoding = open_source(path)
+        self.assertIsInstance(text, memoryview)
+        self.assertEqual(encoding, 'utf-8')
+        self.assertEqual(self.lex(path), [(t.type, t.value) for t in Lexer('let é = 1;')])
+
+    def test_utf8_bom_is_skipped(self):
+        path = self.write(codecs.BOM_UTF8 + b'print(x);')
+        self.assertEqual(self.lex(path), [(t.type, t.value) for t in Lexer('print(x);')])
+
+    def test_utf16_is_decoded(self):
+        path = self.write('let été = 7;'.encode('utf-16'))
+        text, encoding = open_source(path)
+        self.assertIsInstance(text, str)
+        self.assertEqual(self.lex(path), [(t.type, t.value) for t in Lexer('let été = 7;')])
+
+    def test_explicit_encoding(self):
+        path = self.write('let año = 1;'.encode('cp1252'))
+        self.assertEqual(self.lex(path, 'cp1252')[1][1], 'año')
+
+    def test_empty_file(self):
+        path = self.write(b'')
+        self.assertEqual(self.lex(path), [])
+
+    def test_ascii_compatible(self):
+        self.assertTrue(ascii_compatible('utf-8'))
+        self.assertTrue(ascii_compatible('latin-1'))
+        self.assertFalse(ascii_compatible('utf-16'))
+        self.assertFalse(ascii_compatible('shift_jis'))
+
+if __name__ == '__main__':
+    unittest.main()
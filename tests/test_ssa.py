@@ -0,0 +1,198 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.tac_optimizer import TACOptimizer, TAC_PASSES
+from simplelang.compiler.cfg import CFG, split_functions, defines
+from simplelang.compiler.ssa import SSA, to_ssa, from_ssa, sequentialize, base_name
+
+def generate(text):
+    tac = TAC()
+    for node in Parser(Lexer(text)).parse():
+        tac.generate_tac(node)
+    return tac
+
+def run(tac):
+    interpreter = TACInterpreter(None)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        interpreter.run(tac)
+    return interpreter.variables, output.getvalue()
+
+def cleanup():
+    return TACOptimizer(**{name: name in ('thread_jumps', 'remove_unreachable') for name in TAC_PASSES})
+
+def units(tac):
+    main, functions = split_functions(tac.code)
+    return [main] + [body for _, _, body in functions]
+
+PROGRAMS = [
+    '''
+    let x = 0;
+    let y = 5;
+    while (x < 10) {
+        if (x > y) {
+            let y = y + 1;
+        }
+        let x = x + 1;
+    }
+    print(y);
+    ''',
+    '''
+    def fib(a) {
+        if (a == 0) {
+            return 0;
+        }
+        if (a == 1) {
+            return 1;
+        }
+        return fib(a - 1) + fib(a - 2);
+    }
+    def loop(i, acc) { if (i == 0) { return acc; } return loop(i - 1, acc + i); }
+    def pick(values, i) { let v = values[i]; let i = 0; let w = values[i]; return v + w; }
+    let arr = [1, 2, 3, 4, 5];
+    print(arr[2]);
+    print(fib(10));
+    print(loop(30, 0) + pick(arr, 3));
+    ''',
+    '''
+    let s = 0;
+    for i = 0, 20 {
+        let s = s + i * 2;
+        if (i * 2 > 10) {
+            let s = s - i;
+        } else {
+            let k = i;
+        }
+    }
+    print(s);
+    print(k);
+    print(missing);
+    ''',
+]
+
+class TestSSA(unittest.TestCase):
+    def test_every_variable_is_assigned_once(self):
+        for text in PROGRAMS:
+            with self.subTest(text=text[:30]):
+                converted = to_ssa(generate(text))
+                for code in units(converted):
+                    targets = [defines(quad) for quad in code if defines(quad) is not None]
+                    # Bare names are only assigned by the copies back at the end of the program.
+                    versions = [target for target in targets if base_name(target) != target]
+                    self.assertEqual(len(versions), len(set(versions)))
+                    cfg = CFG(code)
+                    for block in cfg.blocks:
+                        for quad in cfg.quads(block):
+                            if quad[0] == 'phi':
+                                self.assertEqual([label for label, _ in quad[1]],
+                                                 [cfg.code[predecessor.start][3] for predecessor in block.predecessors])
+
+    def test_phis_at_joins(self):
+        converted = to_ssa(generate(PROGRAMS[0]))
+        phis = {quad[3]: quad[1] for quad in converted.code if quad[0] == 'phi'}
+        # The loop header merges x and y; the `if` join only y.
+        self.assertEqual(sorted(base_name(name) for name in phis), ['x', 'y', 'y'])
+        header = next(name for name in phis if base_name(name) == 'x')
+        self.assertEqual([value for _, value in phis[header]], ['x.1', 'x.3'])
+        self.assertIn(('print', 'y.2', None, None), converted.code)
+        self.assertEqual(converted.code[-2:], [('=', 'x.2', None, 'x'), ('=', 'y.2', None, 'y')])
+
+    def test_phis_are_pruned(self):
+        # The program's `t` is live at its end, so the join needs a phi for it.
+        converted = to_ssa(generate('if (c) { let t = 1; print(t); } else { let t = 2; print(t); } print(3);'))
+        self.assertEqual([quad for quad in converted.code if quad[0] == 'phi'], [('phi', (('l3', 't.1'), ('l1', 't.2')), None, 't.3')])
+        # In a function `t` is dead after the `if`: no phi, even though both branches assign it.
+        converted = to_ssa(generate('def f(c) { if (c) { let t = 1; print(t); } else { let t = 2; print(t); } return 3; }'))
+        self.assertEqual([quad for quad in converted.code if quad[0] == 'phi'], [])
+
+    def test_round_trip_behaves_the_same(self):
+        for text in PROGRAMS:
+            tac = generate(text)
+            expected = run(tac)
+            for coalesce in (False, True):
+                with self.subTest(text=text[:30], coalesce=coalesce):
+                    self.assertEqual(run(from_ssa(to_ssa(tac), coalesce)), expected)
+
+    def test_round_trip_gives_the_code_back(self):
+        for text in PROGRAMS:
+            with self.subTest(text=text[:30]):
+                tac = generate(text)
+                self.assertEqual(str(from_ssa(to_ssa(tac))), str(cleanup().optimize(tac)))
+
+    def test_swapping_phis(self):
+        tac = TAC()
+        tac.temp_counter = 10
+        tac.code = [
+            ('label', None, None, 'entry'),
+            ('=', 1, None, 'x.1'),
+            ('=', 2, None, 'y.1'),
+            ('=', 0, None, 'i.1'),
+            ('label', None, None, 'l0'),
+            ('phi', (('entry', 'x.1'), ('body', 'y.2')), None, 'x.2'),
+            ('phi', (('entry', 'y.1'), ('body', 'x.2')), None, 'y.2'),
+            ('phi', (('entry', 'i.1'), ('body', 'i.3')), None, 'i.2'),
+            ('<', 'i.2', 3, 't0.1'),
+            ('ifFalse', 't0.1', None, 'l1'),
+            ('label', None, None, 'body'),
+            ('+', 'i.2', 1, 'i.3'),
+            ('goto', None, None, 'l0'),
+            ('label', None, None, 'l1'),
+            ('print', 'x.2', None, None),
+            ('print', 'y.2', None, None),
+        ]
+        for coalesce in (False, True):
+            self.assertEqual(run(from_ssa(tac, coalesce))[1], '2\n1\n')
+        self.assertEqual(sequentialize([('a', 'b'), ('b', 'a'), ('c', 'a'), ('d', 5)], iter(['t9']).__next__),
+                         [('=', 'a', None, 'c'), ('=', 5, None, 'd'), ('=', 'a', None, 't9'),
+                          ('=', 'b', None, 'a'), ('=', 't9', None, 'b')])
+
+    def test_overlapping_versions_keep_their_names(self):
+        # After copy propagation `x.2` is still needed while `x.3` holds the next value (the "lost copy" problem).
+        tac = TAC()
+        tac.code = [
+            ('label', None, None, 'entry'),
+            ('=', 1, None, 'x.1'),
+            ('label', None, None, 'l0'),
+            ('phi', (('entry', 'x.1'), ('body', 'x.3')), None, 'x.2'),
+            ('+', 'x.2', 1, 'x.3'),
+            ('<', 'x.3', 5, 't0.1'),
+            ('ifFalse', 't0.1', None, 'l1'),
+            ('label', None, None, 'body'),
+            ('goto', None, None, 'l0'),
+            ('label', None, None, 'l1'),
+            ('print', 'x.2', None, None),
+        ]
+        destructed = from_ssa(tac)
+        self.assertEqual(run(destructed)[1], '4\n')
+        self.assertEqual(sorted({quad[3] for quad in destructed.code if defines(quad) and quad[3].startswith('x')}),
+                         ['x', 'x.3'])
+
+    def test_functions_and_parameters(self):
+        tac = generate('def f(n) { let n = n + 1; while (n < 10) { let n = n * 2; } return n; } print(f(1));')
+        converted = to_ssa(tac)
+        main, functions = split_functions(converted.code)
+        body = functions[0][2]
+        self.assertIn(('+', 'n', 1, 't0.1'), body)
+        # Functions have nothing live at their end, so nothing is copied back.
+        self.assertNotIn('n', [quad[3] for quad in body if defines(quad)])
+        self.assertEqual(run(from_ssa(converted)), run(tac))
+
+    def test_large_programs(self):
+        text = ''.join(f'let v{i} = v{i - 1} + {i}; if (v{i} > 3) {{ let w = v{i} * 2; }} while (w < {i}) {{ let w = w + 1; }}\n'
+                       for i in range(1, 1200))
+        tac = generate(text)
+        self.assertGreater(len(tac.code), 20000)
+        converted = to_ssa(tac)
+        self.assertEqual(str(from_ssa(converted)), str(cleanup().optimize(tac)))
+
+    def test_empty_units(self):
+        ssa = SSA(TAC())
+        self.assertEqual(ssa.construct([]), [])
+        self.assertEqual(ssa.destruct([]), [])
+
+if __name__ == '__main__':
+    unittest.main()
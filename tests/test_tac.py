@@ -144,10 +144,10 @@ print i
 
     def test_ReturnNode(self):
         tac = TAC()
-        node = ReturnNode(BinaryOpNode(1, '+', 2))
+        node = FunctionNode('f', [], [ReturnNode(BinaryOpNode(1, '+', 2))])
         tac.generate_tac(node)
-        self.assertEqual(tac.code[0], ('+', 1, 2, 't0'))
-        self.assertEqual(tac.code[1], ('return', 't0', None, None))
+        self.assertEqual(tac.code[2], ('+', 1, 2, 't0'))
+        self.assertEqual(tac.code[3], ('return', 't0', None, None))
 
     def test_FunctionNode(self):
         tac = TAC()
@@ -171,7 +171,19 @@ endFunc
         self.assertEqual(tac.code[0], ('alloc', 2, None, 't0'))
         self.assertEqual(tac.code[1], ('=', 1, None, 't0[0]'))
         self.assertEqual(tac.code[2], ('=', 2, None, 't0[1]'))
-        self.assertEqual(tac.code[3], ('call', 'add', 't0', None))
+        self.assertEqual(tac.code[3], ('call', 'add', 't0', 't1'))
+
+    def test_tail_call(self):
+        tac = TAC()
+        tac.generate_tac(FunctionNode('f', ['n'], [ReturnNode(FunctionCallNode('g', ['n'])),
+                                                   ReturnNode(BinaryOpNode(FunctionCallNode('g', [1]), '+', 1))]))
+        tac.generate_tac(ReturnNode(FunctionCallNode('g', [2])))
+        ops = [quad[0] for quad in tac.code]
+        self.assertEqual(ops.count('tailcall'), 1)
+        self.assertIn(('tailcall', 'g', 't0', None), tac.code)
+        self.assertIn('tailcall g, t0', str(tac))
+        # Outside of a function, `return` leaves the statement instead.
+        self.assertEqual(tac.code[-3:], [('call', 'g', 't4', 't5'), ('goto', None, None, 'l0'), ('label', None, None, 'l0')])
 
     def test_ComplexBinaryOpAssignment(self):
         tac = TAC()
@@ -0,0 +1,171 @@
+import functools
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer, TokenType
+from simplelang.sl_parser import Parser
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.tac_optimizer import TACOptimizer
+from simplelang.compiler.c_backend import CInterpreter, find_compiler
+from simplelang.closure_interpreter import ClosureInterpreter
+from simplelang.vm.machine import VirtualMachine
+from simplelang.compiler.python_backend import PythonInterpreter
+from simplelang.errors import StackOverflowError
+from simplelang.sl_parser import VarDeclNode, BinaryOpNode, ForNode, PrintNode
+
+def run_everywhere(test, text):
+    """ Output of `text` on every engine but `Interpreter`, which hands `return` values back unevaluated. """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    engines = [ClosureInterpreter, VirtualMachine, PythonInterpreter, TACInterpreter,
+               functools.partial(TACInterpreter, optimizer=TACOptimizer())]
+    if find_compiler():
+        engines.append(functools.partial(CInterpreter, optimizer=TACOptimizer(), cache_dir=directory.name))
+    outputs = []
+    for engine in engines:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            engine(Parser(Lexer(text))).interpret()
+        outputs.append(output.getvalue())
+    return outputs
+
+class TestTACInterpreter(unittest.TestCase):
+    def run_program(self, text):
+        lexer = Lexer(text)
+        tokens = []
+        while True:
+            token = lexer.get_next_token()
+            if token.type == TokenType.EOF:
+                break
+            tokens.append(token)
+        interpreter = TACInterpreter(Parser(tokens))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter.interpret()
+        return interpreter.variables, output.getvalue()
+
+    def test_run_quadruples(self):
+        tac = TAC()
+        tac.generate_tac(VarDeclNode('total', 0))
+        tac.generate_tac(ForNode('i', 0, 4, [VarDeclNode('total', BinaryOpNode('total', '+', 'i'))]))
+        tac.generate_tac(PrintNode('total'))
+        interpreter = TACInterpreter(None)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter.run(tac)
+        self.assertEqual(interpreter.variables, {'total': 6, 'i': 4})
+        self.assertEqual(output.getvalue(), '6\n')
+
+    def test_if_else_statement(self):
+        variables, _ = self.run_program('let x = 8; if (x > 10) {let x = 9;} else {let x = 10;}')
+        self.assertEqual(variables['x'], 10)
+
+    def test_function_calling_other_function(self):
+        text = '''
+        def add(x, y) {
+            return x + y;
+        }
+        def add_2(x) {
+            return add(x, 2);
+        }
+        let result = add_2(10);
+        print(result);
+        '''
+        variables, output = self.run_program(text)
+        self.assertEqual(variables['result'], 12)
+        self.assertEqual(output, '12\n')
+
+    def test_recursive_function(self):
+        text = '''
+        def fib(a) {
+            if (a == 0) {
+                return 0;
+            }
+            if (a == 1) {
+                return 1;
+            }
+            return fib(a - 1) + fib(a - 2);
+        }
+        print(fib(15));
+        '''
+        _, output = self.run_program(text)
+        self.assertEqual(output, '610\n')
+
+    def test_arrays(self):
+        text = '''
+        let arr = [1, 2 * 3, 4];
+        let i = 1;
+        print(arr[i] + arr[2]);
+        '''
+        _, output = self.run_program(text)
+        self.assertEqual(output, '10\n')
+
+    def test_tail_calls_run_in_constant_space(self):
+        text = '''
+        def loop(i, acc) { if (i == 0) { return acc; } return loop(i - 1, acc + i); }
+        def even(n) { if (n == 0) { return 1; } return odd(n - 1); }
+        def odd(n) { if (n == 0) { return 0; } return even(n - 1); }
+        let total = loop(100000, 0);
+        let parity = even(100001);
+        '''
+        variables, _ = self.run_program(text)
+        self.assertEqual(variables, {'total': 5000050000, 'parity': 0})
+        with self.assertRaisesRegex(Exception, "Argument mismatch for function: loop"):
+            self.run_program('def loop(i) { return loop(i, 1); } print(loop(1));')
+
+    def test_deep_recursion_and_stack_overflow(self):
+        text = 'def count(n) { if (n == 0) { return 0; } return 1 + count(n - 1); } let result = count(50000);'
+        variables, _ = self.run_program(text)
+        self.assertEqual(variables['result'], 50000)
+        interpreter = TACInterpreter(Parser(Lexer(text)), max_depth=1000)
+        with self.assertRaisesRegex(StackOverflowError, "more than 1000 nested calls \\(calling count\\)"):
+            interpreter.interpret()
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            self.run_program('let x = 1 / 0;')
+        with self.assertRaisesRegex(Exception, "Undefined function: nope"):
+            self.run_program('nope(1);')
+        with self.assertRaisesRegex(Exception, "Index out of bounds: 5"):
+            self.run_program('let a = [1]; print(a[5]);')
+
+    def test_functions_are_bound_when_defined(self):
+        text = 'def f() { return 1; } print(f()); def f() { return 2; } print(f());'
+        _, output = self.run_program(text)
+        self.assertEqual(output, '1\n2\n')
+        interpreter = TACInterpreter(Parser(Lexer(text)), optimizer=TACOptimizer())
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter.interpret()
+        self.assertEqual(output.getvalue(), '1\n2\n')
+        with self.assertRaisesRegex(Exception, "Undefined function: g"):
+            self.run_program('print(g(1)); def g(a) { return a; }')
+
+    def test_top_level_return_leaves_the_statement(self):
+        text = '''
+        def show(x) { print(x); return x; }
+        let i = 0;
+        while (i < 3) { if (1) { return 0; } let i = i + 1; }
+        print(i);
+        return show(7);
+        print(8);
+        '''
+        for output in run_everywhere(self, text):
+            self.assertEqual(output, '0\n7\n8\n')
+
+    def test_logical_operators_short_circuit(self):
+        text = '''
+        def f(x) { print(x + 100); return x; }
+        let a = 5;
+        print(a || f(1));
+        print(0 && f(2));
+        print(0 || f(3));
+        print(a && f(4));
+        '''
+        for output in run_everywhere(self, text):
+            self.assertEqual(output, '5\n0\n103\n3\n104\n4\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer
+from simplelang.sl_parser import Parser
+from simplelang.compiler.tac import TAC
+from simplelang.compiler.tac_interpreter import TACInterpreter
+from simplelang.compiler.tac_optimizer import TACOptimizer, TAC_PASSES
+from simplelang.compiler.code_generator import ARMGenerator
+
+def generate(text):
+    tac = TAC()
+    for node in Parser(Lexer(text)).parse():
+        tac.generate_tac(node)
+    return tac
+
+PROGRAMS = [
+    '''
+    let a = 2 + (3 * 2);
+    print(a);
+    let x = 15;
+    while (x < 100) {
+        print(x);
+        let x = x * 2;
+    }
+    def fib(a) {
+        if (a == 0) {
+            return 0;
+        }
+        if (a == 1) {
+            return 1;
+        }
+        return fib(a - 1) + fib(a - 2);
+    }
+    let arr = [1, 2, 3, 4, 5];
+    print(arr[2]);
+    print(fib(10));
+    ''',
+    '''
+    let s = 0;
+    let q = 0;
+    for i = 0, 20 {
+        let s = s + i * 2;
+        let q = q + i * 2 + 1;
+        if (i * 2 > 10) {
+            let q = q - i * 2;
+        } else {
+            let s = s + 1;
+        }
+    }
+    print(s);
+    print(q);
+    ''',
+    '''
+    def loop(i, acc) { if (i == 0) { return acc; } return loop(i - 1, acc + i); }
+    def pick(values, i) { let v = values[i]; let w = values[i]; return v + w; }
+    let arr = [4, 5, 6];
+    let total = loop(50, 0);
+    let y = total;
+    let z = y + 1;
+    print(pick(arr, 2) + z);
+    while (0) { print(1); }
+    if (1) { print(2); } else { print(3); }
+    ''',
+    '''
+    let n = 10;
+    let a = n / 2;
+    let b = n / 2;
+    let c = (a == b) && (n > 3);
+    let d = (n < 3) || (a > 1);
+    print(c);
+    print(d);
+    ''',
+    '''
+    def scale(values, n, k) {
+        let out = 0;
+        for i = 0, n {
+            let out = out + values[i] * (k + 1) + i * 3;
+        }
+        return out;
+    }
+    let grid = [1, 2, 3, 4, 5, 6];
+    let w = 3;
+    let total = 0;
+    let row = 0;
+    while (row < 2) {
+        for col = 0, w {
+            let offset = row * w;
+            let total = total + grid[offset + col] * (w * 2) + col * 4;
+        }
+        let row = row + 1;
+    }
+    print(total);
+    print(scale(grid, 6, w));
+    ''',
+]
+
+def run(tac):
+    interpreter = TACInterpreter(None)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        interpreter.run(tac)
+    return interpreter.variables, output.getvalue()
+
+class TestTACOptimizer(unittest.TestCase):
+    def test_programs_behave_the_same(self):
+        for text in PROGRAMS:
+            tac = generate(text)
+            expected = run(tac)
+            for passes in [{}] + [{other: other == name for other in TAC_PASSES} for name in TAC_PASSES]:
+                with self.subTest(text=text[:30], passes=passes):
+                    optimizer = TACOptimizer(**passes)
+                    optimized = optimizer.optimize(tac)
+                    self.assertEqual(run(optimized), expected)
+
+    def test_quad_counts_shrink(self):
+        for text in PROGRAMS:
+            optimizer = TACOptimizer()
+            tac = generate(text)
+            optimized = optimizer.optimize(tac)
+            self.assertEqual(optimizer.stats['quads_before'], len(tac.code))
+            self.assertEqual(optimizer.stats['quads_after'], len(optimized.code))
+            # Hoisting repeats the test of each loop it hoists out of, which can add quads.
+            self.assertLess(len(TACOptimizer(hoist_loop_invariants=False).optimize(tac).code), len(tac.code))
+
+    def test_copies_and_dead_temps(self):
+        optimized = TACOptimizer().optimize(generate('for i = 0, 3 { let s = s + i; } let y = s; print(y);'))
+        text = str(optimized)
+        self.assertIn('s = s + i\n', text)
+        self.assertIn('i = i + 1\n', text)
+        self.assertIn('print s\n', text)
+
+    def test_common_subexpressions(self):
+        optimizer = TACOptimizer()
+        optimized = optimizer.optimize(generate('let a = x * y; let b = x * y + 1; let c = x * y;'))
+        self.assertEqual([quad[0] for quad in optimized.code].count('*'), 1)
+        self.assertEqual(optimizer.stats['eliminate_common_subexpressions'], 2)
+        # Redefining an operand makes the expression unavailable.
+        optimized = TACOptimizer().optimize(generate('let a = x * y; let x = 2; let c = x * y;'))
+        self.assertEqual([quad[0] for quad in optimized.code].count('*'), 2)
+
+    def test_jumps_and_unreachable_code(self):
+        optimizer = TACOptimizer()
+        optimized = optimizer.optimize(generate('if (x) { print(1); } while (0) { print(2); } print(3);'))
+        self.assertEqual(str(optimized), 'if_not x goto l4\nprint 1\nl4:\nprint 3\n')
+        self.assertGreater(optimizer.stats['thread_jumps'], 0)
+        self.assertGreater(optimizer.stats['remove_unreachable'], 0)
+
+    def test_loop_invariants_are_hoisted(self):
+        optimizer = TACOptimizer()
+        optimized = optimizer.optimize(generate('for i = 0, n { let t = a * b; let s = s + a * b + i; } print(s);'))
+        text = str(optimized)
+        # `a * b` once, before the loop header; `t` is seen after the loop, so the loop copies it.
+        self.assertEqual(text.count(' * '), 1)
+        self.assertLess(text.index(' * '), text.index('l0:'))
+        self.assertGreater(optimizer.stats['hoist_loop_invariants'], 0)
+        # Division can fail, so it stays in the loop.
+        optimized = TACOptimizer().optimize(generate('for i = 0, n { let s = s + a / b; }'))
+        self.assertGreater(str(optimized).index(' / '), str(optimized).index('l0:'))
+
+    def test_loops_never_entered_compute_nothing(self):
+        for text in ('let n = 0; for i = 0, n { print(zz + 1); } print(5);',
+                     'let a = [1]; let k = 0; while (k > 0) { let b = a - 1; let k = k - 1; } print(5);',
+                     'let a = [1]; for i = 0, 2 { if (i > 5) { print(a - 1); } } print(5);'):
+            with self.subTest(text=text):
+                tac = generate(text)
+                optimizer = TACOptimizer()
+                self.assertEqual(run(optimizer.optimize(tac)), run(tac))
+        # The hoisted `a * b` sits behind a copy of the loop's test.
+        text = str(TACOptimizer().optimize(generate('for i = 0, n { print(a * b); }')))
+        self.assertLess(text.index(' < '), text.index(' * '))
+        self.assertLess(text.index(' * '), text.index('l0:'))
+
+    def test_strength_reduction(self):
+        optimizer = TACOptimizer()
+        tac = generate('let s = 0; for i = 0, 10 { let s = s + i * 4; } print(s);')
+        optimized = optimizer.optimize(tac)
+        loop = str(optimized).split('l0:')[1]
+        self.assertNotIn(' * ', loop)
+        self.assertIn(' + 4\n', loop)
+        self.assertEqual(optimizer.stats['reduce_strength'], 1)
+        self.assertEqual(run(optimized), run(tac))
+        # Without a known integer start, `i * 4` stays a multiplication.
+        optimized = TACOptimizer().optimize(generate('def f(i) { let s = 0; while (i < 10) { let s = s + i * 4; let i = i + 1; } return s; }'))
+        self.assertIn(' * ', str(optimized))
+
+    def test_effects_are_kept(self):
+        optimized = TACOptimizer().optimize(generate('def f(x) { let d = x / 0; let a = [1]; let e = a[5]; f(x); return 1; }'))
+        ops = [quad[0] for quad in optimized.code]
+        self.assertIn('/', ops)
+        self.assertIn('call', ops)
+        self.assertIn(('=', 'a[5]', None, 'e'), optimized.code)
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            run(TACOptimizer().optimize(generate('let d = 1 / 0; print(2);')))
+
+    def test_input_is_not_modified(self):
+        tac = generate(PROGRAMS[1])
+        code = list(tac.code)
+        TACOptimizer().optimize(tac)
+        self.assertEqual(tac.code, code)
+
+    def test_interpreter_and_arm_generator_take_an_optimizer(self):
+        interpreter = TACInterpreter(Parser(Lexer('let a = 1 + 2; let b = 1 + 2;')), optimizer=TACOptimizer())
+        interpreter.interpret()
+        self.assertEqual(interpreter.variables, {'a': 3, 'b': 3})
+        nodes = Parser(Lexer('let x = 15;')).parse()
+        self.assertEqual(ARMGenerator(nodes, TACOptimizer()).generate_arm(), ['MOV R1, #15'])
+
+if __name__ == '__main__':
+    unittest.main()
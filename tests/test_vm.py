@@ -0,0 +1,115 @@
+import functools
+import io
+import unittest
+from contextlib import redirect_stdout
+from simplelang.lexer import Lexer, TokenType
+from simplelang.sl_parser import Parser
+from simplelang.interpreter import Interpreter
+from simplelang.vm.machine import VirtualMachine
+from simplelang.errors import StackOverflowError
+
+INTERPRETER_PROGRAMS = [
+    'let x = 11; if (x > 10) {let x = 9;}',
+    'let x = 8; if (x > 10) {let x = 9;} else {let x = 10;}',
+    '''
+    def add(x, y) {
+        let a = x + y;
+        return a;
+    }
+
+    let result = add(10, 20);
+    print(result);
+    ''',
+    '''
+    def add(x, y) {
+        return x + y;
+    }
+    def add_2(x) {
+        return add(x, 2);
+    }
+    let result = add_2(10);
+    print(result);
+    ''',
+    '''
+    def factorial(x) {
+        if (x == 0) {
+            return 1;
+        }
+        return x * factorial(x - 1);
+    }
+
+    let result = factorial(5);
+    print(result);
+    ''',
+]
+
+class TestVirtualMachine(unittest.TestCase):
+    def run_program(self, engine, text):
+        lexer = Lexer(text)
+        tokens = []
+        while True:
+            token = lexer.get_next_token()
+            if token.type == TokenType.EOF:
+                break
+            tokens.append(token)
+        machine = engine(Parser(tokens))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            machine.interpret()
+        return machine.variables, output.getvalue()
+
+    def test_matches_interpreter(self):
+        for text in INTERPRETER_PROGRAMS:
+            with self.subTest(text=text):
+                self.assertEqual(self.run_program(VirtualMachine, text), self.run_program(Interpreter, text))
+
+    def test_for_loop_and_arrays(self):
+        text = '''
+        let arr = [3, 1, 4, 1, 5];
+        let total = 0;
+        for i = 0, 5 {
+            let total = total + arr[i] * 2;
+        }
+        print(total / 4);
+        '''
+        variables, output = self.run_program(VirtualMachine, text)
+        self.assertEqual(variables['total'], 28)
+        self.assertEqual(variables['i'], 5)
+        self.assertEqual(output, '7.0\n')
+
+    def test_deep_recursion(self):
+        text = '''
+        def count(n) {
+            if (n == 0) {
+                return 0;
+            }
+            return 1 + count(n - 1);
+        }
+        let result = count(20000);
+        '''
+        variables, _ = self.run_program(VirtualMachine, text)
+        self.assertEqual(variables['result'], 20000)
+
+    def test_stack_overflow(self):
+        text = 'def down(n) { return 1 + down(n - 1); } let result = down(5);'
+        engine = functools.partial(VirtualMachine, max_depth=100)
+        with self.assertRaisesRegex(StackOverflowError, "more than 100 nested calls \\(calling down\\)"):
+            self.run_program(engine, text)
+        variables, _ = self.run_program(engine, 'def f(n) { if (n > 0) { return f(n - 1); } return n; } let r = f(99);')
+        self.assertEqual(variables['r'], 0)
+
+    def test_logical_operators(self):
+        variables, _ = self.run_program(VirtualMachine, 'let a = (1 < 2 && 3 > 4); let b = (0 || 7);')
+        self.assertEqual(variables['a'], False)
+        self.assertEqual(variables['b'], 7)
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, "Division by zero"):
+            self.run_program(VirtualMachine, 'let x = 1 / 0;')
+        with self.assertRaisesRegex(Exception, "Argument mismatch for function: f"):
+            self.run_program(VirtualMachine, 'def f(a) { return a; } f(1, 2);')
+        with self.assertRaisesRegex(Exception, "Undefined array: a"):
+            self.run_program(VirtualMachine, 'print(a[0]);')
+
+if __name__ == '__main__':
+    unittest.main()